@@ -0,0 +1,84 @@
+"""
+DRF views with `async def` handlers.
+
+DRF dispatches synchronously, so under ASGI Django runs its views on the
+one thread it keeps for sync code, one request at a time. AsyncAPIView
+dispatches on the event loop instead: authentication goes through the
+authenticators' `authenticate_async` where they have one, and the rest of
+DRF's request setup (negotiation, permissions, throttles) does no I/O and
+runs as usual. Handlers use the async ORM for queries and `offload` for
+blocking file and CPU work, and JSON responses are rendered on a worker
+thread.
+
+Under WSGI, Django runs these views in an event loop of their own, so they
+keep working there, just without the concurrency.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.views import APIView
+
+
+def offload(func):
+    """
+    `func` as a coroutine function that runs on a worker thread. For file
+    and CPU work only: database queries belong on Django's sync thread,
+    through the async ORM or plain `sync_to_async`.
+    """
+    return sync_to_async(func, thread_sensitive=False)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines. Sync handlers that DRF provides,
+    such as `options`, still work.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.perform_authentication_async(request)
+            self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        renderer = getattr(self.response, 'accepted_renderer', None)
+        if renderer is not None and renderer.format == 'json':
+            # Other renderers, like the browsable API, may query the database,
+            # so Django renders them on its sync thread
+            await offload(self.response.render)()
+        return self.response
+
+    async def perform_authentication_async(self, request):
+        """
+        Sets request.user and request.auth as DRF's Request would on first
+        access, without blocking the event loop.
+        """
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'authenticate_async'):
+                    user_auth = await authenticator.authenticate_async(request)
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
@@ -0,0 +1,155 @@
+"""
+Token authentication without a database round trip per request.
+
+TokenAuthentication looks the token and its user up on every request.
+CachedTokenAuthentication remembers the result for TOKEN_CACHE_TIMEOUT
+seconds in a per-process LRU of TOKEN_CACHE_SIZE tokens, and, when
+TOKEN_CACHE_ALIAS names one of CACHES, in that shared cache too, so a new
+worker does not have to go to the database either.
+
+Deleting a token (logout) or saving its user (password change,
+deactivation) invalidates it in this process and in the shared cache.
+Other processes may keep accepting it from their own LRU until it
+expires, so the timeout bounds how long a revoked token stays usable.
+
+Async views authenticate with `authenticate_async`, which answers from
+the LRU on the event loop and goes to the database only on a miss.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+# Bumped by every invalidation, so a lookup that raced with one is not cached
+_generation = 0
+
+
+def _cache_key(key):
+    # Raw tokens are credentials: keep them out of shared cache keys
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    return caches[settings.TOKEN_CACHE_ALIAS] if settings.TOKEN_CACHE_ALIAS else None
+
+
+def get_cached(key, shared=True):
+    """
+    The (user, token) cached for `key`, or None. The shared cache is only
+    asked when `shared` is true.
+    """
+    if settings.TOKEN_CACHE_TIMEOUT <= 0:
+        return None
+    cache_key = _cache_key(key)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry is not None:
+            if entry[0] > now:
+                _entries.move_to_end(cache_key)
+                return entry[1]
+            del _entries[cache_key]
+    cache = _shared_cache() if shared else None
+    if cache is None:
+        return None
+    result = cache.get(cache_key)
+    if result is not None:
+        _store(cache_key, result, now)
+    return result
+
+
+def cache_token(key, result, generation):
+    """
+    Caches the (user, token) looked up for `key`, unless a token was
+    invalidated since `generation` was read.
+    """
+    if settings.TOKEN_CACHE_TIMEOUT <= 0 or generation != _generation:
+        return
+    cache_key = _cache_key(key)
+    _store(cache_key, result, time.monotonic())
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(cache_key, result, settings.TOKEN_CACHE_TIMEOUT)
+
+
+def _store(cache_key, result, now):
+    if settings.TOKEN_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _entries[cache_key] = (now + settings.TOKEN_CACHE_TIMEOUT, result)
+        _entries.move_to_end(cache_key)
+        while len(_entries) > settings.TOKEN_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def invalidate_token(key):
+    global _generation
+    cache_key = _cache_key(key)
+    with _lock:
+        _generation += 1
+        _entries.pop(cache_key, None)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication backed by the token cache. Failed lookups are not
+    cached, so a new token works at once.
+    """
+
+    def get_key(self, request):
+        """
+        The token in the Authorization header, or None if there is no
+        token header. Malformed headers fail as in TokenAuthentication.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        return None if key is None else self.authenticate_credentials(key)
+
+    async def authenticate_async(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        result = get_cached(key, shared=False)
+        if result is None:
+            # The shared cache and the database block: leave them to Django's sync thread
+            return await sync_to_async(self.authenticate_credentials)(key)
+        return _private(result)
+
+    def authenticate_credentials(self, key):
+        result = get_cached(key)
+        if result is None:
+            generation = _generation
+            result = super().authenticate_credentials(key)
+            cache_token(key, result, generation)
+        return _private(result)
+
+
+def _private(result):
+    # Views may change request.user, which must not leak into the cache
+    user, token = result
+    return copy.copy(user), token
@@ -0,0 +1,25 @@
+"""
+Fire-and-forget work on background thread pools.
+
+Nothing waits on these futures, so an exception raised by the work would
+disappear with them. `submit` logs it instead.
+"""
+import logging
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+def submit(executor, func, *args, description):
+    """
+    Runs `func(*args)` on `executor` and logs any exception it raises,
+    with `description` formatted by `args`, e.g. "prune for user %s".
+    """
+    future = executor.submit(func, *args)
+    future.add_done_callback(partial(_log_failure, description, args))
+    return future
+
+
+def _log_failure(description, args, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.exception(f"Background {description} failed", *args, exc_info=future.exception())
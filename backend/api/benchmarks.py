@@ -0,0 +1,194 @@
+"""
+Helpers shared by the benchmark management commands: synthetic equipment
+CSVs modelled on sample_equipment_data.csv, simple timing/memory probes,
+and JSON results that can be compared between commits.
+"""
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+
+from .storage import ColumnStoreWriter
+
+SAMPLE_CSV = Path(settings.BASE_DIR).parent / 'sample_equipment_data.csv'
+GENERATE_BLOCK_SIZE = 100_000
+
+
+def load_templates():
+    """
+    Per-type mean/std of each parameter from the bundled sample file.
+    """
+    df = pd.read_csv(SAMPLE_CSV)
+    stats = df.groupby('Type')[['Flowrate', 'Pressure', 'Temperature']].agg(['mean', 'std'])
+    return stats.fillna(1.0)
+
+
+def generate_frame(rows, templates=None, seed=0, offset=0):
+    """
+    Returns a DataFrame of `rows` synthetic equipment readings.
+    """
+    templates = load_templates() if templates is None else templates
+    rng = np.random.default_rng(seed)
+    types = templates.index.to_numpy()
+    picks = rng.integers(0, len(types), size=rows)
+    data = {
+        'Equipment Name': [f"{types[p]}-{offset + i + 1}" for i, p in enumerate(picks)],
+        'Type': types[picks],
+    }
+    for column in ('Flowrate', 'Pressure', 'Temperature'):
+        means = templates[(column, 'mean')].to_numpy()[picks]
+        stds = templates[(column, 'std')].to_numpy()[picks]
+        data[column] = np.round(rng.normal(means, stds), 2)
+    return pd.DataFrame(data)
+
+
+def generate_equipment_csv(path, rows, seed=0):
+    """
+    Writes a synthetic CSV of `rows` rows to `path`, block by block so that
+    generating very large files stays cheap on memory.
+    """
+    templates = load_templates()
+    with open(path, 'w', newline='') as f:
+        written = 0
+        while written < rows:
+            block = min(GENERATE_BLOCK_SIZE, rows - written)
+            frame = generate_frame(block, templates, seed=seed + written, offset=written)
+            frame.to_csv(f, header=(written == 0), index=False)
+            written += block
+    return path
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _run_child(conn, func, args):
+    start_rss = peak_rss_bytes()
+    start = time.perf_counter()
+    func(*args)
+    conn.send({
+        'seconds': time.perf_counter() - start,
+        'peak_bytes': peak_rss_bytes(),
+        'growth_bytes': peak_rss_bytes() - start_rss,
+    })
+    conn.close()
+
+
+def run_isolated(func, *args):
+    """
+    Runs `func(*args)` in a forked child process and returns its wall time,
+    peak RSS and RSS growth, so each measurement starts from a clean heap.
+    """
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child, args=(child_conn, func, args))
+    process.start()
+    # Only the child holds the write end now, so recv() sees EOF if it dies
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        process.join()
+        raise CommandError(f"{func.__name__} failed in its benchmark process (exit code {process.exitcode}).")
+    finally:
+        parent_conn.close()
+    process.join()
+    return result
+
+
+def scratch_writer(directory, name):
+    """
+    A rows file writer for benchmark output under `directory` rather than
+    MEDIA_ROOT.
+    """
+    return ColumnStoreWriter(name=name, storage=FileSystemStorage(location=directory))
+
+
+def percentile(values, q):
+    """
+    The `q`th percentile (0-100) of `values`, nearest rank.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def git_commit():
+    """
+    The checked-out commit, with "-dirty" if the tree has changes, or None
+    outside a git checkout.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+class BenchmarkResults:
+    """
+    The measurements of one benchmark run. Each result is identified by its
+    name and row count; `seconds` is the number compared between runs.
+    """
+
+    def __init__(self, benchmark, options=None):
+        self.benchmark = benchmark
+        self.options = {key: value for key, value in (options or {}).items()
+                        if key not in ('stdout', 'stderr', 'output')}
+        self.results = []
+
+    def add(self, name, seconds, rows=None, **metrics):
+        self.results.append({'name': name, 'rows': rows, 'seconds': seconds, **metrics})
+
+    def as_dict(self):
+        return {
+            'benchmark': self.benchmark,
+            'commit': git_commit(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'options': self.options,
+            'results': self.results,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, default=str)
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Base of the benchmark commands. Results added to `self.results` are
+    written as JSON when the command runs with --output.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--output', metavar='PATH', help='Also write the results as JSON to PATH')
+        return parser
+
+    def execute(self, *args, **options):
+        self.results = BenchmarkResults(self.__module__.rsplit('.', 1)[-1], options)
+        output = super().execute(*args, **options)
+        if options.get('output'):
+            self.results.write(options['output'])
+            self.stdout.write(f"Results written to {options['output']}")
+        return output
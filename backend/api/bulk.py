@@ -0,0 +1,277 @@
+"""
+Bulk uploads: many CSVs in one request, sent as multipart files or packed
+in zip/tar archives.
+
+Files are staged to a temporary directory and hashed on the way. Content
+already stored (or repeated within the batch) is reused as for single
+uploads. The rest is parsed concurrently in a process pool, each worker
+writing its rows file and returning the summary and per-equipment
+records. The datasets are then inserted together in one transaction.
+"""
+import hashlib
+import multiprocessing
+import os
+import posixpath
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .equipment import EquipmentAccumulator, equipment_stats_objects, stored_records
+from .formats import FORMAT_SUFFIXES, detect_format
+from .ingest import ingest_stream, lock_sources, rows_file_missing
+from .metrics import span
+from .models import DataSet, EquipmentStats
+from .schema import SchemaError
+from .storage import ColumnStoreWriter
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+COPY_BUFFER_SIZE = 1024 * 1024
+FILENAME_MAX_LENGTH = DataSet._meta.get_field('filename').max_length
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class BulkUploadError(ValueError):
+    pass
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _is_data_member(name):
+    base = os.path.basename(name)
+    return detect_format(base) is not None and not base.startswith(('.', '._')) and '__MACOSX' not in name
+
+
+def _member_name(name):
+    """
+    An archive member's path relative to the archive, which tells apart
+    files of the same name in different folders. Long paths keep their end.
+    """
+    name = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+    return name[-FILENAME_MAX_LENGTH:]
+
+
+def iter_sources(uploaded_files):
+    """
+    Yields (filename, size, file object) for every data file among the uploaded
+    files, looking inside archives. Sizes of archive members are the
+    uncompressed sizes the archive declares. Compressed CSV files count at
+    their compressed size here; each is held to UPLOAD_MAX_DECOMPRESSED_BYTES
+    when it is parsed.
+    """
+    for uploaded in uploaded_files:
+        name = uploaded.name
+        if name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(uploaded)
+            except zipfile.BadZipFile:
+                raise BulkUploadError(f"{name} is not a valid zip archive.")
+            with archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_data_member(info.filename):
+                        with archive.open(info) as member:
+                            yield _member_name(info.filename), info.file_size, member
+        elif is_archive(name):
+            try:
+                archive = tarfile.open(fileobj=uploaded, mode='r:*')
+            except tarfile.TarError:
+                raise BulkUploadError(f"{name} is not a valid tar archive.")
+            with archive:
+                for member in archive:
+                    if member.isfile() and _is_data_member(member.name):
+                        yield _member_name(member.name), member.size, archive.extractfile(member)
+        elif detect_format(name) is not None:
+            yield name, uploaded.size, uploaded
+        else:
+            raise BulkUploadError(f"{name} is neither a supported data file nor a zip/tar archive.")
+
+
+def stage_files(uploaded_files, directory):
+    """
+    Copies every data file into `directory`, hashing it on the way, within the
+    BULK_UPLOAD_MAX_FILES and BULK_UPLOAD_MAX_BYTES limits.
+    """
+    staged, total = [], 0
+    for filename, size, source in iter_sources(uploaded_files):
+        if len(staged) >= settings.BULK_UPLOAD_MAX_FILES:
+            raise BulkUploadError(f"A bulk upload may contain at most {settings.BULK_UPLOAD_MAX_FILES} files.")
+        total += size
+        if total > settings.BULK_UPLOAD_MAX_BYTES:
+            raise BulkUploadError("The uploaded files are too large once extracted.")
+        # The staged name keeps the suffix that identifies the format
+        path = os.path.join(directory, f"{len(staged)}{FORMAT_SUFFIXES[detect_format(filename)][0]}")
+        digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b''):
+                digest.update(block)
+                f.write(block)
+        staged.append({'filename': filename, 'path': path, 'content_hash': digest.hexdigest()})
+    return staged
+
+
+def parse_file(path):
+    """
+    Parses one staged file into a rows file. Runs in a worker process and
+    never touches the database.
+    """
+    writer = ColumnStoreWriter()
+    equipment = EquipmentAccumulator()
+    try:
+        with open(path, 'rb') as f:
+            summary = ingest_stream(f, writer, equipment=equipment, fmt=detect_format(path))
+    except SchemaError as e:
+        writer.discard()
+        return {'error': e.message, 'errors': e.errors}
+    except Exception as e:
+        writer.discard()
+        return {'error': f"An unexpected error occurred: {str(e)}", 'errors': []}
+    return {'summary': summary, 'rows_file': writer.name, 'equipment': equipment.records()}
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the web process has threads and
+            # open database connections
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.BULK_UPLOAD_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def parse_files(paths):
+    """
+    Parses staged files concurrently, in input order. With
+    BULK_UPLOAD_WORKERS of 1 or less they are parsed in this process.
+    """
+    if settings.BULK_UPLOAD_WORKERS <= 1 or len(paths) <= 1:
+        return [parse_file(path) for path in paths]
+    try:
+        chunksize = max(1, len(paths) // (settings.BULK_UPLOAD_WORKERS * 4))
+        return list(_get_pool().map(parse_file, paths, chunksize=chunksize))
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+
+
+def _find_existing(hashes):
+    existing = {}
+    datasets = (DataSet.objects.filter(content_hash__in=hashes).exclude(rows_file='')
+                .only('id', 'summary', 'rows_file', 'content_hash'))
+    for dataset in datasets:
+        if dataset.content_hash not in existing and dataset.rows_file.storage.exists(dataset.rows_file.name):
+            existing[dataset.content_hash] = dataset
+    return existing
+
+
+def create_datasets(user, uploaded_files):
+    """
+    Ingests every CSV in `uploaded_files` for `user`. Returns one result per
+    file, in order: the new dataset, or the error that rejected the file.
+    Files whose stored copy is deleted while the batch is in flight are
+    parsed after all, in a second round.
+    """
+    with tempfile.TemporaryDirectory(prefix='bulk-', dir=settings.FILE_UPLOAD_TEMP_DIR) as directory:
+        with span('stage'):
+            staged = stage_files(uploaded_files, directory)
+            existing = _find_existing({item['content_hash'] for item in staged})
+
+        results, parsed, pending = {}, {}, staged
+        try:
+            while pending:
+                to_parse = {}
+                for item in pending:
+                    if item['content_hash'] not in existing and item['content_hash'] not in parsed:
+                        to_parse.setdefault(item['content_hash'], item['path'])
+                with span('parse_files'):
+                    parsed.update(zip(to_parse, parse_files(list(to_parse.values()))))
+                with span('db_insert'):
+                    inserted, lost = _insert(user, pending, existing, parsed)
+                results.update(inserted)
+                for content_hash in lost:
+                    del existing[content_hash]
+                pending = [item for item in pending if item['content_hash'] in lost]
+        except Exception:
+            stored = {result['dataset'].rows_file.name for result in results.values() if 'dataset' in result}
+            for result in parsed.values():
+                if 'rows_file' in result and result['rows_file'] not in stored:
+                    default_storage.delete(result['rows_file'])
+            raise
+    return [results[id(item)] for item in staged]
+
+
+def _insert(user, staged, existing, parsed):
+    """
+    Inserts the datasets for `staged` in one transaction. Returns their
+    results keyed by the id() of each staged item, and the content hashes
+    whose existing rows file disappeared; those files are left out.
+    """
+    results, datasets, sources = {}, [], {}
+    with transaction.atomic():
+        reused = {item['content_hash']: existing[item['content_hash']]
+                  for item in staged if item['content_hash'] in existing}
+        locked = lock_sources(reused.values())
+        lost = {content_hash for content_hash, cached in reused.items() if cached.pk not in locked}
+        for item in staged:
+            if item['content_hash'] in lost:
+                continue
+            cached = existing.get(item['content_hash'])
+            parse = parsed.get(item['content_hash'], {})
+            if cached is None and 'error' in parse:
+                results[id(item)] = {'filename': item['filename'], 'status': 'failed',
+                                     'error': parse['error'], 'errors': parse['errors']}
+                continue
+            dataset = DataSet(
+                user=user,
+                filename=item['filename'],
+                summary=cached.summary if cached else parse['summary'],
+                rows_file=cached.rows_file.name if cached else parse['rows_file'],
+                content_hash=item['content_hash'],
+            )
+            datasets.append(dataset)
+            sources[id(dataset)] = cached
+            results[id(item)] = {'filename': item['filename'], 'status': 'created', 'dataset': dataset}
+
+        DataSet.objects.bulk_create(datasets, batch_size=500)
+        copied = stored_records([cached for cached in sources.values() if cached is not None])
+        stats = []
+        for dataset in datasets:
+            cached = sources[id(dataset)]
+            if cached is not None:
+                records = copied.get(cached.pk, [])
+            else:
+                records = parsed[dataset.content_hash]['equipment']
+            stats.extend(equipment_stats_objects(dataset, records))
+        EquipmentStats.objects.bulk_create(stats, batch_size=1000)
+
+    gone = {content_hash for content_hash, cached in reused.items()
+            if content_hash not in lost and rows_file_missing(cached)}
+    if gone:
+        DataSet.objects.filter(pk__in=[dataset.pk for dataset in datasets if dataset.content_hash in gone]).delete()
+        results = {key: result for key, result in results.items()
+                   if 'dataset' not in result or result['dataset'].content_hash not in gone}
+    return results, lost | gone
@@ -0,0 +1,158 @@
+"""
+HTTP caching of dataset resources.
+
+A dataset never changes after upload, so its id and content hash give a
+strong ETag and its upload time the Last-Modified date. Views answer
+conditional requests from that metadata alone, before any rows are read.
+
+Rendered detail responses are also kept in RESPONSE_CACHE_DIR, next to
+their brotli/gzip encodings, so a full repeat fetch is a file read rather
+than a re-serialization of every row. Async views use
+`acached_response`, which does the file work on worker threads.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .asyncviews import offload
+from .filecache import FileCache
+from .middleware import ENCODERS, choose_encoding
+
+# Bump when the serialized form of a dataset changes, to invalidate ETags
+RESPONSE_VERSION = 1
+VALIDATOR_FIELDS = ('id', 'content_hash', 'rows_file', 'uploaded_at')
+IMMUTABLE = 'private, max-age=31536000, immutable'
+REVALIDATE = 'private, no-cache'
+
+
+def _digest(*parts):
+    return hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+
+def dataset_etag(dataset, *variant):
+    """
+    Strong ETag of a dataset representation. `variant` distinguishes
+    different views of the same dataset, such as query parameters.
+    """
+    source = dataset.content_hash or dataset.rows_file.name or ''
+    # The upload time guards against ids reused after a database reset
+    uploaded = dataset.uploaded_at.isoformat()
+    return f'"{dataset.pk}-{_digest(RESPONSE_VERSION, source, uploaded, *variant)}"'
+
+
+def list_etag(user, datasets):
+    return f'"{_digest(RESPONSE_VERSION, user.pk, *(dataset_etag(dataset) for dataset in datasets))}"'
+
+
+def set_validators(response, etag, last_modified=None, cache_control=REVALIDATE):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def conditional_response(request, etag, last_modified=None, cache_control=REVALIDATE):
+    """
+    A 304 (or 412) when the request's conditions say so, else None.
+    """
+    response = get_conditional_response(
+        request, etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified, cache_control)
+    return response
+
+
+class ResponseCache(FileCache):
+    """
+    Size-bounded LRU cache of rendered JSON responses in RESPONSE_CACHE_DIR.
+    """
+    suffix = '.json'
+
+    def __init__(self, directory=None, max_bytes=None):
+        super().__init__(directory or settings.RESPONSE_CACHE_DIR,
+                         settings.RESPONSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+
+def cached_response(request, dataset, etag, render, cache_control=IMMUTABLE):
+    """
+    Serves the JSON body of `dataset` from the response cache, calling
+    `render` for the identity bytes on a miss. The encoding the client
+    prefers is made from the identity file on first use.
+    """
+    cache, key = ResponseCache(), _response_key(etag)
+    identity = cache.get(dataset.pk, key)
+    if identity is None:
+        identity = cache.put(dataset.pk, key, render())
+    path, coding = encoded_file(request, cache, dataset, key, identity)
+    return cached_file_response(FileResponse(open(path, 'rb'), content_type='application/json'),
+                                dataset, etag, coding, cache_control)
+
+
+async def acached_response(request, dataset, etag, render, cache_control=IMMUTABLE):
+    """
+    cached_response for async views, where `render` is a coroutine. The
+    cache files are read and written on worker threads. Each server gets
+    the body in the form it streams: an ASGI server an async iterator
+    that reads on a worker thread, a WSGI server the file itself. Either
+    would read the other kind into memory whole.
+    """
+    cache, key = ResponseCache(), _response_key(etag)
+    identity = await offload(cache.get)(dataset.pk, key)
+    if identity is None:
+        identity = await offload(cache.put)(dataset.pk, key, await render())
+    path, coding = await offload(encoded_file)(request, cache, dataset, key, identity)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        response = StreamingHttpResponse(_read_file(path), content_type='application/json')
+        response['Content-Length'] = str(await offload(os.path.getsize)(path))
+    else:
+        response = FileResponse(await offload(open)(path, 'rb'), content_type='application/json')
+    return cached_file_response(response, dataset, etag, coding, cache_control)
+
+
+def _response_key(etag):
+    return etag.strip('"').split('-', 1)[1]
+
+
+def encoded_file(request, cache, dataset, key, identity):
+    """
+    The cached file to send for the client's Accept-Encoding, and its
+    content coding (None for the identity file).
+    """
+    coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if coding is None:
+        return identity, None
+    encoded = cache.get(dataset.pk, f"{key}.{coding}")
+    if encoded is None:
+        with open(identity, 'rb') as f:
+            content = f.read()
+        if len(content) >= settings.COMPRESSION_MIN_BYTES:
+            encoded = cache.put(dataset.pk, f"{key}.{coding}", ENCODERS[coding](content), replace=False)
+    return (encoded, coding) if encoded else (identity, None)
+
+
+def cached_file_response(response, dataset, etag, coding, cache_control):
+    response.headers.pop('Content-Disposition', None)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if coding is not None:
+        response['Content-Encoding'] = coding
+        # Same rule as CompressionMiddleware: encoded bytes get a weak ETag
+        etag = 'W/' + etag
+    return set_validators(response, etag, dataset.uploaded_at, cache_control)
+
+
+async def _read_file(path, block_size=FileResponse.block_size):
+    with open(path, 'rb') as f:
+        read = offload(f.read)
+        while True:
+            block = await read(block_size)
+            if not block:
+                break
+            yield block
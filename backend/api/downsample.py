@@ -0,0 +1,129 @@
+"""
+Downsampling of dataset rows for charts.
+
+Charts never need every row of a large dataset. These helpers stream the
+columnar rows file and keep a bounded number of points, so the cost of a
+chart depends on the point budget rather than on the dataset size.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .storage import ColumnStoreReader, to_python
+
+SCATTER_METHODS = ('sample', 'bins')
+
+
+def sample_points(reader, columns, budget, total=None, seed=0):
+    """
+    Uniform random sample of at most `budget` rows of `columns`, in file
+    order. `total` (the row count, when known from the summary) lets each
+    chunk be thinned as it is read instead of sampling afterwards.
+    """
+    rng = np.random.default_rng(seed)
+    rate = 1.0 if not total else min(1.0, budget * 1.1 / total)
+    parts = {column: [] for column in columns}
+    for _, chunk in reader.iter_chunks(columns):
+        length = len(chunk[columns[0]])
+        keep = rng.random(length) < rate if rate < 1.0 else slice(None)
+        for column in columns:
+            parts[column].append(chunk[column][keep])
+    points = ColumnStoreReader._concat(parts)
+    length = len(points[columns[0]]) if columns else 0
+    if length > budget:
+        keep = np.sort(rng.choice(length, budget, replace=False))
+        points = {column: values[keep] for column, values in points.items()}
+    return points
+
+
+def dataset_points(dataset, columns, budget, seed=0):
+    """
+    `sample_points` over a dataset's rows file. Datasets without rows give
+    empty arrays.
+    """
+    if not dataset.rows_file:
+        return {column: np.array([]) for column in columns}
+    with dataset.rows_file.open('rb') as f:
+        reader = ColumnStoreReader(f)
+        present = [column for column in columns if column in reader.columns]
+        points = sample_points(reader, present, budget, dataset.summary.get('total_count'), seed)
+    return {column: points.get(column, np.array([])) for column in columns}
+
+
+def histogram_points(reader, x, y, budget, bounds=None):
+    """
+    2D histogram of `x` against `y` on a grid of about `budget` cells,
+    accumulated chunk by chunk. Returns the centres and counts of the
+    non-empty cells. `bounds` ((x0, x1), (y0, y1)) saves a pass over the
+    data when the range is already known.
+    """
+    side = max(1, int(np.sqrt(budget)))
+    if bounds is None:
+        bounds = _bounds(reader, x, y)
+    counts = np.zeros((side, side), dtype=np.int64)
+    for _, chunk in reader.iter_chunks([x, y]):
+        xs, ys = chunk[x], chunk[y]
+        finite = np.isfinite(xs) & np.isfinite(ys)
+        counts += np.histogram2d(xs[finite], ys[finite], bins=side, range=bounds)[0].astype(np.int64)
+    x_edges = np.linspace(*bounds[0], side + 1)
+    y_edges = np.linspace(*bounds[1], side + 1)
+    ix, iy = np.nonzero(counts)
+    return {
+        x: (x_edges[ix] + x_edges[ix + 1]) / 2,
+        y: (y_edges[iy] + y_edges[iy + 1]) / 2,
+        'count': counts[ix, iy],
+    }
+
+
+def _bounds(reader, x, y):
+    low, high = np.full(2, np.inf), np.full(2, -np.inf)
+    for _, chunk in reader.iter_chunks([x, y]):
+        for i, column in enumerate((x, y)):
+            values = chunk[column][np.isfinite(chunk[column])]
+            if len(values):
+                low[i], high[i] = min(low[i], values.min()), max(high[i], values.max())
+    return tuple(_padded(low[i], high[i]) for i in range(2))
+
+
+def _padded(low, high):
+    if not np.isfinite(low):
+        return 0.0, 1.0
+    if low == high:
+        return float(low) - 0.5, float(high) + 0.5
+    return float(low), float(high)
+
+
+def _summary_bounds(summary, x, y):
+    overall = summary.get('statistics', {}).get('overall', {})
+    try:
+        bounds = [_padded(overall[column]['min'], overall[column]['max']) for column in (x, y)]
+    except (KeyError, TypeError):
+        return None
+    # The summary rounds float32 readings to their shortest decimal, which can
+    # sit just inside the stored value, so widen the range a touch
+    return tuple((low - (high - low) * 1e-6, high + (high - low) * 1e-6) for low, high in bounds)
+
+
+def scatter_points(dataset, x, y, budget, method='sample'):
+    """
+    Downsampled `x`/`y` cloud of a dataset, as lists ready to serialize:
+    either a uniform sample of at most `budget` points or the non-empty
+    cells of a histogram with about `budget` cells, with their counts.
+    Results are cached per rows file, so repeat uploads share them.
+    """
+    key = f"scatter:{dataset.rows_file.name}:{x}:{y}:{method}:{budget}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    if not dataset.rows_file:
+        points = {x: np.array([]), y: np.array([])}
+    elif method == 'bins':
+        with dataset.rows_file.open('rb') as f:
+            points = histogram_points(ColumnStoreReader(f), x, y, budget,
+                                      _summary_bounds(dataset.summary, x, y))
+    else:
+        points = dataset_points(dataset, [x, y], budget)
+    result = {name: to_python(values) for name, values in points.items()}
+    cache.set(key, result, settings.SCATTER_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,148 @@
+"""
+Per-equipment statistics across uploads.
+
+Ingest groups every chunk by `Equipment Name` with the same moment merge as
+the summary engine and stores one EquipmentStats row per equipment and
+upload. Trend queries then read those rows through their (user, name,
+uploaded_at) index and never touch the rows files.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .models import EquipmentStats
+from .schema import EQUIPMENT_COLUMN
+from .summary import (
+    AGGREGATES, GROUP_COLUMN, MISSING_GROUP, NUMERIC_COLUMNS, _clean, chunk_moments,
+    group_codes, merge_moments, single_precision_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+STAT_NAMES = ('mean', 'min', 'max', 'std')
+METRIC_FIELDS = {column: column.lower() for column in NUMERIC_COLUMNS}
+
+
+def stat_field(column, stat):
+    return f"{METRIC_FIELDS[column]}_{stat}"
+
+
+class EquipmentAccumulator:
+    """
+    Collects per-equipment moments chunk by chunk. Files without an
+    equipment column, or with more than EQUIPMENT_STATS_MAX_GROUPS distinct
+    names (one reading per row rather than per machine), are not tracked.
+    """
+
+    def __init__(self, max_groups=None):
+        self.max_groups = settings.EQUIPMENT_STATS_MAX_GROUPS if max_groups is None else max_groups
+        self.moments = None
+        self.types = pd.Series(dtype=object)
+        self.single = set()
+        self.enabled = True
+
+    def update(self, chunk):
+        if not self.enabled:
+            return
+        if EQUIPMENT_COLUMN not in chunk.columns:
+            self.enabled = False
+            return
+        self.moments = merge_moments(self.moments, chunk_moments(chunk, EQUIPMENT_COLUMN))
+        self.single |= single_precision_columns(chunk)
+        if len(self.moments['rows']) > self.max_groups:
+            logger.info("Not tracking equipment: more than %d distinct names", self.max_groups)
+            self.enabled, self.moments = False, None
+            return
+        if GROUP_COLUMN in chunk.columns:
+            codes, names = group_codes(chunk[EQUIPMENT_COLUMN])
+            groups, first = np.unique(codes, return_index=True)
+            types = pd.Series(chunk[GROUP_COLUMN].to_numpy()[first], index=names[groups])
+            self.types = self.types.combine_first(types)
+
+    def records(self):
+        """
+        One dict of EquipmentStats field values per equipment.
+        """
+        if not self.enabled or self.moments is None:
+            return []
+        values = {stat: AGGREGATES[stat].func(self.moments) for stat in STAT_NAMES}
+        records = []
+        for name, rows in self.moments['rows'].items():
+            if name == MISSING_GROUP:
+                continue
+            equipment_type = self.types.get(name)
+            record = {
+                'equipment_name': str(name)[:255],
+                'equipment_type': '' if pd.isna(equipment_type) else str(equipment_type)[:100],
+                'count': int(rows),
+            }
+            for column in NUMERIC_COLUMNS:
+                for stat in STAT_NAMES:
+                    single = AGGREGATES[stat].observed and column in self.single
+                    record[stat_field(column, stat)] = _clean(values[stat].at[name, column], single)
+            records.append(record)
+        return records
+
+
+def equipment_stats_objects(dataset, records):
+    return [
+        EquipmentStats(user_id=dataset.user_id, dataset=dataset, filename=dataset.filename,
+                       uploaded_at=dataset.uploaded_at, **record)
+        for record in records
+    ]
+
+
+def store_equipment_stats(dataset, records):
+    EquipmentStats.objects.bulk_create(equipment_stats_objects(dataset, records), batch_size=1000)
+
+
+def stored_records(sources):
+    """
+    The stored per-equipment rows of the `sources` datasets, as records
+    keyed by dataset id.
+    """
+    fields = ['equipment_name', 'equipment_type', 'count'] + [
+        stat_field(column, stat) for column in NUMERIC_COLUMNS for stat in STAT_NAMES
+    ]
+    records = {}
+    for row in EquipmentStats.objects.filter(dataset__in=sources).values('dataset_id', *fields):
+        records.setdefault(row.pop('dataset_id'), []).append(row)
+    return records
+
+
+def copy_equipment_stats(source, dataset):
+    """
+    Repeats a previous upload's per-equipment rows for an identical upload.
+    """
+    store_equipment_stats(dataset, stored_records([source]).get(source.pk, []))
+
+
+def equipment_trend(user, name, columns=None, since=None, limit=None):
+    """
+    The equipment's statistics per upload, oldest first, plus the drift of
+    each column's mean between the first and last upload.
+    """
+    columns = columns or NUMERIC_COLUMNS
+    queryset = EquipmentStats.objects.filter(user=user, equipment_name=name)
+    if since is not None:
+        queryset = queryset.filter(uploaded_at__gte=since)
+    fields = ['dataset_id', 'filename', 'uploaded_at', 'equipment_type', 'count'] + [
+        stat_field(column, stat) for column in columns for stat in STAT_NAMES
+    ]
+    rows = list(queryset.order_by('-uploaded_at').values(*fields)[:limit or settings.EQUIPMENT_TREND_LIMIT])
+    rows.reverse()
+
+    points = []
+    for row in rows:
+        point = {key: row[key] for key in ('dataset_id', 'filename', 'uploaded_at', 'equipment_type', 'count')}
+        for column in columns:
+            point[column] = {stat: row[stat_field(column, stat)] for stat in STAT_NAMES}
+        points.append(point)
+
+    drift = {}
+    for column in columns:
+        means = [point[column]['mean'] for point in points if point[column]['mean'] is not None]
+        drift[column] = means[-1] - means[0] if len(means) > 1 else None
+    return {'equipment_name': name, 'drift': drift, 'results': points}
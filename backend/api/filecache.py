@@ -0,0 +1,77 @@
+import os
+import tempfile
+
+
+class FileCache:
+    """
+    Size-bounded LRU cache of per-dataset files in a local directory.
+    Entries are named `<dataset id>-<key><suffix>`; reading one refreshes
+    its mtime, and writes evict the least recently used entries once the
+    directory grows past `max_bytes`.
+    """
+    suffix = ''
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, dataset_id, key):
+        return os.path.join(self.directory, f"{dataset_id}-{key}{self.suffix}")
+
+    def get(self, dataset_id, key):
+        """
+        Path of the cached file, or None. A hit counts as a use for LRU.
+        """
+        path = self.path(dataset_id, key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, dataset_id, key, content, replace=True):
+        """
+        Stores `content` and returns its path. With `replace`, the other
+        entries of the dataset are stale and removed.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(dataset_id, key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+        if replace:
+            self.discard(dataset_id, keep=path)
+        self.evict()
+        return path
+
+    def discard(self, dataset_id, keep=None):
+        """
+        Removes cached files of a dataset, except `keep`.
+        """
+        for entry in self._entries():
+            if entry.name.startswith(f"{dataset_id}-") and entry.path != keep:
+                self._remove(entry.path)
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            self._remove(entry.path)
+
+    def _entries(self):
+        try:
+            return [entry for entry in os.scandir(self.directory)
+                    if entry.is_file() and entry.name.endswith(self.suffix)]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,198 @@
+"""
+Upload formats.
+
+Besides plain CSV, uploads may be gzip or zstandard compressed CSV, which
+is decompressed as it is parsed, or Parquet and Arrow IPC (Feather) files,
+of which only the schema columns are read. Every format yields the same
+typed DataFrame chunks. pyarrow and zstandard are only imported when a
+file needs them.
+"""
+import gzip
+import io
+
+from django.conf import settings
+
+from .schema import SchemaError, coerce_frame, iter_validated_chunks, validate_columns, validate_header
+
+CSV, CSV_GZIP, CSV_ZSTD, PARQUET, ARROW = 'csv', 'csv.gz', 'csv.zst', 'parquet', 'arrow'
+FORMAT_SUFFIXES = {
+    CSV: ('.csv',),
+    CSV_GZIP: ('.csv.gz',),
+    CSV_ZSTD: ('.csv.zst', '.csv.zstd'),
+    PARQUET: ('.parquet', '.pq'),
+    ARROW: ('.arrow', '.feather', '.ipc', '.arrows'),
+}
+SUPPORTED_SUFFIXES = tuple(suffix for suffixes in FORMAT_SUFFIXES.values() for suffix in suffixes)
+COMPRESSED_CSV = (CSV_GZIP, CSV_ZSTD)
+DECOMPRESS_BUFFER_SIZE = 1024 * 1024
+
+
+def detect_format(filename):
+    name = filename.lower()
+    for fmt, suffixes in FORMAT_SUFFIXES.items():
+        if name.endswith(suffixes):
+            return fmt
+    return None
+
+
+def _require(module):
+    try:
+        return __import__(module, fromlist=['_'])
+    except ImportError:
+        raise SchemaError(f"This file format needs the {module.split('.')[0]} package, which is not installed.")
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    A rewindable, decompressed view of a gzip or zstandard file. Seeking
+    backwards restarts decompression, which only happens when a bad file
+    is rescanned for errors. Reading past UPLOAD_MAX_DECOMPRESSED_BYTES
+    raises SchemaError, so a small file cannot expand without bound.
+    """
+
+    def __init__(self, fileobj, fmt):
+        self._raw = fileobj
+        self._fmt = fmt
+        self._open()
+
+    def _open(self):
+        self._raw.seek(0)
+        self._position = 0
+        if self._fmt == CSV_GZIP:
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='rb')
+        else:
+            zstandard = _require('zstandard')
+            self._stream = zstandard.ZstdDecompressor().stream_reader(self._raw, closefd=False)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            data = self._stream.read(len(buffer))
+        except (OSError, EOFError, ValueError) as e:
+            raise SchemaError(f"Could not decompress file: {e}")
+        size = len(data)
+        if self._position + size > settings.UPLOAD_MAX_DECOMPRESSED_BYTES:
+            raise SchemaError("The file is too large once decompressed.")
+        buffer[:size] = data
+        self._position += size
+        return size
+
+    def tell(self):
+        return self._position
+
+    def source_tell(self):
+        """
+        Offset in the compressed file, for progress reporting.
+        """
+        return self._raw.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("can only seek from the start")
+        if offset < self._position:
+            self._open()
+        while self._position < offset:
+            if not self.read(min(DECOMPRESS_BUFFER_SIZE, offset - self._position)):
+                break
+        return self._position
+
+
+def open_csv(fileobj, fmt):
+    """
+    A readable CSV stream for a CSV upload, decompressing if needed.
+    """
+    if fmt in COMPRESSED_CSV:
+        return io.BufferedReader(DecompressingReader(fileobj, fmt), DECOMPRESS_BUFFER_SIZE)
+    return fileobj
+
+
+def source_position(stream):
+    """
+    How far into the uploaded bytes `stream` has read.
+    """
+    raw = getattr(stream, 'raw', None)
+    if isinstance(raw, DecompressingReader):
+        return raw.source_tell()
+    return stream.tell()
+
+
+def _frames(batches, columns, chunksize):
+    offset = 0
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunksize):
+            frame = batch.slice(start, chunksize).to_pandas()[columns]
+            yield coerce_frame(frame, offset)
+            offset += len(frame)
+
+
+def _parquet_batches(fileobj, chunksize):
+    parquet = _require('pyarrow.parquet')
+    try:
+        parquet_file = parquet.ParquetFile(fileobj)
+    except Exception as e:
+        raise SchemaError(f"Could not read Parquet file: {e}")
+    columns = validate_columns(parquet_file.schema_arrow.names)
+    return columns, parquet_file.iter_batches(batch_size=chunksize, columns=columns)
+
+
+def _arrow_batches(fileobj):
+    ipc = _require('pyarrow.ipc')
+    try:
+        schema_names = _open_ipc(ipc, fileobj).schema.names
+    except Exception as e:
+        raise SchemaError(f"Could not read Arrow file: {e}")
+    columns = validate_columns(schema_names)
+    # Project at read time so unused columns are never decoded
+    options = ipc.IpcReadOptions(included_fields=[schema_names.index(column) for column in columns])
+    reader = _open_ipc(ipc, fileobj, options)
+    if hasattr(reader, 'num_record_batches'):
+        return columns, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    return columns, reader
+
+
+def _open_ipc(ipc, fileobj, options=None):
+    # The random access file format first, then the streaming format
+    fileobj.seek(0)
+    try:
+        return ipc.open_file(fileobj, options=options)
+    except Exception:
+        fileobj.seek(0)
+        return ipc.open_stream(fileobj, options=options)
+
+
+def validate(fileobj, fmt):
+    """
+    Checks a file's columns without reading its data.
+    """
+    if fmt == PARQUET:
+        _parquet_batches(fileobj, settings.INGEST_CHUNK_SIZE)
+    elif fmt == ARROW:
+        _arrow_batches(fileobj)
+    else:
+        stream = open_csv(fileobj, fmt)
+        validate_header(stream)
+    fileobj.seek(0)
+
+
+def iter_frames(stream, fmt, chunksize=None):
+    """
+    Yields typed DataFrames of at most `chunksize` rows. CSV formats take
+    the stream from `open_csv`, columnar ones the uploaded file itself.
+    """
+    chunksize = chunksize or settings.INGEST_CHUNK_SIZE
+    if fmt == PARQUET:
+        columns, batches = _parquet_batches(stream, chunksize)
+    elif fmt == ARROW:
+        columns, batches = _arrow_batches(stream)
+    else:
+        yield from iter_validated_chunks(stream, chunksize)
+        return
+    yield from _frames(batches, columns, chunksize)
+
@@ -0,0 +1,225 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .equipment import EquipmentAccumulator, copy_equipment_stats, store_equipment_stats
+from .formats import CSV, iter_frames, open_csv, source_position, validate
+from .metrics import Stages, span
+from .models import DataSet
+from .schema import read_validated
+from .storage import ColumnStoreWriter
+from .summary import SummaryEngine, summarize
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.INGEST_THREADS, thread_name_prefix='ingest')
+        return _executor
+
+
+def hash_upload(uploaded_file):
+    """
+    SHA-256 of an uploaded file's bytes, read in the upload's own chunks.
+    The file is rewound afterwards so it can be parsed.
+    """
+    digest = hashlib.sha256()
+    for block in uploaded_file.chunks():
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def iter_chunks(fileobj, chunksize=None, fmt=CSV):
+    """
+    Yields typed, validated DataFrames of at most `chunksize` rows from an
+    uploaded file object in format `fmt`.
+    """
+    return iter_frames(open_csv(fileobj, fmt), fmt, chunksize or settings.INGEST_CHUNK_SIZE)
+
+
+def ingest_stream(fileobj, writer, chunksize=None, progress=None, equipment=None, fmt=CSV):
+    """
+    Reads `fileobj` in bounded chunks, persisting each one through `writer`
+    and folding it into the summary. Returns the finished summary.
+
+    `progress`, if given, is called after every chunk with the number of
+    rows processed so far and the current byte offset in `fileobj`, which
+    for compressed files counts compressed bytes.
+    `equipment`, an EquipmentAccumulator, also sees every chunk.
+    Time spent parsing, summarizing and storing is recorded per stage.
+    """
+    engine = SummaryEngine()
+    stages = Stages()
+    stream = open_csv(fileobj, fmt)
+    chunks = iter_frames(stream, fmt, chunksize)
+    while True:
+        with stages('parse'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with stages('summary'):
+            engine.update(chunk)
+            if equipment is not None:
+                equipment.update(chunk)
+        with stages('store'):
+            writer.write(chunk)
+        if progress is not None:
+            progress(engine.total_count, source_position(stream))
+    with stages('store'):
+        writer.close()
+    with stages('summary'):
+        summary = engine.result()
+    stages.record()
+    return summary
+
+
+def ingest_eager(fileobj, writer, progress=None, equipment=None, fmt=CSV):
+    """
+    Parses the whole file in one go; cheaper than chunking for small files.
+    Plain CSV only.
+    """
+    with span('parse'):
+        df = read_validated(fileobj)
+    with span('summary'):
+        summary = summarize(df)
+        if equipment is not None:
+            equipment.update(df)
+    with span('store'):
+        writer.write(df)
+        writer.close()
+    return summary
+
+
+def find_cached(content_hash):
+    """
+    An earlier dataset with byte-identical content, whose summary and
+    rows file a repeat upload can share instead of parsing again.
+    """
+    cached = (DataSet.objects.filter(content_hash=content_hash)
+              .exclude(rows_file='')
+              .only('summary', 'rows_file')
+              .first())
+    if cached is not None and cached.rows_file.storage.exists(cached.rows_file.name):
+        return cached
+    return None
+
+
+def lock_sources(sources):
+    """
+    Locks the rows of `sources`, datasets whose rows files new uploads are
+    about to share, until the transaction ends. Returns the pks of those
+    that still exist. While a source is locked, a concurrent delete cannot
+    remove the file before the new references commit.
+    """
+    pks = [source.pk for source in sources]
+    return set(DataSet.objects.select_for_update().filter(pk__in=pks).values_list('pk', flat=True))
+
+
+def rows_file_missing(dataset):
+    """
+    Whether a shared rows file is gone after all. SQLite has no row locks,
+    so reuses are checked again once they have committed.
+    """
+    return not dataset.rows_file.storage.exists(dataset.rows_file.name)
+
+
+def reuse_cached(user, filename, content_hash, cached):
+    """
+    A new dataset sharing the rows file of `cached`, or None if `cached`
+    was deleted meanwhile.
+    """
+    with transaction.atomic():
+        if not lock_sources([cached]):
+            return None
+        dataset = DataSet.objects.create(
+            user=user,
+            filename=filename,
+            summary=cached.summary,
+            rows_file=cached.rows_file.name,
+            content_hash=content_hash
+        )
+        copy_equipment_stats(cached, dataset)
+    if rows_file_missing(dataset):
+        dataset.delete()
+        return None
+    return dataset
+
+
+def create_dataset(user, fileobj, filename, streaming=True, progress=None, fmt=CSV):
+    """
+    Hashes, parses, summarizes and stores an uploaded file as a new DataSet
+    owned by `user`, along with its per-equipment statistics. Repeat uploads
+    of identical content reuse the stored rows and aggregates instead of
+    being parsed again.
+    """
+    with span('validate'):
+        validate(fileobj, fmt)
+    with span('hash'):
+        content_hash = hash_upload(fileobj)
+        cached = find_cached(content_hash)
+    if cached is not None:
+        with span('db_insert'):
+            dataset = reuse_cached(user, filename, content_hash, cached)
+        if dataset is not None:
+            return dataset
+
+    ingest = ingest_stream if streaming or fmt != CSV else ingest_eager
+    writer = ColumnStoreWriter()
+    equipment = EquipmentAccumulator()
+    try:
+        summary = ingest(fileobj, writer, progress=progress, equipment=equipment, fmt=fmt)
+        return insert_dataset(user, filename, summary, writer, content_hash, equipment)
+    except Exception:
+        writer.discard()
+        raise
+
+
+async def acreate_dataset(user, fileobj, filename, streaming=True, fmt=CSV):
+    """
+    create_dataset for async views. Validating, hashing and parsing run on
+    the INGEST_THREADS pool and the queries on Django's sync thread, so the
+    event loop never waits on an upload and uploads parse side by side.
+    """
+    offload = sync_to_async(thread_sensitive=False, executor=_get_executor())
+    with span('validate'):
+        await offload(validate)(fileobj, fmt)
+    with span('hash'):
+        content_hash = await offload(hash_upload)(fileobj)
+        cached = await sync_to_async(find_cached)(content_hash)
+    if cached is not None:
+        with span('db_insert'):
+            dataset = await sync_to_async(reuse_cached)(user, filename, content_hash, cached)
+        if dataset is not None:
+            return dataset
+
+    ingest = ingest_stream if streaming or fmt != CSV else ingest_eager
+    writer = ColumnStoreWriter()
+    equipment = EquipmentAccumulator()
+    try:
+        summary = await offload(ingest)(fileobj, writer, equipment=equipment, fmt=fmt)
+        return await sync_to_async(insert_dataset)(user, filename, summary, writer, content_hash, equipment)
+    except Exception:
+        await offload(writer.discard)()
+        raise
+
+
+def insert_dataset(user, filename, summary, writer, content_hash, equipment):
+    with span('db_insert'), transaction.atomic():
+        dataset = DataSet.objects.create(
+            user=user,
+            filename=filename,
+            summary=summary,
+            rows_file=writer.name,
+            content_hash=content_hash
+        )
+        store_equipment_stats(dataset, equipment.records())
+    return dataset
@@ -0,0 +1,152 @@
+"""
+Background processing of uploads.
+
+An async upload is saved to storage and recorded as an UploadJob. Jobs are
+picked up by the in-process worker pool (UPLOAD_JOB_WORKERS threads) or by
+`manage.py run_upload_jobs` in a separate process. A job is claimed with a
+conditional UPDATE, so any number of workers can share the table without a
+broker.
+
+Jobs whose worker died (a restarted web process, a killed command) are
+found by their lack of progress for UPLOAD_JOB_REQUEUE_AFTER seconds and
+run again, by the command's loop or, for the in-process pool, whenever
+an upload is queued or a job is polled.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .formats import detect_format
+from .ingest import create_dataset
+from .models import UploadJob
+from .reports import schedule_report
+from .retention import schedule_prune
+from .schema import SchemaError
+
+logger = logging.getLogger(__name__)
+
+# Seconds between stale job checks of the in-process pool
+RECOVERY_INTERVAL = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_recovery = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.UPLOAD_JOB_WORKERS, thread_name_prefix='upload-job'
+            )
+        return _executor
+
+
+def claim(job_id):
+    """
+    Marks a pending job as running. Returns False if another worker got it first.
+    """
+    # update() skips auto_now: without the timestamp a job that queued for
+    # long would look stale, and be requeued, as soon as it is claimed
+    return UploadJob.objects.filter(pk=job_id, status=UploadJob.PENDING).update(
+        status=UploadJob.RUNNING, updated_at=timezone.now()
+    ) == 1
+
+
+def run_job(job_id):
+    """
+    Claims and processes one job, recording progress in rows and bytes.
+    """
+    if not claim(job_id):
+        return
+    job = UploadJob.objects.get(pk=job_id)
+
+    def progress(rows, position):
+        UploadJob.objects.filter(pk=job_id).update(
+            rows_processed=rows, bytes_processed=position, updated_at=timezone.now()
+        )
+
+    try:
+        with job.upload.open('rb') as f:
+            dataset = create_dataset(job.user, f, job.filename, streaming=True, progress=progress,
+                                     fmt=detect_format(job.filename))
+    except SchemaError as e:
+        job.status, job.error, job.errors = UploadJob.FAILED, e.message, e.errors
+    except KeyError as e:
+        job.status, job.error = UploadJob.FAILED, f"Missing column in CSV file: {e}"
+    except Exception as e:
+        logger.exception("Upload job %s failed", job_id)
+        job.status, job.error = UploadJob.FAILED, f"An unexpected error occurred: {str(e)}"
+    else:
+        job.status, job.dataset = UploadJob.SUCCEEDED, dataset
+        job.rows_processed = dataset.summary.get('total_count', 0)
+        job.bytes_processed = job.bytes_total
+        schedule_prune(job.user_id)
+        schedule_report(dataset.pk)
+    job.upload.delete(save=False)
+    job.save(update_fields=['status', 'error', 'errors', 'dataset', 'rows_processed', 'bytes_processed', 'upload', 'updated_at'])
+
+
+def _run_in_pool(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def enqueue(job):
+    """
+    Hands the job to the in-process pool once the current transaction
+    commits. With UPLOAD_JOB_WORKERS = 0 jobs wait for run_upload_jobs.
+    """
+    if settings.UPLOAD_JOB_WORKERS > 0:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_pool, job.pk))
+        recover_stale_jobs()
+
+
+def requeue_stale(seconds):
+    """
+    Puts running jobs without progress for `seconds` back in the queue;
+    their worker is presumed dead. Returns how many were requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return UploadJob.objects.filter(status=UploadJob.RUNNING, updated_at__lt=cutoff).update(
+        status=UploadJob.PENDING, rows_processed=0, bytes_processed=0
+    )
+
+
+def recover_stale_jobs():
+    """
+    Requeues jobs left behind by a dead worker and hands them, with any
+    other pending job that has waited as long, to the in-process pool.
+    Jobs still queued elsewhere are harmless duplicates: only one worker
+    can claim them. Runs at most once per RECOVERY_INTERVAL.
+    """
+    global _last_recovery
+    if settings.UPLOAD_JOB_WORKERS <= 0:
+        return
+    now = time.monotonic()
+    with _executor_lock:
+        if _last_recovery is not None and now - _last_recovery < RECOVERY_INTERVAL:
+            return
+        _last_recovery = now
+    seconds = settings.UPLOAD_JOB_REQUEUE_AFTER
+    if requeue_stale(seconds):
+        logger.warning("Requeued upload jobs without progress for %d seconds", seconds)
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    stale = UploadJob.objects.filter(status=UploadJob.PENDING, updated_at__lt=cutoff).values_list('pk', flat=True)
+    for job_id in stale:
+        _get_executor().submit(_run_in_pool, job_id)
+
+
+def pending_job_ids(limit=None):
+    queryset = (UploadJob.objects.filter(status=UploadJob.PENDING)
+                .order_by('created_at').values_list('pk', flat=True))
+    return list(queryset[:limit] if limit else queryset)
@@ -0,0 +1,25 @@
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.equipment import EquipmentAccumulator, store_equipment_stats
+from api.models import DataSet
+from api.storage import ColumnStoreReader
+
+
+class Command(BaseCommand):
+    help = 'Computes per-equipment statistics for datasets uploaded before they existed'
+
+    def handle(self, *args, **options):
+        datasets = (DataSet.objects.filter(equipment_stats__isnull=True)
+                    .exclude(rows_file='').order_by('uploaded_at'))
+        filled = 0
+        for dataset in datasets.iterator():
+            equipment = EquipmentAccumulator()
+            with dataset.rows_file.open('rb') as f:
+                for _, chunk in ColumnStoreReader(f).iter_chunks():
+                    equipment.update(pd.DataFrame(chunk))
+            with transaction.atomic():
+                store_equipment_stats(dataset, equipment.records())
+            filled += 1
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {filled} dataset(s).'))
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def load(path):
+    try:
+        with open(path) as f:
+            run = json.load(f)
+    except (OSError, ValueError) as e:
+        raise CommandError(f"Cannot read benchmark results from {path}: {e}")
+    return run, {(result['name'], result.get('rows')): result['seconds'] for result in run['results']}
+
+
+class Command(BaseCommand):
+    help = ('Compares two benchmark results written with --output and lists the '
+            'measurements that got slower by more than the threshold.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline')
+        parser.add_argument('candidate')
+        parser.add_argument('--threshold', type=float, default=10, help='Allowed slowdown, in percent')
+
+    def handle(self, *args, **options):
+        baseline_run, baseline = load(options['baseline'])
+        candidate_run, candidate = load(options['candidate'])
+        if baseline_run['benchmark'] != candidate_run['benchmark']:
+            raise CommandError(f"Cannot compare {baseline_run['benchmark']} results with "
+                               f"{candidate_run['benchmark']} results.")
+        self.stdout.write(f"{baseline_run['benchmark']}: {baseline_run['commit']} -> {candidate_run['commit']}")
+
+        regressions = 0
+        for key, before in baseline.items():
+            after = candidate.get(key)
+            if after is None or before is None:
+                continue
+            name, rows = key
+            change = (after - before) / before * 100 if before else 0.0
+            regressed = change > options['threshold']
+            regressions += regressed
+            label = f"{name} ({rows:,} rows)" if rows is not None else name
+            line = f"{label:<45}{before * 1000:>12.1f} ms {after * 1000:>12.1f} ms {change:>+8.1f}%"
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+        for key in candidate.keys() - baseline.keys():
+            self.stdout.write(f"{key[0]}: new, {candidate[key] * 1000:.1f} ms")
+
+        if regressions:
+            raise CommandError(f"{regressions} measurement(s) slower by more than {options['threshold']:g}%.")
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
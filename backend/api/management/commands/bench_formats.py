@@ -0,0 +1,100 @@
+import gzip
+import io
+import os
+import tempfile
+
+from api.benchmarks import (
+    BenchmarkCommand, GENERATE_BLOCK_SIZE, generate_frame, load_templates, run_isolated, scratch_writer,
+)
+from api.formats import ARROW, CSV, CSV_GZIP, CSV_ZSTD, FORMAT_SUFFIXES, PARQUET
+from api.ingest import ingest_stream
+
+FORMATS = (CSV, CSV_GZIP, CSV_ZSTD, PARQUET, ARROW)
+
+
+def format_ingest(path, fmt):
+    writer = scratch_writer(os.path.dirname(path), f'{os.path.basename(path)}.cols')
+    try:
+        with open(path, 'rb') as f:
+            ingest_stream(f, writer, fmt=fmt)
+    finally:
+        writer.discard()
+
+
+class FormatWriters:
+    """
+    Writes the same generated blocks to one file per format.
+    """
+
+    def __init__(self, directory, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as parquet
+        import zstandard
+
+        self.pa, self.parquet = pa, parquet
+        self.paths = {fmt: os.path.join(directory, f'bench_{rows}{FORMAT_SUFFIXES[fmt][0]}') for fmt in FORMATS}
+        self.csv = open(self.paths[CSV], 'w', newline='')
+        self.gzip = gzip.open(self.paths[CSV_GZIP], 'wt', newline='')
+        self._zstd_file = open(self.paths[CSV_ZSTD], 'wb')
+        self.zstd = io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(self._zstd_file), newline='')
+        self.parquet_writer = self.arrow_writer = None
+        self._arrow_file = None
+
+    def write(self, frame, header):
+        for handle in (self.csv, self.gzip, self.zstd):
+            frame.to_csv(handle, header=header, index=False)
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        if self.parquet_writer is None:
+            self.parquet_writer = self.parquet.ParquetWriter(self.paths[PARQUET], table.schema)
+            self._arrow_file = self.pa.OSFile(self.paths[ARROW], 'wb')
+            self.arrow_writer = self.pa.ipc.new_file(self._arrow_file, table.schema)
+        self.parquet_writer.write_table(table)
+        self.arrow_writer.write_table(table)
+
+    def close(self):
+        for handle in (self.csv, self.gzip, self.zstd):
+            handle.close()
+        self._zstd_file.close()
+        self.parquet_writer.close()
+        self.arrow_writer.close()
+        self._arrow_file.close()
+
+
+class Command(BenchmarkCommand):
+    help = ('Benchmarks ingest throughput of every upload format (CSV, gzip and '
+            'zstd CSV, Parquet, Arrow) on the same generated data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+        parser.add_argument('--extra-columns', type=int, default=0,
+                            help='Unused numeric columns added to every row, to show column projection')
+
+    def handle(self, *args, **options):
+        templates = load_templates()
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in options['rows']:
+                writers = FormatWriters(tmp, rows)
+                written = 0
+                while written < rows:
+                    block = min(GENERATE_BLOCK_SIZE, rows - written)
+                    frame = generate_frame(block, templates, seed=written, offset=written)
+                    for i in range(options['extra_columns']):
+                        frame[f'Extra {i}'] = frame['Flowrate'] * (i + 1)
+                    writers.write(frame, header=(written == 0))
+                    written += block
+                writers.close()
+
+                for fmt in FORMATS:
+                    path = writers.paths[fmt]
+                    result = run_isolated(format_ingest, path, fmt)
+                    self.report(fmt, rows, os.path.getsize(path), result)
+                    os.remove(path)
+
+    def report(self, fmt, rows, size, result):
+        seconds = result['seconds']
+        self.results.add(fmt, seconds, rows, bytes=size, rss_growth_bytes=result['growth_bytes'])
+        self.stdout.write(
+            f"{fmt:<8}{rows:>12,} rows {size / 1024 / 1024:>9.1f} MB "
+            f"{seconds:>8.2f} s {rows / seconds:>12,.0f} rows/s {size / 1024 / 1024 / seconds:>8.1f} MB/s "
+            f"rss growth {result['growth_bytes'] / 1024 / 1024:>9.1f} MB"
+        )
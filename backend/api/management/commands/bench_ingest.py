@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from api.benchmarks import BenchmarkCommand, generate_equipment_csv, run_isolated, scratch_writer
+from api.ingest import ingest_stream
+
+
+def streaming_ingest(path, chunksize):
+    writer = scratch_writer(os.path.dirname(path), f'{os.path.basename(path)}.cols')
+    try:
+        with open(path, 'rb') as f:
+            ingest_stream(f, writer, chunksize=chunksize)
+    finally:
+        writer.discard()
+
+
+def eager_ingest(path):
+    df = pd.read_csv(path)
+    df['Type'].value_counts().to_dict()
+    df.to_dict('records')
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmarks streaming CSV ingest (time and peak memory) on generated files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+        parser.add_argument('--chunksize', type=int, default=None)
+        parser.add_argument('--eager-limit', type=int, default=1_000_000,
+                            help='Also time the one-shot read_csv path up to this many rows')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in options['rows']:
+                path = os.path.join(tmp, f'bench_{rows}.csv')
+                generate_equipment_csv(path, rows)
+                size_mb = os.path.getsize(path) / 1024 / 1024
+
+                result = run_isolated(streaming_ingest, path, options['chunksize'])
+                self.report('stream', rows, size_mb, result)
+                if rows <= options['eager_limit']:
+                    self.report('eager', rows, size_mb, run_isolated(eager_ingest, path))
+                os.remove(path)
+
+    def report(self, mode, rows, size_mb, result):
+        self.results.add(mode, result['seconds'], rows, size_mb=size_mb, rss_growth_bytes=result['growth_bytes'])
+        self.stdout.write(
+            f"{mode:<7}{rows:>12,} rows {size_mb:>9.1f} MB "
+            f"{result['seconds']:>8.2f} s {rows / result['seconds']:>12,.0f} rows/s "
+            f"rss growth {result['growth_bytes'] / 1024 / 1024:>9.1f} MB"
+        )
@@ -0,0 +1,67 @@
+import io
+import tempfile
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import BenchmarkCommand, generate_frame, scratch_writer
+from api.middleware import ENCODERS
+from api.renderers import FastJSONRenderer
+from api.schema import read_validated
+from api.storage import ColumnStoreReader, columns_to_records
+from api.summary import summarize
+
+
+class Command(BenchmarkCommand):
+    help = ('Benchmarks the dataset detail payload: reading rows, JSON rendering '
+            '(DRF vs orjson) and bytes on the wire per content encoding')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in options['rows']:
+                frame = read_validated(io.BytesIO(generate_frame(rows).to_csv(index=False).encode()))
+                writer = scratch_writer(tmp, f'render_{rows}.cols')
+                try:
+                    writer.write(frame)
+                    writer.close()
+                    self.run(rows, writer.path, summarize(frame), options['repeat'])
+                finally:
+                    writer.discard()
+
+    def run(self, rows, path, summary, repeat):
+        def read():
+            with open(path, 'rb') as f:
+                return ColumnStoreReader(f).read()
+
+        columns, seconds = self.best(read, repeat)
+        self.report(rows, 'read columns', seconds)
+        records, seconds = self.best(lambda: columns_to_records(columns), repeat)
+        self.report(rows, 'build records', seconds)
+
+        payload = {'id': 1, 'filename': 'bench.csv', 'summary': summary, 'original_data': records}
+        for name, renderer in (('render drf', JSONRenderer()), ('render orjson', FastJSONRenderer())):
+            body, seconds = self.best(lambda: renderer.render(payload), repeat)
+            self.report(rows, name, seconds, len(body))
+
+        self.report(rows, 'identity', 0.0, len(body))
+        for coding, encode in ENCODERS.items():
+            compressed, seconds = self.best(lambda: encode(body), repeat)
+            self.report(rows, coding, seconds, len(compressed))
+
+    def best(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
+
+    def report(self, rows, stage, seconds, size=None):
+        self.results.add(stage, seconds, rows, bytes=size)
+        size = f"{size / 1024 / 1024:>9.1f} MB" if size is not None else ''
+        self.stdout.write(f"{stage:<15}{rows:>12,} rows {seconds * 1000:>10.1f} ms {size}")
@@ -0,0 +1,42 @@
+import io
+import tempfile
+import time
+
+from api.benchmarks import BenchmarkCommand, generate_frame, scratch_writer
+from api.models import DataSet
+from api.reports import render_report
+from api.schema import read_validated
+from api.summary import summarize
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmarks rendering the PDF report of generated datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in options['rows']:
+                self.run(tmp, rows, options['repeat'])
+
+    def run(self, directory, rows, repeat):
+        frame = read_validated(io.BytesIO(generate_frame(rows).to_csv(index=False).encode()))
+        writer = scratch_writer(directory, f'report_{rows}.cols')
+        try:
+            writer.write(frame)
+            writer.close()
+            # Never saved: the report only reads the summary and rows file
+            dataset = DataSet(filename=f'bench_{rows}.csv', summary=summarize(frame), rows_file=writer.name)
+            dataset.rows_file.storage = writer.storage
+            best, size = None, 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                size = len(render_report(dataset))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+        finally:
+            writer.discard()
+        self.results.add('render report', best, rows, bytes=size)
+        self.stdout.write(f"{'render report':<15}{rows:>12,} rows {best * 1000:>10.1f} ms {size / 1024:>9.1f} KB")
@@ -0,0 +1,64 @@
+import time
+
+from api.benchmarks import BenchmarkCommand, generate_frame
+from api.summary import NUMERIC_COLUMNS, summarize
+
+
+def legacy_summary(df):
+    # The summary FileUploadView computed before the summary engine
+    return {
+        'total_count': len(df),
+        'avg_flowrate': df['Flowrate'].mean(),
+        'avg_pressure': df['Pressure'].mean(),
+        'avg_temperature': df['Temperature'].mean(),
+        'equipment_type_distribution': df['Type'].value_counts().to_dict()
+    }
+
+
+def per_metric_summary(df):
+    # The same statistics as the engine, one pandas call per metric
+    stats = {'overall': {}, 'by_type': {}}
+    for column in NUMERIC_COLUMNS:
+        series = df[column]
+        stats['overall'][column] = {
+            'count': series.count(), 'mean': series.mean(), 'min': series.min(),
+            'max': series.max(), 'std': series.std(), 'p25': series.quantile(0.25),
+            'p50': series.quantile(0.5), 'p75': series.quantile(0.75),
+        }
+    for type_name, group in df.groupby('Type'):
+        stats['by_type'][type_name] = {
+            column: {
+                'count': group[column].count(), 'mean': group[column].mean(),
+                'min': group[column].min(), 'max': group[column].max(),
+                'std': group[column].std(), 'p25': group[column].quantile(0.25),
+                'p50': group[column].quantile(0.5), 'p75': group[column].quantile(0.75),
+            }
+            for column in NUMERIC_COLUMNS
+        }
+    return dict(legacy_summary(df), statistics=stats)
+
+
+class Command(BenchmarkCommand):
+    help = 'Compares the summary engine against the legacy and per-metric summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 5_000_000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        implementations = [
+            ('legacy', legacy_summary),
+            ('per-metric', per_metric_summary),
+            ('engine', summarize),
+        ]
+        for rows in options['rows']:
+            df = generate_frame(rows)
+            for name, func in implementations:
+                best = min(self.time(func, df) for _ in range(options['repeat']))
+                self.results.add(name, best, rows)
+                self.stdout.write(f"{name:<12}{rows:>12,} rows {best * 1000:>10.1f} ms")
+
+    def time(self, func, df):
+        start = time.perf_counter()
+        func(df)
+        return time.perf_counter() - start
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import generate_equipment_csv
+
+
+class Command(BaseCommand):
+    help = ('Writes a synthetic equipment CSV modelled on sample_equipment_data.csv. '
+            'The same rows and seed always give the same file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generate_equipment_csv(options['path'], options['rows'], seed=options['seed'])
+        self.stdout.write(f"Wrote {options['rows']:,} rows to {options['path']}")
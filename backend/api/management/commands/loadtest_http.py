@@ -0,0 +1,251 @@
+import collections
+import gzip
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from api.benchmarks import BenchmarkCommand, generate_frame, percentile
+
+OPERATIONS = ('upload', 'history', 'detail')
+SERVER_START_TIMEOUT = 30
+# Uploads remembered per client for detail requests, kept under the
+# retention limit so that pruning never removes one of them
+KNOWN_DATASETS = 3
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            'Content-Type: text/csv\r\n\r\n').encode()
+    return head + content + f'\r\n--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+class Client:
+    """
+    One simulated user: its own keep-alive connection, account and datasets.
+    """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=120)
+        self.prefix = parts.path.rstrip('/')
+        self.headers = {}
+        self.datasets = collections.deque(maxlen=KNOWN_DATASETS)
+
+    def request(self, method, path, body=None, headers=None, retry=True):
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers={**self.headers, **(headers or {})})
+            response = self.connection.getresponse()
+            content = response.read()
+        except http.client.RemoteDisconnected:
+            # The server closed an idle keep-alive connection, which HTTP
+            # clients answer by retrying on a new one
+            self.connection.close()
+            if not retry:
+                raise
+            return self.request(method, path, body, headers, retry=False)
+        except (http.client.HTTPException, OSError):
+            # The server dropped the connection; the next request reconnects
+            self.connection.close()
+            raise
+        if response.getheader('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return response.status, content
+
+    def sign_up(self):
+        username, password = f'load-{uuid.uuid4().hex[:12]}', f'Load-{uuid.uuid4().hex}'
+        form = {'username': username, 'email': f'{username}@example.com', 'password': password, 'password2': password}
+        status, body = self.request('POST', '/api/register/', json.dumps(form), {'Content-Type': 'application/json'})
+        if status != 201:
+            raise CommandError(f"Registering a load-test user failed ({status}): {body[:200]!r}")
+        status, body = self.request('POST', '/api/login/', json.dumps({'username': username, 'password': password}),
+                                    {'Content-Type': 'application/json'})
+        if status != 200:
+            raise CommandError(f"Logging in failed ({status}): {body[:200]!r}")
+        self.headers = {'Authorization': f"Token {json.loads(body)['token']}", 'Accept-Encoding': 'gzip'}
+
+    def upload(self, filename, content):
+        body, content_type = multipart('file', filename, content)
+        status, response = self.request('POST', '/api/upload/', body, {'Content-Type': content_type})
+        if status == 201:
+            self.datasets.append(json.loads(response)['id'])
+        return status, response
+
+    def history(self):
+        return self.request('GET', '/api/history/')
+
+    def detail(self):
+        if not self.datasets:
+            return self.history()
+        return self.request('GET', f'/api/datasets/{random.choice(self.datasets)}/')
+
+
+class Command(BenchmarkCommand):
+    help = ('Load-tests the HTTP API with concurrent clients running a mix of uploads, '
+            'history and dataset requests. Starts gunicorn (WSGI), gunicorn with uvicorn '
+            'workers (ASGI) or runserver on a throwaway SQLite database, or targets a '
+            'running server given with --url.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Server to test instead of starting one')
+        parser.add_argument('--server', choices=('gunicorn', 'uvicorn', 'runserver'), default='gunicorn')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent simulated users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run the mix for')
+        parser.add_argument('--mix', default='upload=1,history=4,detail=4',
+                            help='Relative weight of each operation')
+        parser.add_argument('--rows', type=int, default=1_000, help='Rows per uploaded file')
+        parser.add_argument('--files', type=int, default=100,
+                            help='Distinct files to upload; repeats exercise duplicate detection')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        weights = self.parse_mix(options['mix'])
+        files = [generate_frame(options['rows'], seed=options['seed'] + i).to_csv(index=False).encode()
+                 for i in range(options['files'])]
+        if options['url']:
+            self.run(options['url'].rstrip('/'), weights, files, options)
+            return
+        with tempfile.TemporaryDirectory(prefix='loadtest-') as directory:
+            server, url = self.start_server(directory, options)
+            try:
+                self.run(url, weights, files, options)
+            finally:
+                server.terminate()
+                server.wait()
+
+    def parse_mix(self, mix):
+        weights = {}
+        for item in mix.split(','):
+            name, _, weight = item.partition('=')
+            if name.strip() not in OPERATIONS:
+                raise CommandError(f"Unknown operation {name.strip()!r}; use {', '.join(OPERATIONS)}.")
+            weights[name.strip()] = float(weight or 1)
+        return weights
+
+    def start_server(self, directory, options):
+        """
+        Migrates a fresh SQLite database in `directory` and starts the
+        chosen server on it, with DEBUG off.
+        """
+        port = free_port()
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(directory, 'db.sqlite3')}",
+                   MEDIA_ROOT=os.path.join(directory, 'media'),
+                   DEBUG='False',
+                   # ALLOWED_HOSTS is only configurable through this variable
+                   RENDER_EXTERNAL_HOSTNAME='127.0.0.1')
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+        subprocess.run(manage + ['migrate', '-v0'], env=env, cwd=settings.BASE_DIR, check=True)
+        gunicorn = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers'])]
+        if options['server'] == 'gunicorn':
+            command = gunicorn + ['--timeout', '300', 'backend.wsgi']
+        elif options['server'] == 'uvicorn':
+            command = gunicorn + ['--config', os.path.join(settings.BASE_DIR, 'gunicorn_asgi.conf.py'), 'backend.asgi']
+        else:
+            command = manage + ['runserver', '--noreload', f'127.0.0.1:{port}']
+        log = open(os.path.join(directory, 'server.log'), 'wb')
+        server = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR, stdout=log, stderr=subprocess.STDOUT)
+        log.close()
+
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return server, f'http://127.0.0.1:{port}'
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        with open(os.path.join(directory, 'server.log'), errors='replace') as f:
+            raise CommandError(f"The {options['server']} server did not start:\n{f.read()[-2000:]}")
+
+    def run(self, url, weights, files, options):
+        clients = [Client(url) for _ in range(options['clients'])]
+        for index, client in enumerate(clients):
+            client.sign_up()
+            # Every client starts with a dataset for its detail requests
+            client.upload(f'seed-{index}.csv', files[index % len(files)])
+
+        samples = collections.defaultdict(list)
+        errors = collections.Counter()
+        # (operation, status) of failed requests; status None for dropped connections
+        failures = collections.Counter()
+        lock = threading.Lock()
+        uploads = iter(range(10 ** 9))
+        deadline = time.monotonic() + options['duration']
+
+        def work(index, client):
+            rng = random.Random(options['seed'] + index)
+            names, cumulative = list(weights), list(weights.values())
+            while time.monotonic() < deadline:
+                operation = rng.choices(names, cumulative)[0]
+                start = time.perf_counter()
+                try:
+                    if operation == 'upload':
+                        with lock:
+                            number = next(uploads)
+                        status, _ = client.upload(f'load-{number}.csv', files[number % len(files)])
+                    else:
+                        status, _ = getattr(client, operation)()
+                except (http.client.HTTPException, OSError):
+                    status = None
+                elapsed = time.perf_counter() - start
+                with lock:
+                    samples[operation].append(elapsed)
+                    if status is None or status >= 400:
+                        errors[operation] += 1
+                        failures[operation, status] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=work, args=(index, client)) for index, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        self.report(samples, errors, wall, options)
+        for (operation, status), count in sorted(failures.items(), key=lambda item: -item[1]):
+            self.stdout.write(self.style.WARNING(
+                f"{operation}: {count:,} failed with {status or 'a dropped connection'}"))
+
+    def report(self, samples, errors, wall, options):
+        total = sum(len(latencies) for latencies in samples.values())
+        self.stdout.write(f"{options['clients']} clients, {wall:.1f} s, {total:,} requests, "
+                          f"{total / wall:,.1f} req/s, {sum(errors.values()):,} errors")
+        for operation in OPERATIONS:
+            latencies = samples.get(operation)
+            if not latencies:
+                continue
+            p50, p95, p99 = (percentile(latencies, q) for q in (50, 95, 99))
+            rate = len(latencies) / wall
+            self.results.add(f'{operation} p50', p50, options['rows'], requests=len(latencies),
+                             errors=errors[operation], requests_per_second=rate)
+            self.results.add(f'{operation} p95', p95, options['rows'])
+            self.results.add(f'{operation} p99', p99, options['rows'])
+            self.stdout.write(
+                f"{operation:<8}{len(latencies):>8,} req {rate:>8.1f} req/s {errors[operation]:>6,} errors  "
+                f"mean {statistics.mean(latencies) * 1000:>8.1f} ms  p50 {p50 * 1000:>8.1f} ms  "
+                f"p95 {p95 * 1000:>8.1f} ms  p99 {p99 * 1000:>8.1f} ms  max {max(latencies) * 1000:>8.1f} ms"
+            )
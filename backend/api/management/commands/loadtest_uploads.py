@@ -0,0 +1,84 @@
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from api.benchmarks import BenchmarkCommand, generate_frame, percentile
+from api.models import DataSet
+
+User = get_user_model()
+
+
+class Command(BenchmarkCommand):
+    help = ('Measures upload latency as the dataset table grows, on a throwaway '
+            'test database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table-sizes', type=int, nargs='+', default=[0, 10_000, 100_000, 500_000])
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--uploads', type=int, default=20)
+        parser.add_argument('--rows', type=int, default=100, help='Rows per uploaded file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, options):
+        users = User.objects.bulk_create(
+            User(username=f'load-{i}') for i in range(options['users'])
+        )
+        probe = User.objects.create_user('load-probe', password='load-probe')
+        client = APIClient()
+        client.force_authenticate(probe)
+
+        upload = 0
+        for size in options['table_sizes']:
+            self.grow_table(users, size)
+            latencies = []
+            for _ in range(options['uploads']):
+                body = generate_frame(options['rows'], seed=upload).to_csv(index=False).encode()
+                upload += 1
+                start = time.perf_counter()
+                response = client.post('/api/upload/', {'file': SimpleUploadedFile(f'load-{upload}.csv', body)},
+                                       format='multipart')
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 201, response.content
+            scan = self.global_scan()
+            self.results.add(f'upload p50 at {size:,} datasets', statistics.median(latencies), options['rows'])
+            self.results.add(f'upload p95 at {size:,} datasets', percentile(latencies, 95), options['rows'])
+            self.results.add(f'global retention scan at {size:,} datasets', scan)
+            self.stdout.write(
+                f"{DataSet.objects.count():>10,} datasets  upload p50 {statistics.median(latencies) * 1000:>7.1f} ms"
+                f"  p95 {percentile(latencies, 95) * 1000:>7.1f} ms"
+                f"  global retention scan {scan * 1000:>7.1f} ms"
+            )
+
+    def grow_table(self, users, size):
+        missing = size - DataSet.objects.exclude(user__username='load-probe').count()
+        batch = []
+        for i in range(max(missing, 0)):
+            batch.append(DataSet(user=users[i % len(users)], filename='filler.csv', summary={}))
+            if len(batch) == 5_000:
+                DataSet.objects.bulk_create(batch)
+                batch = []
+        DataSet.objects.bulk_create(batch)
+
+    def global_scan(self):
+        # What every upload used to run before retention became per user
+        start = time.perf_counter()
+        all_datasets = DataSet.objects.order_by('-uploaded_at')
+        if all_datasets.count() > 5:
+            list(all_datasets.values_list('pk', flat=True)[5:])
+        return time.perf_counter() - start
+
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from api.models import DataSet
+from api.retention import prune_user_datasets
+
+
+class Command(BaseCommand):
+    help = "Deletes every user's datasets beyond the retention limit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Datasets to keep per user (default: DATASET_RETENTION_PER_USER)')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        keep = settings.DATASET_RETENTION_PER_USER if options['keep'] is None else options['keep']
+        user_ids = (DataSet.objects.values('user_id')
+                    .annotate(total=Count('pk'))
+                    .filter(total__gt=keep)
+                    .values_list('user_id', flat=True))
+        deleted = 0
+        for user_id in user_ids:
+            deleted += prune_user_datasets(user_id, keep=keep, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} dataset(s).'))
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connections
+
+from api.jobs import pending_job_ids, requeue_stale, run_job
+
+
+def _run_in_worker(job_id):
+    import django
+    django.setup()
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Processes pending upload jobs from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', action='store_true',
+                            help='Use a thread pool instead of a process pool')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--requeue-after', type=int, default=settings.UPLOAD_JOB_REQUEUE_AFTER,
+                            help='Seconds without progress before a running job is retried')
+
+    def handle(self, *args, **options):
+        pool_class = ThreadPoolExecutor if options['threads'] else ProcessPoolExecutor
+        with pool_class(max_workers=options['workers']) as pool:
+            while True:
+                requeue_stale(options['requeue_after'])
+                job_ids = pending_job_ids(limit=options['workers'] * 2)
+                # Close this process's connection before forking workers
+                connections.close_all()
+                list(pool.map(_run_in_worker, job_ids))
+                if job_ids:
+                    self.stdout.write(f'Processed {len(job_ids)} job(s).')
+                if options['once'] and not job_ids:
+                    return
+                if not job_ids:
+                    time.sleep(options['poll_interval'])
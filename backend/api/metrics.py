@@ -0,0 +1,275 @@
+"""
+Request timing and Prometheus metrics.
+
+MetricsMiddleware times every request along with the number and duration
+of the database queries it ran. Code that wants a finer breakdown wraps
+its stages in `span(name)`, or `Stages` for work spread over a loop. All
+of it lands in histograms served in the Prometheus text format at
+/metrics. With SERVER_TIMING on, the spans of a request are also
+returned in a Server-Timing header, which browser dev tools display.
+
+Queries are counted by an execute wrapper on every database connection,
+which adds them to the counters active in the current context. Contexts
+follow a request into the threads that `sync_to_async` runs it on, so the
+counts are complete under ASGI too, where a request's queries run on
+another thread than the one it started on.
+
+Metrics live in the memory of each process. Under several gunicorn
+workers every worker reports its own, so scrape each one or run a single
+worker when the numbers must be complete.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REGISTRY = []
+
+# Spans recorded during the current request, for Server-Timing
+_request_spans = ContextVar('request_spans', default=None)
+# QueryCounters that the queries of the current context are added to
+_query_counters = ContextVar('query_counters', default=())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """
+    A Prometheus histogram with optional labels, safe to observe from
+    several threads.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labelvalues, counts, total in series:
+            pairs = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield f'{self.name}_bucket{_labels(pairs + [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{_labels(pairs)} {total!r}'
+            yield f'{self.name}_count{_labels(pairs)} {cumulative}'
+
+
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds', 'Time to produce a response, by route.',
+    ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram(
+    'api_request_db_queries', 'Database queries per request.', ('route',), QUERY_BUCKETS)
+REQUEST_DB_DURATION = Histogram(
+    'api_request_db_duration_seconds', 'Time spent in database queries per request.', ('route',))
+SPAN_DURATION = Histogram(
+    'api_span_duration_seconds', 'Time spent in a named stage, such as parsing an upload.', ('span',))
+SPAN_QUERIES = Histogram(
+    'api_span_db_queries', 'Database queries run in a named stage.', ('span',), QUERY_BUCKETS)
+
+
+def render():
+    return '\n'.join(line for metric in REGISTRY for line in metric.collect()) + '\n'
+
+
+class QueryCounter:
+    """
+    Counts the database queries run in the current context, and their total
+    time, while it is active.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    @contextmanager
+    def active(self):
+        token = _query_counters.set(_query_counters.get() + (self,))
+        try:
+            yield self
+        finally:
+            _query_counters.reset(token)
+
+
+def count_queries(execute, sql, params, many, context):
+    counters = _query_counters.get()
+    if not counters:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for counter in counters:
+            counter.count += 1
+            counter.duration += elapsed
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # The wrapper list outlives reconnects, so add it only once
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(install_query_counter)
+
+
+def record(name, seconds, queries=None):
+    """
+    Records a finished stage in the span histograms and, inside a request,
+    for its Server-Timing header.
+    """
+    SPAN_DURATION.observe(seconds, name)
+    if queries is not None:
+        SPAN_QUERIES.observe(queries, name)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds, queries))
+
+
+@contextmanager
+def span(name):
+    """
+    Times the block, and the database queries it runs, as stage `name`.
+    """
+    start = time.perf_counter()
+    with QueryCounter().active() as counter:
+        try:
+            yield
+        finally:
+            record(name, time.perf_counter() - start, counter.count)
+
+
+class Stages:
+    """
+    Stage timings summed over a loop, recorded once with `record()`, so a
+    stage that runs per chunk shows up as one span per upload.
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+
+    def record(self):
+        for name, seconds in self.totals.items():
+            record(name, seconds)
+
+
+def server_timing(spans, total, queries, db_seconds):
+    """
+    A Server-Timing header value: the request's spans, then its database
+    time and the total.
+    """
+    entries = []
+    for name, seconds, span_queries in spans:
+        entry = f'{name};dur={seconds * 1000:.1f}'
+        if span_queries:
+            entry += f';desc="{span_queries} queries"'
+        entries.append(entry)
+    entries.append(f'db;dur={db_seconds * 1000:.1f};desc="{queries} queries"')
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """
+    Times each request and counts its database queries. Goes first in
+    MIDDLEWARE, so the time includes every other middleware. Works as
+    sync and async middleware alike.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        spans, counter, start = [], QueryCounter(), time.perf_counter()
+        with self.collect(spans, counter):
+            response = self.get_response(request)
+        return self.finish(request, response, spans, counter, start)
+
+    async def __acall__(self, request):
+        spans, counter, start = [], QueryCounter(), time.perf_counter()
+        with self.collect(spans, counter):
+            response = await self.get_response(request)
+        return self.finish(request, response, spans, counter, start)
+
+    @contextmanager
+    def collect(self, spans, counter):
+        token = _request_spans.set(spans)
+        try:
+            with counter.active():
+                yield
+        finally:
+            _request_spans.reset(token)
+
+    def finish(self, request, response, spans, counter, start):
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        REQUEST_DURATION.observe(total, request.method, route, str(response.status_code))
+        REQUEST_QUERIES.observe(counter.count, route)
+        REQUEST_DB_DURATION.observe(counter.duration, route)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(spans, total, counter.count, counter.duration)
+        return response
+
+
+def metrics_view(request):
+    """
+    The metrics in Prometheus text format, for clients in
+    METRICS_ALLOWED_IPS only.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.26 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_dataset_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='rows_file',
+            field=models.FileField(blank=True, null=True, upload_to='datasets/'),
+        ),
+        migrations.AlterField(
+            model_name='dataset',
+            name='original_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
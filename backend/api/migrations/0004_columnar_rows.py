@@ -0,0 +1,71 @@
+import math
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+import pandas as pd
+
+from api.storage import ColumnStoreReader, ColumnStoreWriter, columns_to_records, write_records
+
+
+def rows_to_columnar(apps, schema_editor):
+    """
+    Moves inline JSON rows, and CSV rows files written by streamed uploads,
+    into columnar rows files.
+    """
+    DataSet = apps.get_model('api', 'DataSet')
+    for dataset in DataSet.objects.all().iterator(chunk_size=1):
+        if dataset.original_data is not None:
+            dataset.rows_file = write_records(dataset.original_data)
+            dataset.original_data = None
+            dataset.save(update_fields=['rows_file', 'original_data'])
+        elif dataset.rows_file and dataset.rows_file.name.endswith('.csv'):
+            old_name = dataset.rows_file.name
+            writer = ColumnStoreWriter()
+            with default_storage.open(old_name, 'rb') as f:
+                for chunk in pd.read_csv(f, chunksize=50_000):
+                    writer.write(chunk)
+            writer.close()
+            dataset.rows_file = writer.name
+            dataset.save(update_fields=['rows_file'])
+            default_storage.delete(old_name)
+
+
+def _json_ready(records):
+    """
+    Blank numeric cells read back as NaN, which a JSONField cannot store.
+    """
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, float) and math.isnan(value):
+                record[key] = None
+    return records
+
+
+def columnar_to_rows(apps, schema_editor):
+    DataSet = apps.get_model('api', 'DataSet')
+    names = set()
+    for dataset in DataSet.objects.exclude(rows_file='').exclude(rows_file=None).iterator(chunk_size=1):
+        name = dataset.rows_file.name
+        with default_storage.open(name, 'rb') as f:
+            dataset.original_data = _json_ready(columns_to_records(ColumnStoreReader(f).read()))
+        dataset.rows_file = None
+        dataset.save(update_fields=['rows_file', 'original_data'])
+        names.add(name)
+    # Rows files may be shared between datasets, so delete them last
+    for name in names:
+        default_storage.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_dataset_rows_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(rows_to_columnar, columnar_to_rows),
+        migrations.RemoveField(
+            model_name='dataset',
+            name='original_data',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.26 on 2026-10-18 17:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0007_upload_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('equipment_type', models.CharField(blank=True, default='', max_length=100)),
+                ('filename', models.CharField(max_length=255)),
+                ('uploaded_at', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('flowrate_mean', models.FloatField(null=True)),
+                ('flowrate_min', models.FloatField(null=True)),
+                ('flowrate_max', models.FloatField(null=True)),
+                ('flowrate_std', models.FloatField(null=True)),
+                ('pressure_mean', models.FloatField(null=True)),
+                ('pressure_min', models.FloatField(null=True)),
+                ('pressure_max', models.FloatField(null=True)),
+                ('pressure_std', models.FloatField(null=True)),
+                ('temperature_mean', models.FloatField(null=True)),
+                ('temperature_min', models.FloatField(null=True)),
+                ('temperature_max', models.FloatField(null=True)),
+                ('temperature_std', models.FloatField(null=True)),
+                ('dataset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='equipment_stats', to='api.dataset')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='equipment_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['uploaded_at'],
+                'indexes': [models.Index(fields=['user', 'equipment_name', 'uploaded_at'], name='equipment_stats_trend_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_equipment_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='errors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model 
 
+from .storage import ColumnStoreReader, columns_to_records
+
 User = get_user_model()
 
 class DataSet(models.Model):
@@ -9,10 +13,104 @@ class DataSet(models.Model):
     filename=models.CharField(max_length=255)
     uploaded_at=models.DateTimeField(auto_now_add=True)
     summary=models.JSONField()
-    original_data=models.JSONField()
+    rows_file=models.FileField(upload_to='datasets/', null=True, blank=True)
+    content_hash=models.CharField(max_length=64, blank=True, default='', db_index=True)
     
     def __str__(self):
         return f"{self.filename} ({self.uploaded_at.strftime('%Y-%m-%d %H:%M')})"
+
+    def load_columns(self, columns=None):
+        """
+        Returns the stored rows as a dict of column name to numpy array,
+        restricted to `columns` when given.
+        """
+        if not self.rows_file:
+            return {}
+        with self.rows_file.open('rb') as f:
+            return ColumnStoreReader(f).read(columns)
+
+    def load_rows(self):
+        return columns_to_records(self.load_columns())
     
     class Meta:
-        ordering=['-uploaded_at'] 
\ No newline at end of file
+        ordering=['-uploaded_at']
+        indexes=[
+            models.Index(fields=['user', '-uploaded_at'], name='dataset_user_uploaded_idx'),
+        ] 
+
+class UploadJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_jobs')
+
+    filename=models.CharField(max_length=255)
+    upload=models.FileField(upload_to='uploads/', null=True, blank=True)
+    status=models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    rows_processed=models.BigIntegerField(default=0)
+    bytes_processed=models.BigIntegerField(default=0)
+    bytes_total=models.BigIntegerField(default=0)
+    error=models.TextField(blank=True, default='')
+    errors=models.JSONField(blank=True, default=list)
+    dataset=models.ForeignKey(DataSet, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at=models.DateTimeField(auto_now_add=True)
+    updated_at=models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} [{self.status}]"
+
+    @property
+    def progress(self):
+        if self.status == self.SUCCEEDED:
+            return 100
+        if not self.bytes_total:
+            return 0
+        return min(99, int(self.bytes_processed * 100 / self.bytes_total))
+
+    class Meta:
+        ordering=['-created_at']
+
+class EquipmentStats(models.Model):
+    """
+    Per-equipment aggregates of one upload, written at ingest. Rows keep the
+    upload's filename and time and outlive the dataset itself, so trends
+    reach past the retention window.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='equipment_stats')
+    dataset = models.ForeignKey(DataSet, on_delete=models.SET_NULL, null=True, blank=True, related_name='equipment_stats')
+
+    equipment_name=models.CharField(max_length=255)
+    equipment_type=models.CharField(max_length=100, blank=True, default='')
+    filename=models.CharField(max_length=255)
+    uploaded_at=models.DateTimeField()
+    count=models.IntegerField(default=0)
+    flowrate_mean=models.FloatField(null=True)
+    flowrate_min=models.FloatField(null=True)
+    flowrate_max=models.FloatField(null=True)
+    flowrate_std=models.FloatField(null=True)
+    pressure_mean=models.FloatField(null=True)
+    pressure_min=models.FloatField(null=True)
+    pressure_max=models.FloatField(null=True)
+    pressure_std=models.FloatField(null=True)
+    temperature_mean=models.FloatField(null=True)
+    temperature_min=models.FloatField(null=True)
+    temperature_max=models.FloatField(null=True)
+    temperature_std=models.FloatField(null=True)
+
+    def __str__(self):
+        return f"{self.equipment_name} in {self.filename}"
+
+    class Meta:
+        ordering=['uploaded_at']
+        indexes=[
+            models.Index(fields=['user', 'equipment_name', 'uploaded_at'], name='equipment_stats_trend_idx'),
+        ]
@@ -0,0 +1,43 @@
+"""
+JSON rendering through orjson.
+
+The output is the same JSON as DRF's JSONRenderer produces, parsed back to
+equal values, but it is produced several times faster. The text differs in
+places: floats are written in shortest form (1e-7 rather than 1e-07),
+U+2028 and U+2029 are not escaped, and indented output always uses two
+spaces whatever indent was asked for. numpy scalars and arrays
+serialize natively, and NaN or infinite floats become null where the
+stdlib encoder would refuse them. Datetimes and anything else orjson does
+not know go through DRF's encoder. Without orjson installed the stock
+renderer is used. Rendering time is recorded as the "render" span.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = 0 if orjson is None else (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=JSONEncoder().default, option=options)
@@ -0,0 +1,312 @@
+"""
+PDF reports and their on-disk cache.
+
+Reports are drawn from the stored summary, a bounded sample of points and
+the first few rows, so rendering time does not depend on the row count.
+
+A report depends only on a dataset's filename and summary, so it is cached
+under the dataset id plus a hash of those (the report key), which doubles
+as the ETag. Cached files live in REPORT_CACHE_DIR; reading one refreshes
+its mtime, and writes evict the least recently used files once the
+directory grows past REPORT_CACHE_MAX_BYTES. Uploads pre-warm the cache in
+the background so the first download is served from disk too.
+"""
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from xml.sax.saxutils import escape
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import (
+    Flowable, KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
+)
+
+from . import background
+from .downsample import dataset_points
+from .filecache import FileCache
+from .models import DataSet
+from .storage import ColumnStoreReader, columns_to_records
+
+# Bump when the report layout changes so cached reports are regenerated
+REPORT_VERSION = 2
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-prewarm')
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+SCATTER_COLUMNS = ['Temperature', 'Pressure']
+STAT_LABELS = {'count': 'Count', 'mean': 'Mean', 'min': 'Min', 'max': 'Max', 'std': 'Std'}
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2e3440')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#eceff4')]),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#d8dee9')),
+])
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def _table(rows, widths=None):
+    table = Table(rows, colWidths=widths, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def _distribution_chart(distribution, width, height=2.6*inch):
+    drawing = Drawing(width, height)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 0.5*inch, 0.4*inch
+    chart.width, chart.height = width - 0.8*inch, height - 0.6*inch
+    chart.data = [list(distribution.values()) or [0]]
+    chart.categoryAxis.categoryNames = list(distribution) or ['']
+    chart.categoryAxis.labels.fontName = chart.valueAxis.labels.fontName = 'Helvetica'
+    chart.categoryAxis.labels.fontSize = 7
+    chart.categoryAxis.labels.angle = 30 if len(distribution) > 6 else 0
+    chart.categoryAxis.labels.boxAnchor = 'ne' if len(distribution) > 6 else 'n'
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.bars[0].fillColor = colors.HexColor('#5e81ac')
+    drawing.add(chart)
+    return drawing
+
+
+class ScatterChart(Flowable):
+    """
+    Scatter plot drawn straight onto the canvas as a single path, with the
+    point coordinates transformed in numpy. Much cheaper than the graphics
+    widgets, which build a node per point.
+    """
+    margin_left, margin_bottom = 0.6*inch, 0.5*inch
+
+    def __init__(self, x, y, width, height, x_label='', y_label=''):
+        super().__init__()
+        finite = np.isfinite(x) & np.isfinite(y)
+        self.x, self.y = x[finite], y[finite]
+        self.width, self.height = width, height
+        self.x_label, self.y_label = x_label, y_label
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    @staticmethod
+    def _range(values):
+        if not len(values):
+            return 0.0, 1.0
+        low, high = float(values.min()), float(values.max())
+        pad = (high - low) * 0.05 or 1.0
+        return low - pad, high + pad
+
+    def draw(self):
+        p = self.canv
+        left, bottom = self.margin_left, self.margin_bottom
+        plot_width, plot_height = self.width - left - 0.2*inch, self.height - bottom - 0.1*inch
+        (x0, x1), (y0, y1) = self._range(self.x), self._range(self.y)
+
+        p.setStrokeColor(colors.black)
+        p.setLineWidth(0.5)
+        p.rect(left, bottom, plot_width, plot_height)
+        p.setFont("Helvetica", 7)
+        for fraction in np.linspace(0, 1, 6):
+            tx, ty = left + fraction * plot_width, bottom + fraction * plot_height
+            p.line(tx, bottom, tx, bottom - 3)
+            p.drawCentredString(tx, bottom - 12, f"{x0 + fraction * (x1 - x0):.1f}")
+            p.line(left, ty, left - 3, ty)
+            p.drawRightString(left - 5, ty - 2, f"{y0 + fraction * (y1 - y0):.1f}")
+        p.setFont("Helvetica", 8)
+        p.drawCentredString(left + plot_width / 2, 0.1*inch, self.x_label)
+        p.saveState()
+        p.rotate(90)
+        p.drawCentredString(bottom + plot_height / 2, -0.15*inch, self.y_label)
+        p.restoreState()
+
+        if not len(self.x):
+            p.drawCentredString(left + plot_width / 2, bottom + plot_height / 2, "No data")
+            return
+        xs = left + (self.x - x0) / (x1 - x0) * plot_width
+        ys = bottom + (self.y - y0) / (y1 - y0) * plot_height
+        path = p.beginPath()
+        for px, py in zip(xs.round(2).tolist(), ys.round(2).tolist()):
+            path.rect(px - 0.75, py - 0.75, 1.5, 1.5)
+        p.setFillColor(colors.HexColor('#bf616a'))
+        p.drawPath(path, stroke=0, fill=1)
+
+
+def _stats_table(table, aggregates):
+    widths = [1.2*inch] + [0.7*inch] * len(aggregates)
+    return _table(_stats_rows(table, aggregates), widths=widths)
+
+
+def _stats_rows(table, aggregates):
+    rows = [['Column'] + [STAT_LABELS.get(name, name.upper()) for name in aggregates]]
+    for column, values in table.items():
+        rows.append([column] + [_format(values.get(name)) for name in aggregates])
+    return rows
+
+
+def _statistics(summary, styles):
+    statistics = summary.get('statistics')
+    if not statistics:
+        return [Paragraph("Detailed statistics are not available for this dataset.", styles['Normal'])]
+    first_column = next(iter(statistics['overall'].values()), {})
+    aggregates = list(first_column)
+    flowables = [Paragraph("Overall", styles['Heading3']),
+                 _stats_table(statistics['overall'], aggregates)]
+    for type_name, table in statistics['by_type'].items():
+        flowables.append(KeepTogether([
+            Paragraph(escape(type_name) if type_name else "(no type)", styles['Heading3']),
+            _stats_table(table, aggregates),
+        ]))
+    return flowables
+
+
+def _appendix(dataset, limit, styles):
+    if not dataset.rows_file or limit <= 0:
+        return [Paragraph("No row data stored for this dataset.", styles['Normal'])]
+    with dataset.rows_file.open('rb') as f:
+        data, _ = ColumnStoreReader(f).read_window(0, limit)
+    records = columns_to_records(data)
+    total = dataset.summary.get('total_count', len(records))
+    flowables = [Paragraph(f"First {len(records):,} of {total:,} rows.", styles['Normal']), Spacer(1, 6)]
+    if records:
+        header = list(data)
+        flowables.append(_table([header] + [[_format(row[column]) for column in header] for row in records]))
+    return flowables
+
+
+def _footer(filename):
+    def draw(p, doc):
+        p.saveState()
+        p.setFont("Helvetica", 8)
+        p.drawString(doc.leftMargin, 0.5*inch, filename)
+        p.drawRightString(doc.pagesize[0] - doc.rightMargin, 0.5*inch, f"Page {doc.page}")
+        p.restoreState()
+    return draw
+
+
+def render_report(dataset):
+    """
+    Builds the multi-page report for `dataset` and returns the PDF bytes.
+    Charts and tables come from the stored summary and a bounded sample of
+    points, and the appendix from the first REPORT_APPENDIX_ROWS rows, so
+    the cost does not grow with the dataset.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title=f"Analysis Report for: {dataset.filename}",
+                            leftMargin=0.75*inch, rightMargin=0.75*inch,
+                            topMargin=0.75*inch, bottomMargin=0.75*inch)
+    styles = getSampleStyleSheet()
+    summary = dataset.summary
+    distribution = summary.get('equipment_type_distribution', {})
+
+    story = [Paragraph(f"Analysis Report for: {escape(dataset.filename)}", styles['Title']),
+             Paragraph("Summary Statistics", styles['Heading2'])]
+    overview = [['Metric', 'Value']]
+    for key, value in summary.items():
+        if not isinstance(value, dict):
+            overview.append([key.replace('_', ' ').title(), _format(value)])
+    story += [_table(overview, widths=[2.5*inch, 2*inch]), Spacer(1, 12),
+              Paragraph("Equipment Type Distribution", styles['Heading2']),
+              _distribution_chart(distribution, doc.width),
+              _table([['Type', 'Count']] + [[name, _format(count)] for name, count in distribution.items()],
+                     widths=[2.5*inch, 2*inch])]
+
+    points = dataset_points(dataset, SCATTER_COLUMNS, settings.REPORT_SCATTER_POINTS)
+    shown = len(points['Pressure'])
+    story += [PageBreak(), Paragraph("Pressure vs Temperature", styles['Heading2']),
+              Paragraph(f"{shown:,} of {summary.get('total_count', shown):,} rows plotted.", styles['Normal']),
+              ScatterChart(points['Temperature'], points['Pressure'], doc.width, 3.6*inch,
+                           'Temperature', 'Pressure')]
+
+    story += [PageBreak(), Paragraph("Statistics by Equipment Type", styles['Heading2'])]
+    story += _statistics(summary, styles)
+
+    story += [PageBreak(), Paragraph("Appendix: Row Data", styles['Heading2'])]
+    story += _appendix(dataset, settings.REPORT_APPENDIX_ROWS, styles)
+
+    footer = _footer(dataset.filename)
+    doc.build(story, onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
+
+
+def report_key(dataset):
+    """
+    Hash of everything the report is drawn from.
+    """
+    payload = json.dumps([REPORT_VERSION, dataset.filename, dataset.summary], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class ReportCache(FileCache):
+    """
+    Size-bounded LRU cache of rendered reports in REPORT_CACHE_DIR.
+    """
+    suffix = '.pdf'
+
+    def __init__(self, directory=None, max_bytes=None):
+        super().__init__(directory or settings.REPORT_CACHE_DIR,
+                         settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+
+def _lock_for(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def get_report(dataset, cache=None):
+    """
+    Returns (path, key) of the dataset's report, rendering it on a cache
+    miss. Concurrent misses for the same report render it once.
+    """
+    cache = cache or ReportCache()
+    key = report_key(dataset)
+    path = cache.get(dataset.pk, key)
+    if path is not None:
+        return path, key
+    with _lock_for(key):
+        path = cache.get(dataset.pk, key)
+        if path is None:
+            path = cache.put(dataset.pk, key, render_report(dataset))
+    with _locks_lock:
+        _locks.pop(key, None)
+    return path, key
+
+
+def _prewarm(dataset_id):
+    try:
+        dataset = DataSet.objects.filter(pk=dataset_id).first()
+        if dataset is not None:
+            get_report(dataset)
+    finally:
+        connections.close_all()
+
+
+def schedule_report(dataset_id):
+    """
+    Renders the dataset's report in the background once the current
+    transaction commits.
+    """
+    transaction.on_commit(lambda: background.submit(
+        _executor, _prewarm, dataset_id, description="report prewarm for dataset %s"))
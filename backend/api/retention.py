@@ -0,0 +1,66 @@
+"""
+Per-user dataset retention.
+
+Uploads no longer prune inline: they schedule a prune of the uploading
+user's datasets on a single background thread once the upload commits.
+The prune walks the (user, uploaded_at) index and deletes in bounded
+batches.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import background
+from .models import DataSet
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dataset-prune')
+_pending = set()
+_lock = threading.Lock()
+
+
+def prune_user_datasets(user_id, keep=None, batch_size=None):
+    """
+    Deletes the user's datasets beyond the newest `keep`, at most
+    `batch_size` per transaction. Returns how many were deleted.
+    """
+    keep = settings.DATASET_RETENTION_PER_USER if keep is None else keep
+    batch_size = batch_size or settings.DATASET_PRUNE_BATCH_SIZE
+    deleted = 0
+    while True:
+        pks = list(
+            DataSet.objects.filter(user_id=user_id)
+            .order_by('-uploaded_at', '-pk')
+            .values_list('pk', flat=True)[keep:keep + batch_size]
+        )
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            DataSet.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+def _run_prune(user_id):
+    with _lock:
+        _pending.discard(user_id)
+    try:
+        prune_user_datasets(user_id)
+    finally:
+        connections.close_all()
+
+
+def _submit(user_id):
+    with _lock:
+        if user_id in _pending:
+            return
+        _pending.add(user_id)
+    background.submit(_executor, _run_prune, user_id, description="dataset prune for user %s")
+
+
+def schedule_prune(user_id):
+    """
+    Queues a background prune for the user after the current transaction
+    commits. Calls made while a prune for the user is pending are coalesced.
+    """
+    transaction.on_commit(lambda: _submit(user_id))
@@ -0,0 +1,168 @@
+"""
+Schema of uploaded equipment CSVs.
+
+Uploads are read with an explicit `usecols=` and `dtype=`: float32 for the
+numeric readings, categorical for Type and text for Equipment Name. Other
+columns are not read. The header is checked before any data is parsed, and
+a cell that does not fit its dtype fails the chunk it is in. The failing
+region is then rescanned as text to report each bad cell by row. Typed
+formats (Parquet, Arrow) are cast to the same dtypes by `coerce_frame`.
+"""
+import pandas as pd
+from django.conf import settings
+
+from .summary import GROUP_COLUMN, NUMERIC_COLUMNS, SUMMARY_COLUMNS
+
+EQUIPMENT_COLUMN = 'Equipment Name'
+COLUMN_DTYPES = {
+    EQUIPMENT_COLUMN: str,
+    GROUP_COLUMN: 'category',
+    **{column: 'float32' for column in NUMERIC_COLUMNS},
+}
+REQUIRED_COLUMNS = SUMMARY_COLUMNS
+
+
+class SchemaError(ValueError):
+    """
+    An upload that does not match the schema. `errors` lists the problems,
+    each a dict with `row` (1-based data row, None for the header),
+    `column`, `value` and `error`.
+    """
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.message = message
+        self.errors = list(errors)
+
+
+def read_header(fileobj):
+    fileobj.seek(0)
+    try:
+        columns = pd.read_csv(fileobj, nrows=0).columns.tolist()
+    except pd.errors.EmptyDataError:
+        raise SchemaError("The CSV file is empty.")
+    finally:
+        fileobj.seek(0)
+    return columns
+
+
+def validate_columns(columns):
+    """
+    Rejects files missing a required column and returns the schema columns
+    that are present, the only ones that get read.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise SchemaError(
+            f"Missing column in CSV file: {', '.join(missing)}",
+            [{'row': None, 'column': column, 'value': None, 'error': 'missing column'} for column in missing],
+        )
+    return [column for column in COLUMN_DTYPES if column in columns]
+
+
+def validate_header(fileobj):
+    """
+    Checks the header row only and returns the read_csv options for the
+    columns present. Runs before the file is hashed or parsed.
+    """
+    usecols = validate_columns(read_header(fileobj))
+    return {'usecols': usecols, 'dtype': {column: COLUMN_DTYPES[column] for column in usecols}}
+
+
+def coerce_frame(frame, offset=0):
+    """
+    Casts a frame from a typed format (Parquet, Arrow) to the schema's
+    dtypes. Numeric columns stored as text are parsed, and cells that are
+    not numbers raise SchemaError with their rows, counted from `offset`.
+    """
+    errors = []
+    for column in NUMERIC_COLUMNS:
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            frame[column] = values.astype('float32')
+            continue
+        parsed = pd.to_numeric(values, errors='coerce')
+        bad = values.notna() & parsed.isna()
+        for position in bad.to_numpy().nonzero()[0][:settings.SCHEMA_MAX_ERRORS]:
+            errors.append({'row': offset + int(position) + 1, 'column': column,
+                           'value': str(values.iat[position]), 'error': 'not a number'})
+        frame[column] = parsed.astype('float32')
+    if errors:
+        errors = sorted(errors, key=lambda error: error['row'])[:settings.SCHEMA_MAX_ERRORS]
+        raise SchemaError(f"Invalid values in file (first at row {errors[0]['row']}).", errors)
+    if not isinstance(frame[GROUP_COLUMN].dtype, pd.CategoricalDtype):
+        frame[GROUP_COLUMN] = frame[GROUP_COLUMN].astype('category')
+    if EQUIPMENT_COLUMN in frame and frame[EQUIPMENT_COLUMN].dtype != object:
+        names = frame[EQUIPMENT_COLUMN]
+        frame[EQUIPMENT_COLUMN] = names.astype(str).astype(object).where(names.notna())
+    return frame
+
+
+def find_errors(fileobj, options, start=0, limit=None):
+    """
+    Rescans the numeric columns as text from data row `start` and returns
+    up to `limit` cells that are not numbers.
+    """
+    limit = limit or settings.SCHEMA_MAX_ERRORS
+    numeric = [column for column in NUMERIC_COLUMNS if column in options['usecols']]
+    fileobj.seek(0)
+    errors = []
+    reader = pd.read_csv(fileobj, usecols=numeric, dtype=str, skiprows=range(1, start + 1),
+                         chunksize=settings.INGEST_CHUNK_SIZE)
+    with reader:
+        for offset, chunk in _offsets(reader, start):
+            for column in numeric:
+                values = chunk[column]
+                bad = values.notna() & pd.to_numeric(values, errors='coerce').isna()
+                for index in bad.index[bad.to_numpy()]:
+                    errors.append({'row': offset + int(index) - chunk.index[0] + 1, 'column': column,
+                                   'value': values[index], 'error': 'not a number'})
+            if len(errors) >= limit:
+                break
+    return sorted(errors, key=lambda error: error['row'])[:limit]
+
+
+def _offsets(reader, start):
+    offset = start
+    for chunk in reader:
+        yield offset, chunk
+        offset += len(chunk)
+
+
+def _schema_error(fileobj, options, start, exc):
+    errors = find_errors(fileobj, options, start)
+    if not errors:
+        return SchemaError(f"Could not parse CSV file: {exc}")
+    return SchemaError(f"Invalid values in CSV file (first at row {errors[0]['row']}).", errors)
+
+
+def iter_validated_chunks(fileobj, chunksize=None):
+    """
+    Yields typed DataFrames of at most `chunksize` rows, raising
+    SchemaError on the first chunk that does not parse.
+    """
+    options = validate_header(fileobj)
+    rows = 0
+    try:
+        with pd.read_csv(fileobj, chunksize=chunksize or settings.INGEST_CHUNK_SIZE, **options) as reader:
+            for chunk in reader:
+                rows += len(chunk)
+                yield chunk
+    except SchemaError:
+        # Raised by the stream itself, e.g. a file too large once decompressed
+        raise
+    except ValueError as e:
+        raise _schema_error(fileobj, options, rows, e) from e
+
+
+def read_validated(fileobj):
+    """
+    The whole file as one typed DataFrame.
+    """
+    options = validate_header(fileobj)
+    try:
+        return pd.read_csv(fileobj, **options)
+    except SchemaError:
+        raise
+    except ValueError as e:
+        raise _schema_error(fileobj, options, 0, e) from e
@@ -1,13 +1,37 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from .models import DataSet
+from .models import DataSet, UploadJob
 
 User = get_user_model()
 
 class DataSetSerializer(serializers.ModelSerializer):
+    original_data = serializers.SerializerMethodField()
+
     class Meta:
         model=DataSet
         fields=['id','filename','uploaded_at','summary','original_data']
+
+    def get_original_data(self, obj):
+        return obj.load_rows()
+
+class DataSetSummarySerializer(serializers.ModelSerializer):
+    """
+    Dataset metadata and summary only, without the row payload.
+    """
+    class Meta:
+        model=DataSet
+        fields=['id','filename','uploaded_at','summary']
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    """
+    Status of a background upload. `progress` is a percentage.
+    """
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model=UploadJob
+        fields=['id','status','filename','rows_processed','bytes_processed','bytes_total',
+                'progress','error','errors','dataset','created_at','updated_at']
         
 class RegisterSerializer(serializers.ModelSerializer):
     """
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token
+from .models import DataSet
+from .caching import ResponseCache
+from .reports import ReportCache
+
+
+@receiver(post_delete, sender=DataSet)
+def delete_rows_file(sender, instance, **kwargs):
+    """
+    Removes a dataset's rows file once no dataset refers to it any more.
+    Only repeat uploads of the same content share a file, so the check
+    goes through the content_hash index, and it runs after the deleting
+    transaction commits.
+    """
+    name = instance.rows_file.name
+    if not name:
+        return
+    storage = instance.rows_file.storage
+    content_hash = instance.content_hash
+
+    def cleanup():
+        if not content_hash or not DataSet.objects.filter(content_hash=content_hash, rows_file=name).exists():
+            storage.delete(name)
+
+    transaction.on_commit(cleanup)
+
+
+@receiver(post_delete, sender=DataSet)
+def delete_cached_reports(sender, instance, **kwargs):
+    dataset_id = instance.pk
+    transaction.on_commit(lambda: ReportCache().discard(dataset_id))
+
+
+@receiver(post_delete, sender=DataSet)
+def delete_cached_responses(sender, instance, **kwargs):
+    dataset_id = instance.pk
+    transaction.on_commit(lambda: ResponseCache().discard(dataset_id))
+
+
+@receiver(post_delete, sender=Token)
+def uncache_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def uncache_user_tokens(sender, instance, **kwargs):
+    """
+    Drops the cached tokens of a saved user, so that a password change or
+    deactivation is seen by the next request.
+    """
+    keys = list(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+    def invalidate():
+        for key in keys:
+            invalidate_token(key)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,229 @@
+"""
+Columnar row storage for datasets.
+
+A rows file is a plain sequence of `.npy` arrays: first the column names,
+then one array per column for every chunk written. Numeric columns keep
+their numpy dtype and text columns are stored as fixed-width UTF-8 bytes, so
+nothing is pickled and each column can be read (or skipped) on its own.
+"""
+import os
+import uuid
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from django.core.files.storage import default_storage
+
+ROWS_FILE_SUFFIX = '.cols'
+
+
+def _encode_text(values):
+    values = np.asarray(values, dtype=str)
+    try:
+        # Plain ASCII converts in C, and is already valid UTF-8
+        return values.astype('S')
+    except UnicodeEncodeError:
+        return np.char.encode(values, 'utf-8')
+
+
+def _to_array(series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Encode each category once; missing values (code -1) map to b''
+        categories = _encode_text(series.cat.categories.astype(str))
+        return np.append(categories, b'')[series.cat.codes.to_numpy()]
+    return _encode_text(series.fillna('').to_numpy())
+
+
+def _decode_text(values):
+    try:
+        # Plain ASCII converts in C; anything else needs a real UTF-8 decode
+        return values.astype('U')
+    except UnicodeDecodeError:
+        return np.char.decode(values, 'utf-8')
+
+
+def _load_array(f):
+    array = np.load(f, allow_pickle=False)
+    if array.dtype.kind == 'S':
+        return _decode_text(array)
+    return array
+
+
+def _read_header(f):
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    return np.lib.format.read_array_header_2_0(f)
+
+
+def _skip_array(f):
+    shape, _, dtype = _read_header(f)
+    f.seek(int(np.prod(shape)) * dtype.itemsize, os.SEEK_CUR)
+    return shape[0] if shape else 0
+
+
+class ColumnStoreWriter:
+    """
+    Appends DataFrame chunks to a columnar rows file in `storage`, the
+    default storage unless given.
+    """
+
+    def __init__(self, name=None, storage=None):
+        self.name = name or f"datasets/{uuid.uuid4().hex}{ROWS_FILE_SUFFIX}"
+        self.storage = storage or default_storage
+        self.path = self.storage.path(self.name)
+        self.columns = None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._handle = open(self.path, 'wb')
+
+    def write(self, chunk):
+        if self.columns is None:
+            self.columns = [str(column) for column in chunk.columns]
+            np.save(self._handle, np.array(self.columns, dtype=str))
+        for column in self.columns:
+            np.save(self._handle, _to_array(chunk[column]), allow_pickle=False)
+
+    def close(self):
+        if not self._handle.closed:
+            if self.columns is None:
+                np.save(self._handle, np.array([], dtype=str))
+            self._handle.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ColumnStoreReader:
+    """
+    Reads a columnar rows file chunk by chunk, loading only the requested
+    columns and seeking past the rest.
+    """
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._file.seek(0)
+        self.columns = np.load(self._file, allow_pickle=False).tolist()
+        self._data_start = self._file.tell()
+
+    def _peek_length(self):
+        position = self._file.tell()
+        shape, _, _ = _read_header(self._file)
+        self._file.seek(position)
+        return shape[0] if shape else 0
+
+    def iter_chunks(self, columns=None, start=0):
+        """
+        Yields (offset, chunk) pairs, where offset is the row index of the
+        chunk's first row. Chunks that end before `start` are skipped
+        without reading their data.
+        """
+        wanted = set(self.columns if columns is None else columns)
+        self._file.seek(self._data_start)
+        offset = 0
+        while self._file.read(1):
+            self._file.seek(-1, os.SEEK_CUR)
+            length = self._peek_length()
+            if offset + length <= start:
+                for _ in self.columns:
+                    _skip_array(self._file)
+                offset += length
+                continue
+            chunk = {}
+            for column in self.columns:
+                if column in wanted:
+                    chunk[column] = _load_array(self._file)
+                else:
+                    _skip_array(self._file)
+            yield offset, chunk
+            offset += length
+
+    def read(self, columns=None):
+        """
+        Returns a dict of column name to a single concatenated array.
+        """
+        names = [column for column in self.columns if columns is None or column in columns]
+        parts = {column: [] for column in names}
+        for _, chunk in self.iter_chunks(names):
+            for column in names:
+                parts[column].append(chunk[column])
+        return self._concat(parts)
+
+    def read_window(self, start, limit, columns=None, where=None):
+        """
+        Returns up to `limit` rows at or after row index `start`, as a dict of
+        column arrays, plus the row index to resume from (None once the data
+        is exhausted). `where` maps a column name to the values it may take.
+        """
+        names = [column for column in self.columns if columns is None or column in columns]
+        where = where or {}
+        needed = set(names) | set(where) or set(self.columns[:1])
+        parts = {column: [] for column in names}
+        remaining = limit
+        for offset, chunk in self.iter_chunks(needed, start=start):
+            local = max(start - offset, 0)
+            length = len(next(iter(chunk.values())))
+            mask = np.ones(length - local, dtype=bool)
+            for column, values in where.items():
+                mask &= np.isin(chunk[column][local:], values)
+            selected = np.flatnonzero(mask)[:remaining] + local
+            for column in names:
+                parts[column].append(chunk[column][selected])
+            remaining -= len(selected)
+            if remaining == 0:
+                return self._concat(parts), offset + int(selected[-1]) + 1
+        return self._concat(parts), None
+
+    @staticmethod
+    def _concat(parts):
+        return {
+            column: np.concatenate(arrays) if arrays else np.array([])
+            for column, arrays in parts.items()
+        }
+
+
+def to_python(array):
+    """
+    Array values as Python objects. float32 values go through their
+    shortest decimal form, so 5.2 comes back as 5.2 and not 5.199999809.
+    """
+    if array.dtype == np.float32:
+        # Readings repeat a lot, so convert each distinct value once
+        values, inverse = np.unique(array, return_inverse=True)
+        return values.astype(str).astype(np.float64)[inverse].tolist()
+    return array.tolist()
+
+
+def columns_to_records(columns):
+    """
+    Turns a dict of column arrays into the list-of-dicts row format the API
+    has always returned. Empty text cells come back as None.
+    """
+    names = list(columns)
+    values = []
+    for name in names:
+        array = columns[name]
+        if array.dtype.kind == 'U':
+            values.append([value or None for value in array.tolist()])
+        else:
+            values.append(to_python(array))
+    return list(map(dict, map(zip, repeat(names), zip(*values))))
+
+
+def write_records(records, name=None):
+    """
+    Stores a list of row dicts (the legacy JSON format) as a rows file and
+    returns its storage name.
+    """
+    writer = ColumnStoreWriter(name)
+    try:
+        if records:
+            writer.write(pd.DataFrame.from_records(records))
+    except Exception:
+        writer.discard()
+        raise
+    writer.close()
+    return writer.name
@@ -0,0 +1,313 @@
+"""
+Summary engine for uploaded datasets.
+
+Every chunk of rows goes through a single groupby on `Type` that yields the
+per-type moments (count, mean, m2, min, max) of all numeric columns at once.
+Chunks are merged with Chan's parallel update, and overall figures are
+derived from the per-type moments, so no statistic rescans the data.
+Percentiles need the values themselves; they are taken from a uniform
+bottom-k sample of at most SUMMARY_SAMPLE_SIZE rows, which is exact for
+datasets that fit in the sample.
+
+Aggregates are looked up by name from SUMMARY_AGGREGATES. Names like `p90`
+give percentiles, and dotted paths import custom `Aggregate` instances.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+GROUP_COLUMN = 'Type'
+SUMMARY_COLUMNS = [GROUP_COLUMN] + NUMERIC_COLUMNS
+MISSING_GROUP = ''
+MOMENTS = ('count', 'mean', 'var', 'min', 'max')
+
+
+class Aggregate:
+    """
+    A named statistic computed from per-group moments. `func` receives a
+    dict with `count`, `mean`, `m2`, `min` and `max` DataFrames (index:
+    group, columns: numeric columns) and returns a DataFrame of that shape.
+    Percentile aggregates set `quantile` instead and are read off the sample.
+    `observed` aggregates (min, max, percentiles) are readings rather than
+    computed figures, so they are reported at the readings' precision.
+    """
+
+    def __init__(self, name, func=None, quantile=None, observed=None):
+        self.name = name
+        self.func = func
+        self.quantile = quantile
+        self.observed = quantile is not None if observed is None else observed
+
+    def __repr__(self):
+        return f"Aggregate({self.name!r})"
+
+
+AGGREGATES = {}
+
+
+def register_aggregate(name, observed=False):
+    """
+    Decorator registering a moments-based aggregate under `name`.
+    """
+    def decorator(func):
+        AGGREGATES[name] = Aggregate(name, func, observed=observed)
+        return func
+    return decorator
+
+
+@register_aggregate('count')
+def _count(moments):
+    return moments['count'].astype('int64')
+
+
+@register_aggregate('sum')
+def _sum(moments):
+    return moments['count'] * moments['mean']
+
+
+@register_aggregate('mean')
+def _mean(moments):
+    return moments['mean'].where(moments['count'] > 0)
+
+
+@register_aggregate('min', observed=True)
+def _min(moments):
+    return moments['min']
+
+
+@register_aggregate('max', observed=True)
+def _max(moments):
+    return moments['max']
+
+
+@register_aggregate('var')
+def _var(moments):
+    return (moments['m2'] / (moments['count'] - 1)).where(moments['count'] > 1)
+
+
+@register_aggregate('std')
+def _std(moments):
+    return np.sqrt(_var(moments))
+
+
+def get_aggregate(name):
+    if isinstance(name, Aggregate):
+        return name
+    if name in AGGREGATES:
+        return AGGREGATES[name]
+    match = re.fullmatch(r'p(\d{1,2}(?:\.\d+)?|100)', name)
+    if match:
+        return Aggregate(name, quantile=float(match.group(1)) / 100)
+    if '.' in name:
+        return import_string(name)
+    raise KeyError(f"Unknown summary aggregate: {name}")
+
+
+def group_codes(values):
+    """
+    Factorizes group labels once. Returns integer codes, where missing
+    labels get -1, and the label name for each code.
+    """
+    codes, uniques = pd.factorize(values)
+    names = np.append(np.asarray(uniques).astype(str), MISSING_GROUP)
+    return codes, names
+
+
+def chunk_moments(chunk, group_column=GROUP_COLUMN):
+    """
+    Per-group moments of one chunk (by type unless `group_column` says
+    otherwise), from a single groupby.
+    """
+    codes, names = group_codes(chunk[group_column])
+    # Accumulate in double precision whatever the column dtype
+    grouped = chunk[NUMERIC_COLUMNS].astype('float64').groupby(codes, sort=False)
+    stats = grouped.agg(list(MOMENTS))
+    stats.index = names[stats.index]
+    rows = grouped.size()
+    rows.index = names[rows.index]
+    count = stats.xs('count', axis=1, level=1)
+    return {
+        'rows': rows,
+        'count': count,
+        'mean': stats.xs('mean', axis=1, level=1).fillna(0.0),
+        'm2': (stats.xs('var', axis=1, level=1) * (count - 1)).fillna(0.0),
+        'min': stats.xs('min', axis=1, level=1),
+        'max': stats.xs('max', axis=1, level=1),
+    }
+
+
+def merge_moments(a, b):
+    """
+    Combines two sets of per-group moments (Chan et al. parallel update).
+    """
+    if a is None:
+        return b
+    na, nb = a['count'].align(b['count'], fill_value=0)
+    ma, mb = a['mean'].align(b['mean'], fill_value=0.0)
+    m2a, m2b = a['m2'].align(b['m2'], fill_value=0.0)
+    n = na + nb
+    delta = mb - ma
+    weight = (nb / n.where(n > 0)).fillna(0.0)
+    return {
+        'rows': a['rows'].add(b['rows'], fill_value=0).astype(int),
+        'count': n,
+        'mean': ma + delta * weight,
+        'm2': m2a + m2b + delta ** 2 * na * weight,
+        'min': pd.concat([a['min'], b['min']]).groupby(level=0).min(),
+        'max': pd.concat([a['max'], b['max']]).groupby(level=0).max(),
+    }
+
+
+def total_moments(moments):
+    """
+    Collapses per-group moments into a single-row overall set.
+    """
+    count = moments['count'].sum()
+    mean = (moments['count'] * moments['mean']).sum() / count.where(count > 0)
+    spread = (moments['count'] * (moments['mean'] - mean) ** 2).sum()
+    frame = lambda series: series.to_frame().T
+    return {
+        'count': frame(count),
+        'mean': frame(mean.fillna(0.0)),
+        'm2': frame(moments['m2'].sum() + spread),
+        'min': frame(moments['min'].min()),
+        'max': frame(moments['max'].max()),
+    }
+
+
+def _clean(value, single=False):
+    """
+    A JSON-ready Python value. With `single`, floats are rounded to the
+    shortest decimal that identifies them in float32, the precision the
+    readings were parsed at; only for values that are readings themselves.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float) and not math.isfinite(value):
+        # JSON has no NaN or infinity
+        return None
+    if single and isinstance(value, float):
+        return float(str(np.float32(value)))
+    return value
+
+
+def single_precision_columns(chunk):
+    return {column for column in NUMERIC_COLUMNS if chunk[column].dtype == np.float32}
+
+
+class SummaryEngine:
+    """
+    Accumulates the configured aggregates over one or more chunks.
+    """
+
+    def __init__(self, aggregates=None, sample_size=None, seed=None):
+        names = settings.SUMMARY_AGGREGATES if aggregates is None else aggregates
+        self.aggregates = [get_aggregate(name) for name in names]
+        self.sample_size = settings.SUMMARY_SAMPLE_SIZE if sample_size is None else sample_size
+        self.total_count = 0
+        self.single = set()
+        self.moments = None
+        self.sample = None
+        self._sample_keys = None
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def needs_sample(self):
+        return any(aggregate.quantile is not None for aggregate in self.aggregates)
+
+    def update(self, chunk):
+        missing = [column for column in SUMMARY_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise KeyError(', '.join(missing))
+        self.total_count += len(chunk)
+        self.single |= single_precision_columns(chunk)
+        self.moments = merge_moments(self.moments, chunk_moments(chunk))
+        if self.needs_sample and len(chunk):
+            self._update_sample(chunk[SUMMARY_COLUMNS])
+
+    def _update_sample(self, chunk):
+        # Bottom-k sampling: every row gets a random key and the rows with
+        # the k smallest keys seen so far form a uniform sample.
+        keys = self._rng.random(len(chunk))
+        if self.sample is not None and len(self._sample_keys) >= self.sample_size:
+            candidates = keys < self._sample_keys.max()
+            chunk, keys = chunk[candidates], keys[candidates]
+        if self.sample is not None:
+            chunk = pd.concat([self.sample, chunk], ignore_index=True)
+            keys = np.concatenate([self._sample_keys, keys])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            chunk = chunk.iloc[keep].reset_index(drop=True)
+            keys = keys[keep]
+        self.sample, self._sample_keys = chunk, keys
+
+    def _quantiles(self, grouped):
+        aggregates = [aggregate for aggregate in self.aggregates if aggregate.quantile is not None]
+        if not aggregates:
+            return {}
+        table = grouped.quantile([aggregate.quantile for aggregate in aggregates])
+        return {
+            aggregate.name: table.xs(aggregate.quantile, level=-1)
+            for aggregate in aggregates
+        }
+
+    def _compute(self, moments, grouped):
+        values = self._quantiles(grouped) if grouped is not None else {}
+        for aggregate in self.aggregates:
+            if aggregate.quantile is None:
+                values[aggregate.name] = aggregate.func(moments)
+        return values
+
+    def _table(self, values, group):
+        return {
+            column: {
+                aggregate.name: _clean(values[aggregate.name].at[group, column],
+                                       aggregate.observed and column in self.single)
+                if aggregate.name in values and group in values[aggregate.name].index else None
+                for aggregate in self.aggregates
+            }
+            for column in NUMERIC_COLUMNS
+        }
+
+    def result(self):
+        if self.moments is None:
+            self.update(pd.DataFrame(columns=SUMMARY_COLUMNS))
+        moments = self.moments
+        overall = total_moments(moments)
+
+        grouped_by_type = overall_grouped = None
+        if self.sample is not None:
+            codes, names = group_codes(self.sample[GROUP_COLUMN])
+            grouped_by_type = self.sample[NUMERIC_COLUMNS].groupby(names[codes], sort=False)
+            overall_grouped = self.sample[NUMERIC_COLUMNS].groupby(np.zeros(len(self.sample), dtype=int))
+        by_type = self._compute(moments, grouped_by_type)
+        totals = self._compute(overall, overall_grouped)
+
+        rows = moments['rows'].drop(MISSING_GROUP, errors='ignore').sort_values(ascending=False, kind='stable')
+        means = totals['mean'] if 'mean' in totals else _mean(overall)
+        return {
+            'total_count': self.total_count,
+            'avg_flowrate': _clean(means.iat[0, means.columns.get_loc('Flowrate')]),
+            'avg_pressure': _clean(means.iat[0, means.columns.get_loc('Pressure')]),
+            'avg_temperature': _clean(means.iat[0, means.columns.get_loc('Temperature')]),
+            'equipment_type_distribution': {str(key): int(value) for key, value in rows.items()},
+            'statistics': {
+                'overall': self._table(totals, 0),
+                'by_type': {str(group): self._table(by_type, group) for group in rows.index},
+            },
+        }
+
+
+def summarize(df, **kwargs):
+    """
+    Summary of a whole DataFrame in one pass.
+    """
+    engine = SummaryEngine(**kwargs)
+    engine.update(df)
+    return engine.result()
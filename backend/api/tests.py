@@ -1,3 +1,418 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import background, bulk, jobs
+from .benchmarks import generate_frame
+from .ingest import create_dataset
+from .models import DataSet, UploadJob
+from .storage import ColumnStoreReader, columns_to_records
+from .summary import NUMERIC_COLUMNS, SummaryEngine, summarize
+
+User = get_user_model()
+
+
+def frame_csv(frame):
+    return frame.to_csv(index=False).encode()
+
+
+class TemporaryMediaMixin:
+    """
+    Points MEDIA_ROOT and the file caches under it at a temporary directory.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=media,
+            REPORT_CACHE_DIR=f'{media}/reports',
+            RESPONSE_CACHE_DIR=f'{media}/responses',
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+
+class DatasetTestCase(TemporaryMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, user=None, filename='data.csv'):
+        return create_dataset(user or self.user, SimpleUploadedFile(filename, content), filename)
+
+    def rows_file_exists(self, name):
+        return DataSet._meta.get_field('rows_file').storage.exists(name)
+
+    def delete(self, dataset):
+        with self.captureOnCommitCallbacks(execute=True):
+            dataset.delete()
+
+
+@override_settings(INGEST_CHUNK_SIZE=7)
+class RowsPaginationTests(DatasetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.frame = generate_frame(100, seed=1)
+        self.dataset = self.upload(frame_csv(self.frame))
+
+    def fetch_all(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['Equipment Name'] for row in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_type_filter_pages_across_chunks(self):
+        types = self.frame['Type'].unique()[:2]
+        expected = self.frame.loc[self.frame['Type'].isin(types), 'Equipment Name'].tolist()
+        pages = self.fetch_all(f'/api/datasets/{self.dataset.pk}/rows/?type={",".join(types)}&page_size=5')
+        self.assertEqual([name for page in pages for name in page], expected)
+        self.assertTrue(all(len(page) == 5 for page in pages[:-1]))
+
+    def test_projection(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/rows/?columns=Pressure&page_size=3')
+        self.assertEqual(response.data['results'], [{'Pressure': value} for value in self.frame['Pressure'][:3]])
+
+    def test_unknown_column(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/rows/?columns=Density')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/rows/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+
+class SummaryMomentTests(TestCase):
+    """
+    Merged per-chunk moments give the statistics pandas computes on the
+    whole frame.
+    """
+
+    def setUp(self):
+        self.frame = generate_frame(1000, seed=2)
+        # Blank cells are left out of the statistics, as pandas does
+        self.frame.loc[::13, 'Flowrate'] = np.nan
+        self.frame.loc[::17, 'Temperature'] = np.nan
+
+    def summarize_in_chunks(self, size):
+        engine = SummaryEngine(aggregates=['count', 'mean', 'std', 'min', 'max'])
+        for start in range(0, len(self.frame), size):
+            engine.update(self.frame.iloc[start:start + size])
+        return engine.result()
+
+    def assert_matches(self, table, frame):
+        for column in NUMERIC_COLUMNS:
+            values = frame[column]
+            self.assertEqual(table[column]['count'], values.count())
+            for name in ('mean', 'std', 'min', 'max'):
+                self.assertAlmostEqual(table[column][name], getattr(values, name)(), places=9)
+
+    def test_overall(self):
+        for size in (3, 7, 1000):
+            with self.subTest(chunk_size=size):
+                statistics = self.summarize_in_chunks(size)['statistics']
+                self.assert_matches(statistics['overall'], self.frame)
+
+    def test_by_type(self):
+        summary = self.summarize_in_chunks(64)
+        for group, frame in self.frame.groupby('Type'):
+            self.assert_matches(summary['statistics']['by_type'][group], frame)
+        self.assertEqual(summary['equipment_type_distribution'], self.frame['Type'].value_counts().to_dict())
+
+    def test_summarize_counts_blank_cells_as_rows(self):
+        summary = summarize(self.frame)
+        self.assertEqual(summary['total_count'], len(self.frame))
+        self.assertEqual(summary['statistics']['overall']['Flowrate']['count'], self.frame['Flowrate'].count())
+
+
+class ConditionalRequestTests(DatasetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload(frame_csv(generate_frame(20)))
+        self.url = f'/api/datasets/{self.dataset.pk}/'
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    @override_settings(COMPRESSION_MIN_BYTES=0)
+    def test_compressed_etag_is_weak(self):
+        identity = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], f'W/{identity}')
+        # If-None-Match compares weakly, so either form revalidates
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'W/{identity}')
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_without_rows(self):
+        full = self.client.get(self.url)
+        response = self.client.get(self.url, {'rows': 'false'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('original_data', response.data)
+        self.assertEqual(response.data['summary'], json.loads(b''.join(full.streaming_content))['summary'])
+        self.assertNotEqual(response['ETag'], full['ETag'])
+        response = self.client.get(self.url, {'rows': 'false'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_etag(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rows_etag_depends_on_query(self):
+        url = f'/api/datasets/{self.dataset.pk}/rows/'
+        first = self.client.get(url, {'page_size': 5})['ETag']
+        second = self.client.get(url, {'page_size': 6})['ETag']
+        self.assertNotEqual(first, second)
+        response = self.client.get(url, {'page_size': 5}, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, 304)
+
+    def test_history_etag_changes_with_uploads(self):
+        etag = self.client.get('/api/history/')['ETag']
+        self.assertEqual(self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.upload(frame_csv(generate_frame(20, seed=3)))
+        self.assertEqual(self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_users_get_404(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('bob', password='secret'))
+        self.assertEqual(other.get(self.url).status_code, 404)
+        self.assertEqual(other.get(f'{self.url}rows/').status_code, 404)
+        self.assertEqual(other.get(f'{self.url}report/').status_code, 404)
+
+    def assert_detail_body(self, response, body):
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        self.assertEqual(json.loads(body)['id'], self.dataset.pk)
+
+    @override_settings(COMPRESSION_MIN_BYTES=0)
+    def test_detail_streams_under_wsgi(self):
+        # Each server reads the other kind of iterator into memory whole
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            for encoding in ('', 'gzip'):
+                response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=encoding)
+                self.assertTrue(response.streaming)
+                self.assertFalse(response.is_async)
+                self.assert_detail_body(response, b''.join(response.streaming_content))
+
+    @override_settings(COMPRESSION_MIN_BYTES=0)
+    async def test_detail_streams_under_asgi(self):
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+        client = AsyncClient()
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            for encoding in ('', 'gzip'):
+                response = await client.get(self.url, headers={'Authorization': f'Token {token.key}',
+                                                               'Accept-Encoding': encoding})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.is_async)
+                self.assert_detail_body(response, b''.join([part async for part in response.streaming_content]))
+
+
+class DeduplicationTests(DatasetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.content = frame_csv(generate_frame(50, seed=4))
+
+    def test_repeat_upload_shares_rows_file(self):
+        first = self.upload(self.content)
+        second = self.upload(self.content, filename='again.csv')
+        self.assertEqual(first.rows_file.name, second.rows_file.name)
+        self.assertEqual(first.summary, second.summary)
+        self.assertEqual(second.load_rows(), first.load_rows())
+
+    def test_rows_file_outlives_all_but_last_reference(self):
+        other = User.objects.create_user('bob', password='secret')
+        datasets = [self.upload(self.content), self.upload(self.content), self.upload(self.content, user=other)]
+        name = datasets[0].rows_file.name
+        for dataset in datasets[:-1]:
+            self.delete(dataset)
+            self.assertTrue(self.rows_file_exists(name))
+        self.delete(datasets[-1])
+        self.assertFalse(self.rows_file_exists(name))
+
+    def test_upload_after_source_deleted_parses_again(self):
+        first = self.upload(self.content)
+        name = first.rows_file.name
+        self.delete(first)
+        second = self.upload(self.content)
+        self.assertNotEqual(second.rows_file.name, name)
+        self.assertTrue(self.rows_file_exists(second.rows_file.name))
+
+    def test_different_content_is_not_shared(self):
+        first = self.upload(self.content)
+        second = self.upload(frame_csv(generate_frame(50, seed=5)))
+        self.assertNotEqual(first.rows_file.name, second.rows_file.name)
+        self.delete(first)
+        self.assertTrue(self.rows_file_exists(second.rows_file.name))
+
+
+@override_settings(BULK_UPLOAD_WORKERS=1)
+class BulkDeduplicationTests(DatasetTestCase):
+    """
+    Bulk uploads share rows files like single uploads, including when the
+    source goes away between the lookup and the insert.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.content = frame_csv(generate_frame(50, seed=4))
+
+    def bulk_upload(self, *contents):
+        files = [SimpleUploadedFile(f'{i}.csv', content) for i, content in enumerate(contents)]
+        return bulk.create_datasets(self.user, files)
+
+    def bulk_upload_after(self, action, *contents):
+        find_existing = bulk._find_existing
+
+        def find_then_act(hashes):
+            existing = find_existing(hashes)
+            action()
+            return existing
+
+        with mock.patch.object(bulk, '_find_existing', find_then_act):
+            return self.bulk_upload(*contents)
+
+    def assert_readable(self, results, count):
+        self.assertEqual([result['status'] for result in results], ['created'] * count)
+        for result in results:
+            self.assertTrue(self.rows_file_exists(result['dataset'].rows_file.name))
+            self.assertEqual(len(DataSet.objects.get(pk=result['dataset'].pk).load_rows()), 50)
+
+    def test_bulk_reuses_existing_rows_file(self):
+        first = self.upload(self.content)
+        results = self.bulk_upload(self.content, self.content)
+        self.assertEqual({result['dataset'].rows_file.name for result in results}, {first.rows_file.name})
+
+    def test_source_deleted_before_insert(self):
+        first = self.upload(self.content)
+        other = frame_csv(generate_frame(50, seed=6))
+        results = self.bulk_upload_after(lambda: self.delete(first), self.content, other, self.content)
+        self.assert_readable(results, 3)
+        self.assertNotEqual(results[0]['dataset'].rows_file.name, first.rows_file.name)
+        self.assertEqual(results[0]['dataset'].rows_file.name, results[2]['dataset'].rows_file.name)
+
+    def test_rows_file_removed_before_commit(self):
+        # What SQLite, without row locks, can let through
+        first = self.upload(self.content)
+        results = self.bulk_upload_after(lambda: first.rows_file.storage.delete(first.rows_file.name), self.content)
+        self.assert_readable(results, 1)
+        self.assertEqual(DataSet.objects.filter(content_hash=first.content_hash).count(), 2)
+
+
+class UploadJobClaimTests(TestCase):
+
+    def setUp(self):
+        self.job = UploadJob.objects.create(user=User.objects.create_user('alice', password='secret'),
+                                            filename='data.csv')
+        # Queued for longer than the requeue threshold
+        long_ago = timezone.now() - timedelta(seconds=settings.UPLOAD_JOB_REQUEUE_AFTER + 60)
+        UploadJob.objects.filter(pk=self.job.pk).update(created_at=long_ago, updated_at=long_ago)
+
+    def test_claimed_old_job_is_not_requeued(self):
+        self.assertTrue(jobs.claim(self.job.pk))
+        self.assertEqual(jobs.requeue_stale(settings.UPLOAD_JOB_REQUEUE_AFTER), 0)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, UploadJob.RUNNING)
+
+    def test_claim_is_exclusive(self):
+        self.assertTrue(jobs.claim(self.job.pk))
+        self.assertFalse(jobs.claim(self.job.pk))
+
+    def test_running_job_without_progress_is_requeued(self):
+        self.assertTrue(jobs.claim(self.job.pk))
+        self.assertEqual(jobs.requeue_stale(-1), 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, UploadJob.PENDING)
+
+
+class BackgroundSubmitTests(TestCase):
+
+    def test_failure_is_logged(self):
+        def fail(user_id):
+            raise RuntimeError('prune failed')
+
+        with self.assertLogs('api.background') as logs:
+            # Shutting the executor down waits for the callback too
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                background.submit(executor, fail, 3, description="prune for user %s")
+        self.assertIn('Background prune for user 3 failed', logs.output[0])
+        self.assertIn('RuntimeError: prune failed', logs.output[0])
+
+
+class ColumnarRowsMigrationTests(TemporaryMediaMixin, TransactionTestCase):
+    """
+    0004 moves inline rows into columnar rows files and back.
+    """
+    before = [('api', '0003_dataset_rows_file')]
+    after = [('api', '0004_columnar_rows')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_forwards_and_backwards(self):
+        rows = [
+            {'Equipment Name': 'P1', 'Type': 'Pump', 'Flowrate': None, 'Pressure': 2.5, 'Temperature': 110.0},
+            {'Equipment Name': 'V1', 'Type': 'Valve', 'Flowrate': 60.0, 'Pressure': 4.1, 'Temperature': 105.0},
+        ]
+        apps = self.migrate(self.before)
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        dataset = apps.get_model('api', 'DataSet').objects.create(
+            user_id=user.pk, filename='inline.csv', summary={}, original_data=rows)
+
+        apps = self.migrate(self.after)
+        migrated = apps.get_model('api', 'DataSet').objects.get(pk=dataset.pk)
+        self.assertTrue(migrated.rows_file.name.endswith('.cols'))
+        name = migrated.rows_file.name
+        self.assertTrue(migrated.rows_file.storage.exists(name))
+        with migrated.rows_file.open('rb') as f:
+            records = columns_to_records(ColumnStoreReader(f).read())
+        self.assertEqual(records[1], rows[1])
+        self.assertTrue(np.isnan(records[0]['Flowrate']))
+
+        apps = self.migrate(self.before)
+        reverted = apps.get_model('api', 'DataSet').objects.get(pk=dataset.pk)
+        self.assertEqual(reverted.original_data, rows)
+        self.assertFalse(reverted.rows_file)
+        self.assertFalse(migrated.rows_file.storage.exists(name))
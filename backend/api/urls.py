@@ -1,17 +1,25 @@
 from django.urls import path
-from .views import FileUploadView,HistoryListView,DataSetDetailView,CustomAuthToken,GeneratePdfReportView,ChangePasswordView,RegisterView
+from .views import FileUploadView,BulkUploadView,HistoryListView,DataSetDetailView,DataSetRowsView,DataSetScatterView,EquipmentListView,EquipmentTrendView,CustomAuthToken,LogoutView,GeneratePdfReportView,UploadJobStatusView,ChangePasswordView,RegisterView
 
 urlpatterns = [
     # localhost:8000/api/upload/
     path('register/', RegisterView.as_view(), name='user-register'),
 
     path('login/',CustomAuthToken.as_view(),name='api-login'),
+    path('logout/',LogoutView.as_view(),name='api-logout'),
     path('change-password/',ChangePasswordView.as_view(),name='change-password'),
     path('upload/',FileUploadView.as_view(),name='file-upload'),
+    path('upload/bulk/',BulkUploadView.as_view(),name='bulk-upload'),
     path('history/', HistoryListView.as_view(), name='history-list'), 
+    path('jobs/<uuid:pk>/',UploadJobStatusView.as_view(),name='upload-job'),
 
     path('datasets/<int:pk>/',DataSetDetailView.as_view(),name='dataset-detail'),
+    path('datasets/<int:pk>/rows/',DataSetRowsView.as_view(),name='dataset-rows'),
+    path('datasets/<int:pk>/scatter/',DataSetScatterView.as_view(),name='dataset-scatter'),
     
+    path('equipment/',EquipmentListView.as_view(),name='equipment-list'),
+    path('equipment/trends/',EquipmentTrendView.as_view(),name='equipment-trends'),
+
     path('datasets/<int:pk>/report/',GeneratePdfReportView.as_view(),name='dataset-report')
 
 ]
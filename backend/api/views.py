@@ -1,22 +1,46 @@
 from rest_framework.parsers import MultiPartParser, FormParser
 
 from rest_framework.views import APIView
-from rest_framework.generics import CreateAPIView,ListAPIView, RetrieveAPIView,UpdateAPIView
+from rest_framework.generics import CreateAPIView, RetrieveAPIView,UpdateAPIView
 from rest_framework.response import Response
 from rest_framework import status
-import pandas as pd
-from .models import DataSet
-from .serializers import DataSetSerializer,ChangePasswordSerializer,RegisterSerializer 
+from rest_framework.utils.urls import replace_query_param
+from .models import DataSet, EquipmentStats, UploadJob
+from .serializers import DataSetSerializer,DataSetSummarySerializer,ChangePasswordSerializer,RegisterSerializer,UploadJobSerializer
+from .asyncviews import AsyncAPIView, offload
+from .bulk import BulkUploadError, create_datasets
+from .caching import (
+    IMMUTABLE, VALIDATOR_FIELDS, acached_response, conditional_response, dataset_etag, list_etag,
+    set_validators,
+)
+from .downsample import SCATTER_METHODS, scatter_points
+from .equipment import equipment_trend
+from .formats import SUPPORTED_SUFFIXES, detect_format
+from .ingest import acreate_dataset
+from .jobs import enqueue, recover_stale_jobs
+from .metrics import span
+from .reports import get_report, report_key, schedule_report
+from .retention import schedule_prune
+from .schema import SchemaError
+from .storage import ColumnStoreReader, columns_to_records
+from .summary import NUMERIC_COLUMNS
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-import io
+import base64
+import binascii
+import datetime
 
 
 class CustomAuthToken(ObtainAuthToken):
@@ -33,6 +57,19 @@ class CustomAuthToken(ObtainAuthToken):
             'email': user.email
         })
 
+
+class LogoutView(APIView):
+    """
+    Deletes the token the request was made with. The next login issues a
+    new one.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.auth is not None:
+            request.auth.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 # class ChangePasswordView(UpdateAPIView):
 #     serializer_class=ChangePasswordSerializer
 #     model=get_user_model()
@@ -94,94 +131,355 @@ class RegisterView(CreateAPIView):
     permission_classes = [AllowAny] 
     serializer_class = RegisterSerializer    
 
-class FileUploadView(APIView):
+class FileUploadView(AsyncAPIView):
+    """
+    Parsing runs on worker threads, so slow uploads do not hold up other
+    requests under ASGI.
+    """
     parser_classes = (MultiPartParser, FormParser)
 
-    def post(self, request, *args, **kwargs):
-        csv_file = request.FILES.get('file')
-        if not csv_file or not csv_file.name.endswith('.csv'):
-            return Response({"error": "A .csv file is required."}, status=status.HTTP_400_BAD_REQUEST)
+    def use_streaming(self, request, csv_file):
+        """
+        Large uploads (or ones that ask for it with ?stream=true) are ingested
+        chunk by chunk so memory stays flat regardless of file size.
+        """
+        if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return True
+        return csv_file.size > settings.INGEST_STREAMING_THRESHOLD
+
+    def use_background(self, request):
+        return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+    def enqueue_upload(self, request, csv_file):
+        """
+        Stores the file and queues it for a worker. Responds 202 with the job,
+        whose status endpoint reports progress until the dataset is ready.
+        """
+        job = UploadJob(user=request.user, filename=csv_file.name, bytes_total=csv_file.size)
+        job.upload.save(csv_file.name, csv_file, save=False)
+        job.save()
+        enqueue(job)
+        response = Response(UploadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = reverse('upload-job', args=[job.pk])
+        return response
+
+    async def post(self, request, *args, **kwargs):
+        with span('multipart'):
+            csv_file = await offload(lambda: request.FILES.get('file'))()
+        fmt = detect_format(csv_file.name) if csv_file else None
+        if fmt is None:
+            return Response({"error": f"A file of one of these types is required: {', '.join(SUPPORTED_SUFFIXES)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
         
+        if self.use_background(request):
+            return await sync_to_async(self.enqueue_upload)(request, csv_file)
+
         try:
-            df = pd.read_csv(csv_file)
-            summary = {
-                'total_count': len(df),
-                'avg_flowrate': df['Flowrate'].mean(),
-                'avg_pressure': df['Pressure'].mean(),
-                'avg_temperature': df['Temperature'].mean(),
-                'equipment_type_distribution': df['Type'].value_counts().to_dict()
-            }
-            
-            dataset = DataSet.objects.create(
-              user=request.user,
-              filename=csv_file.name,
-              summary=summary,
-              original_data=df.to_dict('records')
-            )
-            
-            all_datasets = DataSet.objects.order_by('-uploaded_at')
-            if all_datasets.count() > 5:
-                pks_to_delete = all_datasets.values_list('pk', flat=True)[5:]
-                DataSet.objects.filter(pk__in=list(pks_to_delete)).delete()
+            streaming = self.use_streaming(request, csv_file)
+            dataset = await acreate_dataset(request.user, csv_file, csv_file.name, streaming, fmt=fmt)
+            await sync_to_async(schedule_prune)(request.user.pk)
+            await sync_to_async(schedule_report)(dataset.pk)
 
-            serializer = DataSetSerializer(dataset)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            serializer_class = DataSetSummarySerializer if streaming else DataSetSerializer
+            # The full serializer reads the rows file
+            data = await offload(lambda: serializer_class(dataset).data)()
+            return Response(data, status=status.HTTP_201_CREATED)
         
+        except SchemaError as e:
+            return Response({"error": e.message, "errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
         except KeyError as e:
             return Response({"error": f"Missing column in CSV file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-class HistoryListView(ListAPIView):
-    serializer_class = DataSetSerializer
+class BulkUploadView(APIView):
+    """
+    Many data files in one request, as repeated `files` fields and/or zip/tar
+    archives. Every file gets its own result; the files that parse are
+    stored together.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        with span('multipart'):
+            uploaded_files = request.FILES.getlist('files') + request.FILES.getlist('file')
+        if not uploaded_files:
+            return Response({"error": "Send data files or zip/tar archives as 'files'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = create_datasets(request.user, uploaded_files)
+        except BulkUploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        created = [result.pop('dataset') for result in results if result['status'] == 'created']
+        summaries = iter(DataSetSummarySerializer(created, many=True).data)
+        for result in results:
+            if result['status'] == 'created':
+                result.update(next(summaries))
+        if created:
+            schedule_prune(request.user.pk)
+            for dataset in created[-settings.DATASET_RETENTION_PER_USER:]:
+                schedule_report(dataset.pk)
+
+        return Response({
+            'created': len(created),
+            'failed': len(results) - len(created),
+            'results': results,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+class HistoryListView(AsyncAPIView):
+    """
+    The ETag covers which datasets are listed, so a client whose history
+    has not changed gets a 304 without any summary being loaded.
+    """
     
-    def get_queryset(self):
+    def get_queryset(self, fields=('id', 'filename', 'uploaded_at', 'summary')):
         """
-        This view should return a list of the last 5 datasets
-        for the currently authenticated user.
+        This view should return a list of the retained datasets
+        (the last 5 by default) for the currently authenticated user,
+        without their rows.
         """
         user = self.request.user
-        return DataSet.objects.filter(user=user).order_by('-uploaded_at')[:5]
+        return (DataSet.objects.filter(user=user)
+                .only(*fields)
+                .order_by('-uploaded_at')[:settings.DATASET_RETENTION_PER_USER])
+
+    async def get(self, request, *args, **kwargs):
+        validators = [dataset async for dataset in self.get_queryset(VALIDATOR_FIELDS)]
+        etag = list_etag(request.user, validators)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        datasets = [dataset async for dataset in self.get_queryset()]
+        return set_validators(Response(DataSetSummarySerializer(datasets, many=True).data), etag)
     
-class DataSetDetailView(RetrieveAPIView):
-    queryset = DataSet.objects.all()
-    serializer_class = DataSetSerializer
+class UploadJobStatusView(RetrieveAPIView):
+    serializer_class = UploadJobSerializer
+
+    def get_queryset(self):
+        return UploadJob.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Clients polling a job are what notice a worker that died with it
+        recover_stale_jobs()
+        return super().retrieve(request, *args, **kwargs)
+
+class DataSetDetailView(AsyncAPIView):
+    """
+    A dataset with all of its rows, or only its summary with ?rows=false.
+    Datasets are immutable, so clients may keep the response for good,
+    conditional requests are answered from the dataset's metadata, and the
+    rendered JSON is cached on the server.
+    """
+
+    def get_queryset(self):
+        return DataSet.objects.filter(user=self.request.user)
+
+    async def get(self, request, pk, *args, **kwargs):
+        dataset = await aget_dataset(self.get_queryset().only(*VALIDATOR_FIELDS), pk=pk)
+        with_rows = request.query_params.get('rows') != 'false'
+        etag = dataset_etag(dataset) if with_rows else dataset_etag(dataset, 'summary')
+        not_modified = conditional_response(request, etag, dataset.uploaded_at, IMMUTABLE)
+        if not_modified is not None:
+            return not_modified
+
+        if not with_rows:
+            summary = await self.get_queryset().only('id', 'filename', 'uploaded_at', 'summary').aget(pk=pk)
+            data = DataSetSummarySerializer(summary).data
+            return set_validators(Response(data), etag, dataset.uploaded_at, IMMUTABLE)
+
+        # Only the compact JSON rendering is cached; the browsable API and
+        # indented JSON are rendered as usual
+        if request.accepted_renderer.format != 'json' or 'indent' in (request.accepted_media_type or ''):
+            full = await self.get_queryset().aget(pk=pk)
+            data = await offload(lambda: DataSetSerializer(full).data)()
+            return set_validators(Response(data), etag, dataset.uploaded_at, IMMUTABLE)
+
+        async def render():
+            full = await self.get_queryset().aget(pk=pk)
+            return await offload(self.render_json)(full)
+
+        return await acached_response(request, dataset, etag, render)
+
+    def render_json(self, dataset):
+        with span('serialize'):
+            data = DataSetSerializer(dataset).data
+        return self.request.accepted_renderer.render(data, self.request.accepted_media_type,
+                                                     self.get_renderer_context())
+
+class DataSetRowsView(AsyncAPIView):
+    """
+    Opt-in access to a dataset's rows, kept apart from the history and
+    summary payloads. Rows come back one page at a time behind an opaque
+    cursor, optionally projected with ?columns=Pressure,Temperature and
+    filtered with ?type=Pump,Valve. Every page is immutable and carries an
+    ETag of the dataset and query.
+    """
+    async def get(self, request, pk, *args, **kwargs):
+        dataset = await aget_dataset(DataSet.objects.only(*VALIDATOR_FIELDS), pk=pk, user=request.user)
+        etag = dataset_etag(dataset, request.build_absolute_uri())
+        not_modified = conditional_response(request, etag, dataset.uploaded_at, IMMUTABLE)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            start = decode_cursor(request.query_params.get('cursor'))
+            page_size = int(request.query_params.get('page_size', settings.ROWS_PAGE_SIZE))
+        except (ValueError, binascii.Error):
+            return Response({"error": "Invalid cursor or page_size."}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = max(1, min(page_size, settings.ROWS_MAX_PAGE_SIZE))
+        columns = split_param(request.query_params.get('columns'))
+        types = split_param(request.query_params.get('type'))
+
+        if not dataset.rows_file:
+            return Response({'next': None, 'results': []})
+
+        def read_page():
+            with dataset.rows_file.open('rb') as f:
+                reader = ColumnStoreReader(f)
+                requested = (columns or []) + (['Type'] if types else [])
+                unknown = [column for column in requested if column not in reader.columns]
+                if unknown:
+                    return unknown, None, None
+                data, resume = reader.read_window(start, page_size, columns, where={'Type': types} if types else None)
+                return [], columns_to_records(data), resume
+
+        unknown, results, resume = await offload(read_page)()
+        if unknown:
+            return Response({"error": f"Unknown column(s): {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if resume is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(resume))
+        response = Response({'next': next_url, 'results': results})
+        return set_validators(response, etag, dataset.uploaded_at, IMMUTABLE)
+
+class DataSetScatterView(APIView):
+    """
+    Downsampled Pressure/Temperature points for the scatter plot. ?points=
+    sets the budget, and ?method=bins returns histogram cells with counts
+    instead of a uniform sample.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        dataset = get_object_or_404(DataSet.objects.only('id', 'rows_file', 'summary'), pk=pk, user=request.user)
+
+        method = request.query_params.get('method', 'sample')
+        try:
+            budget = int(request.query_params.get('points', settings.SCATTER_POINTS))
+        except ValueError:
+            return Response({"error": "Invalid points."}, status=status.HTTP_400_BAD_REQUEST)
+        if method not in SCATTER_METHODS:
+            return Response({"error": f"Unknown method: {method}"}, status=status.HTTP_400_BAD_REQUEST)
+        budget = max(1, min(budget, settings.SCATTER_MAX_POINTS))
+
+        points = scatter_points(dataset, 'Pressure', 'Temperature', budget, method)
+        return Response({
+            'method': method,
+            'total_count': dataset.summary.get('total_count'),
+            **points,
+        })
+
+class EquipmentListView(APIView):
+    """
+    Equipment names seen in the user's uploads, with how many uploads
+    include each and when it was last seen.
+    """
+    def get(self, request, *args, **kwargs):
+        equipment = (EquipmentStats.objects.filter(user=request.user)
+                     .values('equipment_name')
+                     .annotate(uploads=Count('id'), last_seen=Max('uploaded_at'))
+                     .order_by('equipment_name'))
+        return Response(list(equipment))
+
+class EquipmentTrendView(APIView):
+    """
+    Statistics of one piece of equipment across uploads, oldest first:
+    ?name=Pump-1, optionally with ?columns=Pressure, ?since=<ISO date>
+    and ?limit=.
+    """
+    def get(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return Response({"error": "The name parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        columns = split_param(request.query_params.get('columns'))
+        unknown = [column for column in columns or [] if column not in NUMERIC_COLUMNS]
+        if unknown:
+            return Response({"error": f"Unknown column(s): {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_since(since)
+            except ValueError:
+                return Response({"error": "Invalid since date."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', settings.EQUIPMENT_TREND_LIMIT)),
+                        settings.EQUIPMENT_TREND_LIMIT)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(equipment_trend(request.user, name, columns, since or None, max(limit, 1)))
+
+async def aget_dataset(queryset, **lookup):
+    """
+    get_object_or_404 for async views, which Django 4.2 lacks.
+    """
+    dataset = await queryset.filter(**lookup).afirst()
+    if dataset is None:
+        raise Http404
+    return dataset
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(str(position).encode()).decode()
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    position = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if position < 0:
+        raise ValueError(cursor)
+    return position
+
+def parse_since(value):
+    """
+    An ISO date or datetime as an aware datetime; dates mean midnight.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def split_param(value):
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
 
 class GeneratePdfReportView(APIView):
+    """
+    Serves the dataset's PDF report from the report cache. The report key is
+    the ETag, so clients that already have this version get a 304.
+    """
     def get(self, request, pk, *args, **kwargs):
         try:
-            dataset = DataSet.objects.get(pk=pk)
+            dataset = DataSet.objects.only('id', 'filename', 'summary', 'rows_file').get(pk=pk, user=request.user)
         except DataSet.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        buffer = io.BytesIO()
-
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
+        etag = f'"{report_key(dataset)}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
 
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(inch, height - inch, f"Analysis Report for: {dataset.filename}")
-
-        p.setFont("Helvetica", 12)
-        p.drawString(inch, height - 1.5*inch, "Summary Statistics")
-        
-        summary = dataset.summary
-        y_pos = height - 2*inch
-        for key, value in summary.items():
-            if key == 'equipment_type_distribution':
-                 p.drawString(1.2*inch, y_pos, f"{key.replace('_', ' ').title()}:")
-                 y_pos -= 0.25*inch
-                 for sub_key, sub_value in value.items():
-                     p.drawString(1.4*inch, y_pos, f"- {sub_key}: {sub_value}")
-                     y_pos -= 0.25*inch
-            else:
-                 p.drawString(1.2*inch, y_pos, f"{key.replace('_', ' ').title()}: {value:.2f}" if isinstance(value, float) else f"{key.replace('_', ' ').title()}: {value}")
-                 y_pos -= 0.25*inch
-
-        p.showPage()
-        p.save()
-
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
+        path, key = get_report(dataset)
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="report_{dataset.id}.pdf"'
-        return response
\ No newline at end of file
+        response['ETag'] = f'"{key}"'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
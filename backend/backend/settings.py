@@ -52,8 +52,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.StaticFilesMiddleware',
+    'api.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -138,6 +140,100 @@ STATIC_URL = '/static/'
 STATIC_ROOT=os.path.join(BASE_DIR,'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploaded dataset files (streamed rows)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# CSV ingest: rows parsed per chunk, and the upload size (in bytes) above which
+# uploads are streamed to disk chunk by chunk instead of parsed in one go.
+INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 50_000))
+INGEST_STREAMING_THRESHOLD = int(os.environ.get('INGEST_STREAMING_THRESHOLD', 10 * 1024 * 1024))
+
+# Threads that validate and parse files for the upload view, which bounds how
+# many uploads are parsed at once
+INGEST_THREADS = int(os.environ.get('INGEST_THREADS', min(4, os.cpu_count() or 1)))
+
+# Bulk uploads: worker processes that parse files (1 or less parses in the
+# web process), and limits on the number and total extracted size of files
+BULK_UPLOAD_WORKERS = int(os.environ.get('BULK_UPLOAD_WORKERS', min(4, os.cpu_count() or 1)))
+BULK_UPLOAD_MAX_FILES = int(os.environ.get('BULK_UPLOAD_MAX_FILES', 5000))
+BULK_UPLOAD_MAX_BYTES = int(os.environ.get('BULK_UPLOAD_MAX_BYTES', 2 * 1024 ** 3))
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# Compressed CSV uploads: the most bytes a single file may decompress to
+UPLOAD_MAX_DECOMPRESSED_BYTES = int(os.environ.get('UPLOAD_MAX_DECOMPRESSED_BYTES', 2 * 1024 ** 3))
+
+# Upload validation: how many bad cells are reported for a rejected file
+SCHEMA_MAX_ERRORS = int(os.environ.get('SCHEMA_MAX_ERRORS', 20))
+
+# Dataset retention: how many datasets each user keeps, and how many rows the
+# background prune deletes per transaction.
+DATASET_RETENTION_PER_USER = int(os.environ.get('DATASET_RETENTION_PER_USER', 5))
+DATASET_PRUNE_BATCH_SIZE = int(os.environ.get('DATASET_PRUNE_BATCH_SIZE', 100))
+
+# Summary engine: aggregates computed per numeric column, overall and per
+# equipment type. `pNN` names are percentiles; dotted paths import custom
+# api.summary.Aggregate instances. Percentiles are read from a uniform sample
+# of at most SUMMARY_SAMPLE_SIZE rows (exact for smaller datasets).
+SUMMARY_AGGREGATES = ['count', 'mean', 'min', 'max', 'std', 'p25', 'p50', 'p75']
+SUMMARY_SAMPLE_SIZE = 200_000
+
+# Per-equipment statistics: files with more distinct equipment names than
+# this are not tracked, and trend queries return at most this many uploads
+EQUIPMENT_STATS_MAX_GROUPS = int(os.environ.get('EQUIPMENT_STATS_MAX_GROUPS', 10_000))
+EQUIPMENT_TREND_LIMIT = int(os.environ.get('EQUIPMENT_TREND_LIMIT', 500))
+
+# Rows API: default and maximum number of rows per page
+ROWS_PAGE_SIZE = 1000
+ROWS_MAX_PAGE_SIZE = 10_000
+
+# Downsampled scatter data: default and maximum point budget, and how long
+# results stay in the cache (seconds)
+SCATTER_POINTS = int(os.environ.get('SCATTER_POINTS', 2000))
+SCATTER_MAX_POINTS = int(os.environ.get('SCATTER_MAX_POINTS', 20_000))
+SCATTER_CACHE_TIMEOUT = int(os.environ.get('SCATTER_CACHE_TIMEOUT', 3600))
+
+# PDF report cache: directory and total size cap (least recently used
+# reports are evicted first)
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(MEDIA_ROOT, 'reports'))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# PDF report contents: points in the pressure/temperature chart and rows in
+# the appendix
+REPORT_SCATTER_POINTS = int(os.environ.get('REPORT_SCATTER_POINTS', 2000))
+REPORT_APPENDIX_ROWS = int(os.environ.get('REPORT_APPENDIX_ROWS', 500))
+
+# Rendered dataset responses: directory and total size cap (least recently
+# used responses are evicted first)
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', os.path.join(MEDIA_ROOT, 'responses'))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+# Background upload jobs: worker threads in the web process. Set to 0 to
+# leave jobs for `manage.py run_upload_jobs` instead. Jobs without progress
+# for UPLOAD_JOB_REQUEUE_AFTER seconds are taken to be orphaned and rerun.
+UPLOAD_JOB_WORKERS = int(os.environ.get('UPLOAD_JOB_WORKERS', 2))
+UPLOAD_JOB_REQUEUE_AFTER = int(os.environ.get('UPLOAD_JOB_REQUEUE_AFTER', 600))
+
+# Response compression: responses smaller than this are sent as they are,
+# larger ones are brotli (preferred) or gzip encoded at these levels
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 5))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+# Metrics: clients allowed to read /metrics, and whether responses carry a
+# Server-Timing header with the request's stage timings (for debugging)
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '') == 'True'
+
+# Token authentication cache: tokens remembered per process (least recently
+# used are evicted first), seconds before a token is checked against the
+# database again (0 disables the cache), and an optional CACHES alias shared
+# between processes. A revoked token can stay usable in other processes for
+# up to TOKEN_CACHE_TIMEOUT seconds.
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10_000))
+TOKEN_CACHE_TIMEOUT = int(os.environ.get('TOKEN_CACHE_TIMEOUT', 60))
+TOKEN_CACHE_ALIAS = os.environ.get('TOKEN_CACHE_ALIAS', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -166,9 +262,13 @@ if DEBUG:
     
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', 
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
\ No newline at end of file
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse  
+from api.metrics import metrics_view
 
 def api_root(request):
     return JsonResponse({
@@ -9,8 +10,15 @@ def api_root(request):
             'register':'/api/register/',
             'login': '/api/login/',
             'upload': '/api/upload/',
+            'bulk_upload': '/api/upload/bulk/',
+            'upload_job': '/api/jobs/<id>/',
             'history': '/api/history/',
-            'dataset_detail': '/api/datasets/<id>/'
+            'dataset_detail': '/api/datasets/<id>/',
+            'dataset_rows': '/api/datasets/<id>/rows/',
+            'dataset_scatter': '/api/datasets/<id>/scatter/',
+            'equipment': '/api/equipment/',
+            'equipment_trends': '/api/equipment/trends/?name=<name>',
+            'metrics': '/metrics'
         }
     })
 
@@ -19,4 +27,5 @@ urlpatterns = [
 
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""
+gunicorn settings for serving the ASGI application on uvicorn workers:
+
+    gunicorn backend.asgi -c gunicorn_asgi.conf.py
+
+Each worker runs one event loop, so the async views (history, detail,
+rows, upload) serve many requests at once, with uploads parsed on
+INGEST_THREADS threads. The WSGI entry point, `gunicorn backend.wsgi`,
+keeps working unchanged.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'uvicorn_worker.UvicornWorker'
+# Large uploads are parsed within the request
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+keepalive = 5
@@ -0,0 +1,262 @@
+"""
+On-disk cache of API responses for the desktop app.
+
+Every GET the app makes can go through `CachedFetcher`, which keeps the
+JSON body together with its ETag, Last-Modified and expiry. Responses the
+server marks immutable (dataset payloads) are served straight from disk
+while fresh; others are revalidated with If-None-Match, so an unchanged
+resource costs a 304. When the backend cannot be reached, cached bodies
+are returned and the fetcher reports that it is offline.
+
+Entries are namespaced by server and user, and the directory is kept
+under a byte budget by evicting the least recently used entries. Parsed
+bodies are also kept in memory, under a much smaller budget.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Parsed payloads kept in memory, so switching back is instant, up to this
+# many bytes of JSON. Parsed objects take several times their JSON size, so
+# larger payloads (full datasets) are always parsed again from disk.
+MEMORY_MAX_BYTES = 32 * 1024 * 1024
+
+
+class OfflineError(Exception):
+    """
+    The backend is unreachable and nothing is cached for the request.
+    """
+
+
+class DiskCache:
+    """
+    Size-bounded LRU of response bodies and their validators. Each entry
+    is a `.body` file with a `.meta` JSON file next to it.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + suffix)
+
+    def meta(self, key):
+        """
+        The validators stored for `key`, or None.
+        """
+        try:
+            with open(self._path(key, '.meta'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def body(self, key):
+        """
+        The stored body, or None. A read counts as a use for LRU.
+        """
+        try:
+            with open(self._path(key, '.body'), 'rb') as f:
+                body = f.read()
+            os.utime(self._path(key, '.body'))
+        except OSError:
+            return None
+        return body
+
+    def put(self, key, body, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        # Body first, so a meta file never points at a missing body
+        self._write(self._path(key, '.body'), body)
+        self._write(self._path(key, '.meta'), json.dumps({**meta, 'key': key}).encode())
+        self.evict()
+
+    def touch(self, key, meta):
+        """
+        Updates an entry's validators after a 304.
+        """
+        self._write(self._path(key, '.meta'), json.dumps({**meta, 'key': key}).encode())
+        try:
+            os.utime(self._path(key, '.body'))
+        except OSError:
+            pass
+
+    def _write(self, path, content):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def evict(self):
+        with self._lock:
+            try:
+                bodies = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.body')]
+            except FileNotFoundError:
+                return
+            bodies.sort(key=lambda entry: entry.stat().st_mtime)
+            total = sum(entry.stat().st_size for entry in bodies)
+            for entry in bodies:
+                if total <= self.max_bytes:
+                    break
+                total -= entry.stat().st_size
+                for path in (entry.path, entry.path[:-len('.body')] + '.meta'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def has_entries(self, prefix):
+        """
+        Whether any entry's key starts with `prefix`. File names are
+        hashes, so this reads the meta files.
+        """
+        try:
+            metas = [entry.path for entry in os.scandir(self.directory) if entry.name.endswith('.meta')]
+        except FileNotFoundError:
+            return False
+        for path in metas:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    key = json.load(f).get('key', '')
+            except (OSError, ValueError):
+                continue
+            if key.startswith(prefix) and os.path.exists(path[:-len('.meta')] + '.body'):
+                return True
+        return False
+
+
+def _max_age(cache_control):
+    """
+    Seconds a response may be used without revalidation.
+    """
+    directives = [directive.strip().lower() for directive in (cache_control or '').split(',')]
+    if 'no-cache' in directives or 'no-store' in directives:
+        return 0
+    for directive in directives:
+        match = re.fullmatch(r'max-age=(\d+)', directive)
+        if match:
+            return int(match.group(1))
+    return 0
+
+
+class CachedFetcher:
+    """
+    GETs JSON through the disk cache. `namespace` (server and user) keeps
+    different accounts' entries apart.
+    """
+
+    def __init__(self, cache, namespace, session=None, timeout=30):
+        self.cache = cache
+        self.namespace = namespace
+        self.session = session or requests
+        self.timeout = timeout
+        self.offline = False
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._memory_lock = threading.Lock()
+
+    def key(self, url, params=None):
+        query = '&'.join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+        return f"{self.namespace}|{url}?{query}"
+
+    def has_entries(self):
+        """
+        Whether anything is cached for this server and user.
+        """
+        return self.cache.has_entries(f"{self.namespace}|")
+
+    def _remember(self, key, etag, data, size):
+        """
+        Keeps parsed `data` in memory, `size` being its JSON length.
+        """
+        with self._memory_lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[2]
+            if size > MEMORY_MAX_BYTES // 4:
+                return
+            self._memory[key] = (etag, data, size)
+            self._memory_bytes += size
+            while self._memory_bytes > MEMORY_MAX_BYTES:
+                _, (_, _, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted
+
+    def _load(self, key, meta):
+        """
+        The cached JSON for `key`, parsed, or None if the body is gone.
+        """
+        with self._memory_lock:
+            remembered = self._memory.get(key)
+            if remembered is not None and remembered[0] == meta.get('etag'):
+                self._memory.move_to_end(key)
+                return remembered[1]
+        body = self.cache.body(key)
+        if body is None:
+            return None
+        data = json.loads(body)
+        self._remember(key, meta.get('etag'), data, len(body))
+        return data
+
+    def get_json(self, url, headers=None, params=None, offline=False):
+        """
+        The JSON body of `url`, from the cache when it is fresh or the
+        server says it has not changed.
+        """
+        key = self.key(url, params)
+        meta = self.cache.meta(key) or {}
+        if meta and (offline or meta.get('expires', 0) > time.time()):
+            data = self._load(key, meta)
+            if data is not None:
+                return data
+            meta = {}
+        if offline:
+            raise OfflineError(f"{url} is not available offline.")
+
+        conditions = {}
+        if meta.get('etag'):
+            conditions['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            conditions['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = self.session.get(url, headers={**(headers or {}), **conditions},
+                                        params=params, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.offline = True
+            data = self._load(key, meta) if meta else None
+            if data is None:
+                raise
+            return data
+        self.offline = False
+
+        if response.status_code == 304 and meta:
+            meta = self._meta(response, meta)
+            self.cache.touch(key, meta)
+            data = self._load(key, meta)
+            if data is not None:
+                return data
+            # The body was evicted in the meantime; fetch it in full
+            response = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        meta = self._meta(response, {})
+        self.cache.put(key, response.content, meta)
+        data = response.json()
+        self._remember(key, meta.get('etag'), data, len(response.content))
+        return data
+
+    @staticmethod
+    def _meta(response, previous):
+        etag = response.headers.get('ETag') or previous.get('etag')
+        return {
+            'etag': etag,
+            'last_modified': response.headers.get('Last-Modified') or previous.get('last_modified'),
+            'expires': time.time() + _max_age(response.headers.get('Cache-Control')),
+            'stored_at': previous.get('stored_at') or time.time(),
+        }
@@ -0,0 +1,297 @@
+"""
+Charts for the desktop dashboard.
+
+Each chart builds its axes and artists once and afterwards only changes
+their data: bar heights, wedge angles, scatter offsets. The artists that
+change between datasets are animated, so they are left out of the cached
+background. When a new dataset leaves the axes as they were, the chart
+restores that background and blits the changed artists; only changes that
+move ticks, limits or labels cost a full redraw, and that is requested
+with draw_idle. Charts render lazily: `set_data` only records the data
+unless the chart is on screen, and `render` catches up when its tab is
+shown.
+"""
+import math
+
+import numpy as np
+
+BACKGROUND = '#050822'
+TEXT = '#e0e1dd'
+ACCENT = '#5694f2'
+GRID = '#3d5a80'
+HIGHLIGHT = '#e5c07b'
+LEGEND_BACKGROUND = '#080c32'
+PIE_COLORS = ['#5694f2', '#3d5a80', '#e5c07b', '#b48ead', '#a3be8c']
+PIE_START_ANGLE = 140
+PIE_PCT_DISTANCE = 0.6
+EMPTY_MESSAGE = 'Upload a file or select from history to view analysis'
+
+
+class Chart:
+    """
+    A figure on a canvas. Subclasses build their artists in `build` and
+    apply a dataset in `refresh`, returning True when the change is
+    confined to the animated artists and can be blitted.
+    """
+
+    def __init__(self, figure, canvas):
+        self.figure = figure
+        self.canvas = canvas
+        self.figure.set_facecolor(BACKGROUND)
+        self.figure.set_layout_engine('tight')
+        self.ax = self.figure.add_subplot(111)
+        self.style_axes()
+        self.message = self.ax.text(0.5, 0.5, EMPTY_MESSAGE, horizontalalignment='center',
+                                    verticalalignment='center', fontsize=12, color=GRID,
+                                    transform=self.ax.transAxes)
+        self.data = None
+        self.dirty = True
+        self.empty = None
+        self.background = None
+        self.build()
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def style_axes(self):
+        ax = self.ax
+        ax.set_facecolor(BACKGROUND)
+        ax.tick_params(axis='x', colors=TEXT)
+        ax.tick_params(axis='y', colors=TEXT)
+        for spine in ax.spines.values():
+            spine.set_edgecolor(GRID)
+        ax.title.set_color(TEXT)
+        ax.xaxis.label.set_color(TEXT)
+        ax.yaxis.label.set_color(TEXT)
+
+    def build(self):
+        pass
+
+    def refresh(self, data):
+        return False
+
+    def animated_artists(self):
+        return []
+
+    def show_axes(self, visible):
+        """
+        Switches between the chart and the empty-state message.
+        """
+        self.ax.set_axis_on() if visible else self.ax.set_axis_off()
+        self.ax.title.set_visible(visible)
+        self.message.set_visible(not visible)
+        for artist in self.animated_artists():
+            artist.set_visible(visible)
+
+    def set_data(self, data, visible=True):
+        self.data = data
+        self.dirty = True
+        if visible:
+            self.render()
+
+    def render(self):
+        """
+        Applies the latest data to the artists, if it changed since the
+        last render.
+        """
+        if not self.dirty:
+            return
+        self.dirty = False
+        empty = not self.data
+        if empty != self.empty:
+            self.show_axes(not empty)
+        blit = not empty and self.refresh(self.data) and empty == self.empty
+        self.empty = empty
+        if blit and self.background is not None:
+            self.blit()
+        else:
+            self.canvas.draw_idle()
+
+    def on_draw(self, event):
+        # A full draw leaves out animated artists: keep it as the
+        # background, then paint them on top
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for artist in self.animated_artists():
+            if artist.get_visible():
+                self.figure.draw_artist(artist)
+
+    def blit(self):
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+
+def _round_up(value):
+    """
+    `value` rounded up to half a power of ten, so that datasets of a
+    similar size share an axis.
+    """
+    if value <= 0:
+        return 1
+    step = 10 ** math.floor(math.log10(value)) / 2
+    return math.ceil(value / step) * step
+
+
+def _animate(artists):
+    for artist in artists:
+        artist.set_animated(True)
+    return list(artists)
+
+
+class BarChart(Chart):
+    """
+    Equipment count per type.
+    """
+
+    def build(self):
+        self.ax.set_title('Equipment Type Distribution')
+        self.ax.set_ylabel('Count')
+        self.labels = None
+        self.bars = []
+
+    def animated_artists(self):
+        return self.bars
+
+    def refresh(self, data):
+        distribution = data.get('summary', {}).get('equipment_type_distribution', {})
+        labels, heights = list(distribution.keys()), list(distribution.values())
+        ylim = (0, _round_up(max(heights, default=0) * 1.05))
+        if labels == self.labels and ylim == self.ax.get_ylim():
+            for bar, height in zip(self.bars, heights):
+                bar.set_height(height)
+            return True
+        if labels != self.labels:
+            for bar in self.bars:
+                bar.remove()
+            positions = range(len(labels))
+            self.bars = _animate(self.ax.bar(positions, heights, color=ACCENT))
+            self.ax.set_xticks(positions)
+            self.ax.set_xticklabels(labels)
+            self.ax.relim()
+            self.ax.autoscale_view(scaley=False)
+            self.labels = labels
+        else:
+            for bar, height in zip(self.bars, heights):
+                bar.set_height(height)
+        self.ax.set_ylim(*ylim)
+        return False
+
+
+class PieChart(Chart):
+    """
+    Share of each equipment type.
+    """
+
+    def build(self):
+        self.ax.set_title('Equipment Percentage')
+        for spine in self.ax.spines.values():
+            spine.set_visible(False)
+        self.labels = None
+        self.wedges = []
+        self.autotexts = []
+        self.legend = None
+
+    def show_axes(self, visible):
+        super().show_axes(visible)
+        # The pie has no ticks or frame to show
+        self.ax.set_axis_off()
+        if self.legend is not None:
+            self.legend.set_visible(visible)
+
+    def animated_artists(self):
+        return self.wedges + self.autotexts
+
+    def refresh(self, data):
+        distribution = data.get('summary', {}).get('equipment_type_distribution', {})
+        labels = list(distribution.keys())
+        values = np.asarray(list(distribution.values()), dtype=float)
+        if labels == self.labels and values.sum() > 0:
+            self.set_angles(values)
+            return True
+        for artist in self.wedges + self.autotexts:
+            artist.remove()
+        if self.legend is not None:
+            self.legend.remove()
+        self.wedges, self.autotexts, self.legend = [], [], None
+        self.labels = labels
+        if values.sum() > 0:
+            wedges, texts, autotexts = self.ax.pie(
+                values, autopct='%1.1f%%', startangle=PIE_START_ANGLE, pctdistance=PIE_PCT_DISTANCE,
+                textprops=dict(color="white", weight="bold"), colors=PIE_COLORS,
+                wedgeprops={'edgecolor': BACKGROUND, 'linewidth': 2})
+            self.wedges, self.autotexts = _animate(wedges), _animate(autotexts)
+            self.legend = self.ax.legend(wedges, labels, title="Equipment", loc="center left",
+                                         bbox_to_anchor=(1, 0, 0.5, 1), labelcolor=TEXT,
+                                         facecolor=LEGEND_BACKGROUND, edgecolor='none')
+            self.legend.get_title().set_color(ACCENT)
+            self.legend.get_title().set_weight('bold')
+        self.ax.set_axis_off()
+        return False
+
+    def set_angles(self, values):
+        """
+        Moves the wedges and their labels to new values, as `Axes.pie`
+        would have placed them.
+        """
+        fractions = values / values.sum()
+        start = PIE_START_ANGLE / 360
+        for wedge, text, fraction in zip(self.wedges, self.autotexts, fractions):
+            end = start + fraction
+            wedge.set_theta1(360 * start)
+            wedge.set_theta2(360 * end)
+            middle = math.pi * (start + end)
+            text.set_position((PIE_PCT_DISTANCE * math.cos(middle), PIE_PCT_DISTANCE * math.sin(middle)))
+            text.set_text(f"{fraction * 100:1.1f}%")
+            start = end
+
+
+class ScatterChart(Chart):
+    """
+    Pressure against temperature, from downsampled points.
+    """
+
+    def build(self):
+        self.ax.set_xlabel('Pressure')
+        self.ax.set_ylabel('Temperature')
+        self.ax.grid(True, color=GRID, linestyle='--', linewidth=0.5)
+        self.points = self.ax.scatter([], [], s=6, alpha=0.7, c=HIGHLIGHT, linewidths=0)
+        self.points.set_animated(True)
+        # The title carries the point count, so it is redrawn with the points
+        self.ax.title.set_animated(True)
+
+    def animated_artists(self):
+        return [self.points, self.ax.title]
+
+    def refresh(self, data):
+        points = data['points']
+        offsets = np.column_stack([np.asarray(points['Pressure'], dtype=float),
+                                   np.asarray(points['Temperature'], dtype=float)])
+        self.points.set_offsets(offsets)
+        shown, total = len(offsets), data.get('summary', {}).get('total_count', len(offsets))
+        if shown < total:
+            self.ax.set_title(f'Pressure vs. Temperature ({shown:,} of {total:,} rows)')
+        else:
+            self.ax.set_title('Pressure vs. Temperature')
+        limits = self.limits(offsets)
+        if limits == (self.ax.get_xlim(), self.ax.get_ylim()):
+            return True
+        self.ax.set_xlim(*limits[0])
+        self.ax.set_ylim(*limits[1])
+        return False
+
+    @staticmethod
+    def limits(offsets):
+        """
+        Axis limits with a 5% margin, rounded out to two significant
+        digits so that similar datasets share them.
+        """
+        finite = offsets[np.isfinite(offsets).all(axis=1)]
+        if not len(finite):
+            return (0.0, 1.0), (0.0, 1.0)
+        limits = []
+        for low, high in zip(finite.min(axis=0), finite.max(axis=0)):
+            margin = (high - low) * 0.05 or abs(high) * 0.05 or 1.0
+            step = 10 ** (math.floor(math.log10(high - low + 2 * margin)) - 1)
+            limits.append((math.floor((low - margin) / step) * step, math.ceil((high + margin) / step) * step))
+        return tuple(limits)
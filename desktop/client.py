@@ -0,0 +1,132 @@
+"""
+Backend access for the desktop app.
+
+`ApiClient` holds the backend URL, the auth token and one keep-alive
+`requests.Session` shared by every request. `RequestPool` runs calls on
+worker threads so the GUI never waits on the network. Requests are
+grouped in channels ("history", "dataset", ...): a new request on a
+channel supersedes the previous one, which is cancelled if it has not
+started and has its result dropped if it has.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_URL = 'http://localhost:8000'
+API_URL_ENV = 'VISUALIZER_API_URL'
+REQUEST_WORKERS = 4
+LOGIN_TIMEOUT = 10
+
+
+def api_base_url(argv=()):
+    """
+    The backend URL: `--api-url URL` on the command line, then the
+    VISUALIZER_API_URL environment variable, then localhost.
+    """
+    argv = list(argv)
+    for index, arg in enumerate(argv):
+        if arg == '--api-url' and index + 1 < len(argv):
+            return argv[index + 1].rstrip('/')
+        if arg.startswith('--api-url='):
+            return arg.split('=', 1)[1].rstrip('/')
+    return os.environ.get(API_URL_ENV, DEFAULT_API_URL).rstrip('/')
+
+
+class LoginError(Exception):
+    pass
+
+
+class ApiClient:
+
+    def __init__(self, base_url, workers=REQUEST_WORKERS):
+        self.base_url = base_url
+        self.token = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    @property
+    def headers(self):
+        return {'Authorization': f'Token {self.token}'} if self.token else {}
+
+    def login(self, username, password):
+        """
+        Exchanges credentials for a token, which later requests send.
+        """
+        response = self.session.post(self.url('/api/login/'), data={
+            'username': username,
+            'password': password,
+        }, timeout=LOGIN_TIMEOUT)
+        if response.status_code != 200:
+            try:
+                errors = response.json().get('non_field_errors')
+            except ValueError:
+                errors = None
+            raise LoginError((errors or ['Login failed. Please check your credentials.'])[0])
+        self.token = response.json().get('token')
+        return self.token
+
+    def close(self):
+        self.session.close()
+
+
+class RequestPool:
+    """
+    Runs calls on a thread pool and hands their outcome to `deliver`, a
+    function that must run the zero-argument callable it is given on the
+    GUI thread.
+    """
+
+    def __init__(self, deliver, workers=REQUEST_WORKERS):
+        self._deliver = deliver
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='api')
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def submit(self, channel, func, *args, on_success=None, on_error=None, **kwargs):
+        """
+        Runs `func(*args, **kwargs)` in the pool. On the GUI thread,
+        `on_success` then gets the result or `on_error` the exception,
+        unless a newer request on the same channel came in meanwhile.
+        """
+        future = self._executor.submit(func, *args, **kwargs)
+        with self._lock:
+            previous = self._latest.get(channel)
+            self._latest[channel] = future
+        if previous is not None:
+            previous.cancel()
+        future.add_done_callback(lambda done: self._finished(channel, done, on_success, on_error))
+        return future
+
+    def is_current(self, channel, future):
+        with self._lock:
+            return self._latest.get(channel) is future
+
+    def _finished(self, channel, future, on_success, on_error):
+        if future.cancelled() or not self.is_current(channel, future):
+            return
+        error = future.exception()
+
+        def complete():
+            # Checked again on the GUI thread, where newer requests are made
+            if not self.is_current(channel, future):
+                return
+            with self._lock:
+                self._latest.pop(channel, None)
+            if error is not None:
+                if on_error is not None:
+                    on_error(error)
+            elif on_success is not None:
+                on_success(future.result())
+
+        self._deliver(complete)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,30 +1,92 @@
+import os
 import sys
 import requests
 import qtawesome as qta
 
 from PyQt5 import QtCore 
 
-from PyQt5.QtCore import pyqtSignal, QThread, QPropertyAnimation, QEasingCurve, QSize
+from PyQt5.QtCore import pyqtSignal, QThread, QSize, QStandardPaths
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QFileDialog, QTableWidgetItem, QVBoxLayout, QHBoxLayout,
+    QApplication, QMainWindow, QFileDialog, QVBoxLayout, QHBoxLayout,
     QWidget, QListWidget, QPushButton, QLabel, QListWidgetItem, QMessageBox,
     QAbstractItemView, QHeaderView, QDialog, QLineEdit, QFormLayout, QDialogButtonBox,
     QGraphicsDropShadowEffect
 )
 from PyQt5.QtGui import QColor
 from ui_mainwindow import Ui_MainWindow
+from cache import CachedFetcher, DiskCache, OfflineError
+from client import ApiClient, LoginError, RequestPool, api_base_url
+from tablemodel import FETCH_BATCH, ColumnTableModel, columns_from_records
+from charts import BarChart, PieChart, ScatterChart
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
 import time
 
+# Points requested for the pressure/temperature scatter
+SCATTER_POINTS = 2000
+# Rows requested per page for the table, one view batch at a time
+ROWS_PAGE_SIZE = FETCH_BATCH
+# Data files sent per bulk upload request in batch mode
+BATCH_FILES_PER_REQUEST = 50
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+# Formats the backend ingests: plain or compressed CSV, Parquet and Arrow
+DATA_FILE_PATTERNS = "*.csv *.csv.gz *.csv.zst *.parquet *.pq *.arrow *.feather *.ipc *.arrows"
+# Disk budget for cached datasets, history and scatter points
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_directory():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation) or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'chemical-visualizer')
+
+
+def make_fetcher(client, username):
+    return CachedFetcher(DiskCache(cache_directory(), CACHE_MAX_BYTES),
+                         namespace=f"{client.base_url}|{username}", session=client.session)
+
+
+def rows_points(records):
+    """
+    Scatter points taken from a page of rows.
+    """
+    return {
+        'Pressure': [row.get('Pressure', 0) for row in records],
+        'Temperature': [row.get('Temperature', 0) for row in records],
+    }
+
+
+class RequestRunner(QtCore.QObject):
+    """
+    A RequestPool whose callbacks run on the GUI thread: finished requests
+    are handed over through a queued signal.
+    """
+    delivered = pyqtSignal(object)
 
-class LoginDialog(QDialog):
     def __init__(self, parent=None):
+        super().__init__(parent)
+        self.delivered.connect(self.run_callback)
+        self.pool = RequestPool(self.delivered.emit)
+
+    def run_callback(self, callback):
+        callback()
+
+    def submit(self, channel, func, *args, **kwargs):
+        return self.pool.submit(channel, func, *args, **kwargs)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class LoginDialog(QDialog):
+    def __init__(self, client, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Login")
         self.setMinimumWidth(350)
+        self.client = client
+        self.runner = RequestRunner(self)
+        # Set when the user chose to continue without the backend
+        self.offline = False
 
         icon_label = QLabel()
         login_icon = qta.icon('fa5s.user-lock', color='#5694f2', color_active='#e0e1dd')
@@ -46,7 +108,7 @@ class LoginDialog(QDialog):
         formLayout.addRow("Password:", self.password)
 
         self.buttonBox = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        self.buttonBox.accepted.connect(self.accept)
+        self.buttonBox.accepted.connect(self.submit)
         self.buttonBox.rejected.connect(self.reject)
 
         mainLayout = QVBoxLayout()
@@ -61,31 +123,129 @@ class LoginDialog(QDialog):
     def getCredentials(self):
         return self.username.text(), self.password.text()
 
+    def submit(self):
+        username, password = self.getCredentials()
+        if not username or not password:
+            QMessageBox.warning(self, "Input Error", "Username and password cannot be empty.")
+            return
+        self.buttonBox.setEnabled(False)
+        self.runner.submit('login', self.client.login, username, password,
+                           on_success=lambda token: self.accept(), on_error=self.login_failed)
+
+    def login_failed(self, error):
+        self.buttonBox.setEnabled(True)
+        if isinstance(error, LoginError):
+            QMessageBox.warning(self, "Login Failed", str(error))
+        elif isinstance(error, requests.exceptions.RequestException):
+            if make_fetcher(self.client, self.username.text()).has_entries():
+                answer = QMessageBox.question(
+                    self, "Connection Error",
+                    f"Could not connect to {self.client.base_url}.\n\nError: {error}\n\n"
+                    "Open previously viewed datasets offline (read-only)?")
+                if answer == QMessageBox.Yes:
+                    self.offline = True
+                    self.accept()
+                    return
+            QMessageBox.critical(self, "Connection Error", f"Could not connect to {self.client.base_url}.\nPlease ensure the backend is running.\n\nError: {error}")
+        else:
+            QMessageBox.critical(self, "Error", f"An unexpected error occurred: {error}")
+
 class UploaderThread(QThread):
     success = pyqtSignal(dict)
     error = pyqtSignal(str)
     progress = pyqtSignal(int)
 
-    def __init__(self, filepath, headers):
+    POLL_INTERVAL = 0.25
+    # Give up on a job whose progress has not moved for this long. The
+    # server reruns orphaned jobs after 10 minutes, so allow for that.
+    STALL_TIMEOUT = 15 * 60
+    REQUEST_TIMEOUT = 30
+
+    def __init__(self, filepath, client):
         super().__init__()
         self.filepath = filepath
-        self.headers = headers
+        self.client = client
 
     def run(self):
         try:
-            self.progress.emit(10)
-            time.sleep(0.1)
-            self.progress.emit(40)
+            self.progress.emit(5)
             with open(self.filepath, 'rb') as f:
-                response = requests.post('http://localhost:8000/api/upload/',
-                                         files={'file': f},
-                                         headers=self.headers)
-            self.progress.emit(80)
-            time.sleep(0.1)
+                response = self.client.session.post(self.client.url('/api/upload/?async=true'),
+                                                    files={'file': f},
+                                                    headers=self.client.headers)
             response.raise_for_status()
-            data = response.json()
+            job = self.wait_for_job(response.json())
+            if job['status'] == 'failed':
+                self.error.emit(job['error'] or "Upload failed.")
+                return
             self.progress.emit(100)
-            self.success.emit(data)
+            self.success.emit(job)
+        except requests.exceptions.RequestException as e:
+            self.error.emit(f"API request failed: {e}")
+        except Exception as e:
+            self.error.emit(f"An unexpected error occurred: {e}")
+
+    def wait_for_job(self, job):
+        # Uploading the file is the first 10%, the server's progress the rest
+        state, changed_at = None, time.monotonic()
+        while job['status'] not in ('succeeded', 'failed'):
+            if (job['status'], job['updated_at']) != state:
+                state, changed_at = (job['status'], job['updated_at']), time.monotonic()
+            elif time.monotonic() - changed_at > self.STALL_TIMEOUT:
+                return {**job, 'status': 'failed',
+                        'error': "The server stopped processing the upload. Please try again."}
+            self.progress.emit(10 + int(job['progress'] * 0.85))
+            time.sleep(self.POLL_INTERVAL)
+            response = self.client.session.get(self.client.url(f"/api/jobs/{job['id']}/"),
+                                               headers=self.client.headers, timeout=self.REQUEST_TIMEOUT)
+            response.raise_for_status()
+            job = response.json()
+        return job
+
+class BatchUploaderThread(QThread):
+    success = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int)
+
+    def __init__(self, filepaths, client):
+        super().__init__()
+        self.filepaths = filepaths
+        self.client = client
+
+    def requests_to_send(self):
+        # Archives go one per request, loose CSVs in groups
+        archives = [path for path in self.filepaths if path.lower().endswith(ARCHIVE_SUFFIXES)]
+        csvs = [path for path in self.filepaths if path not in archives]
+        groups = [[path] for path in archives]
+        groups += [csvs[i:i + BATCH_FILES_PER_REQUEST] for i in range(0, len(csvs), BATCH_FILES_PER_REQUEST)]
+        return groups
+
+    def run(self):
+        created, failed, last_id = 0, [], None
+        try:
+            groups = self.requests_to_send()
+            self.progress.emit(1)
+            for index, group in enumerate(groups):
+                handles = [open(path, 'rb') for path in group]
+                try:
+                    files = [('files', (os.path.basename(path), f)) for path, f in zip(group, handles)]
+                    response = self.client.session.post(self.client.url('/api/upload/bulk/'),
+                                                        files=files, headers=self.client.headers)
+                finally:
+                    for f in handles:
+                        f.close()
+                data = response.json()
+                if 'results' not in data:
+                    response.raise_for_status()
+                    raise ValueError(data.get('error', 'Unexpected response'))
+                created += data['created']
+                for result in data['results']:
+                    if result['status'] == 'created':
+                        last_id = result['id']
+                    else:
+                        failed.append(result)
+                self.progress.emit(int((index + 1) * 100 / len(groups)))
+            self.success.emit({'created': created, 'failed': failed, 'last_id': last_id})
         except requests.exceptions.RequestException as e:
             self.error.emit(f"API request failed: {e}")
         except Exception as e:
@@ -121,10 +281,15 @@ class HistoryItemWidget(QWidget):
         
 class HistoryPanel(QWidget):
     datasetSelected = pyqtSignal(int)
+    # Emitted after every history request, whether it worked or not
+    fetched = pyqtSignal()
 
-    def __init__(self, parent=None, headers=None):
+    def __init__(self, parent=None, client=None, fetcher=None, runner=None, offline=False):
         super().__init__(parent)
-        self.headers = headers
+        self.client = client
+        self.fetcher = fetcher
+        self.runner = runner
+        self.offline = offline
         self.history = []
         self.setupUi()
         self.connect_signals()
@@ -142,14 +307,19 @@ class HistoryPanel(QWidget):
         self.historyList.itemClicked.connect(self.handle_item_click)
 
     def fetch_history(self):
-        try:
-            response = requests.get("http://localhost:8000/api/history/", headers=self.headers)
-            response.raise_for_status()
-            self.history = response.json()
-            self.update_ui()
-        except requests.exceptions.RequestException:
-            self.historyList.clear()
-            self.historyList.addItem("Error: Could not fetch history.")
+        self.runner.submit('history', self.fetcher.get_json, self.client.url('/api/history/'),
+                           headers=self.client.headers, offline=self.offline,
+                           on_success=self.history_loaded, on_error=self.history_failed)
+
+    def history_loaded(self, history):
+        self.history = history
+        self.update_ui()
+        self.fetched.emit()
+
+    def history_failed(self, error):
+        self.historyList.clear()
+        self.historyList.addItem("Error: Could not fetch history.")
+        self.fetched.emit()
 
     def update_ui(self):
         self.historyList.clear()
@@ -180,10 +350,13 @@ class HistoryPanel(QWidget):
             self.datasetSelected.emit(dataset_id)
             
 class MainWindow(QMainWindow):
-    def __init__(self, auth_token):
+    def __init__(self, client, username='', offline=False):
         super(MainWindow, self).__init__()
-        self.auth_token = auth_token
-        self.api_headers = {'Authorization': f'Token {self.auth_token}'}
+        self.client = client
+        # Started without a backend: cached data only, no uploads
+        self.offline = offline
+        self.fetcher = make_fetcher(client, username)
+        self.runner = RequestRunner(self)
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
@@ -196,7 +369,7 @@ class MainWindow(QMainWindow):
             print("Warning: style.qss not found.")
 
         self.current_data_set = None
-        self.history_panel = HistoryPanel(headers=self.api_headers)
+        self.history_panel = HistoryPanel(client=client, fetcher=self.fetcher, runner=self.runner, offline=offline)
         self.ui.historyLayout.addWidget(self.history_panel)
 
         self.setup_icons()
@@ -204,12 +377,29 @@ class MainWindow(QMainWindow):
         self.setup_charts()
 
         self.ui.uploadButton.clicked.connect(self.upload_csv_start)
+        self.batchUploadButton.clicked.connect(self.batch_upload_start)
         self.history_panel.datasetSelected.connect(self.handle_history_select)
+        self.history_panel.fetched.connect(self.update_connection_status)
 
         self.ui.uploadProgressBar.hide()
         self.history_panel.fetch_history()
+        self.update_connection_status()
         self.show()
 
+    def closeEvent(self, event):
+        self.runner.shutdown()
+        self.client.close()
+        super().closeEvent(event)
+
+    def update_connection_status(self):
+        offline = self.offline or self.fetcher.offline
+        self.ui.uploadButton.setEnabled(not offline)
+        self.batchUploadButton.setEnabled(not offline)
+        if offline:
+            self.ui.statusbar.showMessage("Offline: showing cached datasets (read-only)")
+        else:
+            self.ui.statusbar.clearMessage()
+
     def apply_shadow(self, widget):
         shadow = QGraphicsDropShadowEffect(self)
         shadow.setBlurRadius(20)
@@ -217,210 +407,223 @@ class MainWindow(QMainWindow):
         shadow.setOffset(0, 5)
         widget.setGraphicsEffect(shadow)
 
-    def fade_in_widget(self, widget):
-        widget.show()
-        self.anim = QPropertyAnimation(widget, b"windowOpacity")
-        self.anim.setDuration(500)
-        self.anim.setStartValue(0.0)
-        self.anim.setEndValue(1.0)
-        self.anim.setEasingCurve(QEasingCurve.InOutQuad)
-        self.anim.start()
-
     def polish_ui(self):
+        self.table_model = ColumnTableModel(self)
+        self.ui.dataTable.setModel(self.table_model)
         self.ui.dataTable.setEditTriggers(QAbstractItemView.NoEditTriggers)
 
         self.ui.dataTable.setAlternatingRowColors(True)
         self.ui.dataTable.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.ui.dataTable.setSelectionMode(QAbstractItemView.SingleSelection)
+        # Fixed row heights, so the view never measures rows it does not show
         self.ui.dataTable.verticalHeader().setVisible(False)
+        self.ui.dataTable.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.ui.dataTable.verticalHeader().setDefaultSectionSize(36)
         header = self.ui.dataTable.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(QHeaderView.Interactive)
         header.setStretchLastSection(True)
+        header.setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.ui.dataTable.setSortingEnabled(True)
+
+        self.filterEdit = QLineEdit(self.ui.centralwidget)
+        self.filterEdit.setObjectName("filterEdit")
+        self.filterEdit.setClearButtonEnabled(True)
+        self.filterEdit.setPlaceholderText("Filter rows...")
+        self.filterEdit.textChanged.connect(self.table_model.set_filter)
+        self.table_model.pageWanted.connect(self.request_rows_page)
+        self.tablePanel = QWidget(self.ui.centralwidget)
+        table_layout = QVBoxLayout(self.tablePanel)
+        table_layout.setContentsMargins(0, 0, 0, 0)
+        self.ui.gridLayout.removeWidget(self.ui.dataTable)
+        table_layout.addWidget(self.filterEdit)
+        table_layout.addWidget(self.ui.dataTable)
+        self.ui.gridLayout.addWidget(self.tablePanel, 9, 1, 1, 1)
 
         self.apply_shadow(self.ui.tabWidget)
         self.apply_shadow(self.ui.dataTable)
 
-    def update_all_views(self, data):
-        self.ui.tabWidget.hide()
-        self.ui.dataTable.hide()
-
-        self.update_bar_chart(data)
-        self.update_pie_chart(data)
-        self.update_parameter_chart(data)
-        self.update_data_table(data)
-
-        if data:
-            self.fade_in_widget(self.ui.tabWidget)
-            self.fade_in_widget(self.ui.dataTable)
-        
     def setup_icons(self):
         icon_color = '#ffffff'
         upload_icon = qta.icon('fa5s.upload', color=icon_color)
         self.ui.uploadButton.setIcon(upload_icon)
         self.ui.uploadButton.setText(" Upload CSV File")
+
+        self.batchUploadButton = QPushButton(self.ui.centralwidget)
+        self.batchUploadButton.setObjectName("batchUploadButton")
+        self.batchUploadButton.setIcon(qta.icon('fa5s.file-archive', color=icon_color))
+        self.batchUploadButton.setText(" Batch Upload")
+        upload_row = QHBoxLayout()
+        self.ui.gridLayout.removeWidget(self.ui.uploadButton)
+        upload_row.addWidget(self.ui.uploadButton)
+        upload_row.addWidget(self.batchUploadButton)
+        self.ui.gridLayout.addLayout(upload_row, 5, 0, 1, 1)
         refresh_icon = qta.icon('fa5s.sync-alt', color=icon_color)
         self.history_panel.refreshButton.setIcon(refresh_icon)
         self.history_panel.refreshButton.setText(" Refresh")
     
     def setup_charts(self):
-        self.theme_bg_color = '#050822'
-        self.theme_text_color = '#e0e1dd'
-        self.theme_accent_color = '#5694f2'
-        self.theme_grid_color = '#3d5a80'
-        self.theme_highlight_color = '#e5c07b'
-        self.bar_figure = Figure(facecolor=self.theme_bg_color)
-        self.bar_canvas = FigureCanvas(self.bar_figure)
-        bar_layout = QVBoxLayout(self.ui.barChartContainer)
-        bar_layout.addWidget(self.bar_canvas)
-        self.pie_figure = Figure(facecolor=self.theme_bg_color)
-        self.pie_canvas = FigureCanvas(self.pie_figure)
-        pie_layout = QVBoxLayout(self.ui.pieChartContainer)
-        pie_layout.addWidget(self.pie_canvas)
-        self.param_figure = Figure(facecolor=self.theme_bg_color)
-        self.param_canvas = FigureCanvas(self.param_figure)
-        param_layout = QVBoxLayout(self.ui.parameterContainer)
-        param_layout.addWidget(self.param_canvas)
+        # In tab order, so the current tab's index picks its chart
+        self.charts = []
+        for chart_class, container in ((BarChart, self.ui.barChartContainer),
+                                       (PieChart, self.ui.pieChartContainer),
+                                       (ScatterChart, self.ui.parameterContainer)):
+            figure = Figure()
+            canvas = FigureCanvas(figure)
+            QVBoxLayout(container).addWidget(canvas)
+            self.charts.append(chart_class(figure, canvas))
+        self.ui.tabWidget.currentChanged.connect(self.render_chart)
         self.update_all_views(None)
 
+    def render_chart(self, index):
+        # Charts on hidden tabs catch up with the current dataset when shown
+        if 0 <= index < len(self.charts):
+            self.charts[index].render()
+
     def handle_history_select(self, dataset_id):
-        try:
-            response = requests.get(f"http://localhost:8000/api/datasets/{dataset_id}/",
-                                    headers=self.api_headers)
-            response.raise_for_status()
-            self.current_data_set = response.json()
-            self.update_all_views(self.current_data_set)
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Failed to load dataset: {e}")
+        # A newer selection supersedes this one, wherever it has got to
+        self.ui.statusbar.showMessage("Loading dataset...")
+        self.runner.submit('dataset', self.load_dataset, dataset_id,
+                           on_success=self.show_dataset, on_error=self.dataset_failed)
+
+    def load_dataset(self, dataset_id):
+        """
+        Fetches a dataset's summary, its scatter points and the first page
+        of its rows, laid out for the table. Runs on a worker thread.
+        """
+        data = self.fetcher.get_json(self.client.url(f"/api/datasets/{dataset_id}/"), params={'rows': 'false'},
+                                     headers=self.client.headers, offline=self.offline)
+        page = self.fetch_rows_page(self.client.url(f"/api/datasets/{dataset_id}/rows/"),
+                                    params={'page_size': ROWS_PAGE_SIZE})
+        points = self.fetch_scatter_points(dataset_id, page['results'])
+        return data, points, columns_from_records(page['results']), page['next']
+
+    def show_dataset(self, result):
+        self.current_data_set, points, columns, next_page = result
+        self.update_all_views(self.current_data_set, points, columns, next_page)
+        self.update_connection_status()
+
+    def fetch_rows_page(self, url, params=None):
+        """
+        A page of rows from the rows endpoint. Runs on a worker thread.
+        """
+        return self.fetcher.get_json(url, params=params, headers=self.client.headers, offline=self.offline)
+
+    def request_rows_page(self, url):
+        self.runner.submit('rows', self.fetch_rows_page, url,
+                           on_success=lambda page: self.rows_page_loaded(url, page),
+                           on_error=lambda error: self.rows_page_failed(url, error))
+
+    def rows_page_loaded(self, url, page):
+        self.table_model.add_page(url, page['results'], page['next'])
+        self.update_connection_status()
+
+    def rows_page_failed(self, url, error):
+        self.table_model.page_failed(url)
+        self.update_connection_status()
+        if isinstance(error, OfflineError):
+            self.ui.statusbar.showMessage("Offline: the remaining rows are not cached")
+        else:
+            self.ui.statusbar.showMessage(f"Failed to load more rows: {error}")
+
+    def dataset_failed(self, error):
+        self.update_connection_status()
+        if isinstance(error, OfflineError):
+            QMessageBox.warning(self, "Offline", "This dataset has not been viewed before and is not cached.")
+        elif isinstance(error, requests.exceptions.RequestException):
+            QMessageBox.critical(self, "Error", f"Failed to load dataset: {error}")
+        else:
+            QMessageBox.critical(self, "Error", f"An unexpected error occurred: {error}")
 
     def upload_csv_start(self):
-        filepath, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv)")
+        filepath, _ = QFileDialog.getOpenFileName(self, "Open Data File", "", f"Data Files ({DATA_FILE_PATTERNS})")
         if not filepath: return
         self.ui.uploadButton.setEnabled(False)
         self.ui.uploadProgressBar.show()
         self.ui.uploadProgressBar.setValue(0)
 
-        self.uploader = UploaderThread(filepath, self.api_headers)
+        self.uploader = UploaderThread(filepath, self.client)
         self.uploader.success.connect(self.upload_finished)
         self.uploader.error.connect(self.upload_failed)
         self.uploader.progress.connect(self.update_progress)
         self.uploader.start()
 
+    def batch_upload_start(self):
+        filepaths, _ = QFileDialog.getOpenFileNames(
+            self, "Open Data Files or Archives", "",
+            f"Data Files and Archives ({DATA_FILE_PATTERNS} *.zip *.tar *.tar.gz *.tgz)")
+        if not filepaths: return
+        self.ui.uploadButton.setEnabled(False)
+        self.batchUploadButton.setEnabled(False)
+        self.ui.uploadProgressBar.show()
+        self.ui.uploadProgressBar.setValue(0)
+
+        self.batch_uploader = BatchUploaderThread(filepaths, self.client)
+        self.batch_uploader.success.connect(self.batch_upload_finished)
+        self.batch_uploader.error.connect(self.upload_failed)
+        self.batch_uploader.progress.connect(self.update_progress)
+        self.batch_uploader.start()
+
+    def batch_upload_finished(self, result):
+        self.ui.uploadProgressBar.hide()
+        self.ui.uploadButton.setEnabled(True)
+        self.batchUploadButton.setEnabled(True)
+        self.history_panel.fetch_history()
+        if result['last_id'] is not None:
+            self.handle_history_select(result['last_id'])
+
+        message = f"{result['created']} file(s) uploaded."
+        if result['failed']:
+            lines = [f"{item['filename']}: {item['error']}" for item in result['failed'][:10]]
+            if len(result['failed']) > 10:
+                lines.append(f"... and {len(result['failed']) - 10} more")
+            message += f"\n\n{len(result['failed'])} file(s) failed:\n" + "\n".join(lines)
+            QMessageBox.warning(self, "Batch Upload", message)
+        else:
+            QMessageBox.information(self, "Batch Upload", message)
+
     def update_progress(self, value):
         self.ui.uploadProgressBar.setValue(value)
 
-    def upload_finished(self, data):
+    def upload_finished(self, job):
         self.ui.uploadProgressBar.hide()
         self.ui.uploadButton.setEnabled(True)
-        self.current_data_set = data
-        self.update_all_views(data)
+        self.handle_history_select(job['dataset'])
         self.history_panel.fetch_history()
         QMessageBox.information(self, "Success", "File uploaded and analyzed successfully!")
 
     def upload_failed(self, error_message):
         self.ui.uploadProgressBar.hide()
         self.ui.uploadButton.setEnabled(True)
+        self.batchUploadButton.setEnabled(True)
         QMessageBox.critical(self, "Upload Failed", error_message)
 
-    def update_all_views(self, data):
-        self.update_bar_chart(data)
-        self.update_pie_chart(data)
-        self.update_parameter_chart(data)
-        self.update_data_table(data)
-    
-    def set_mpl_style(self, ax):
-        ax.set_facecolor(self.theme_bg_color)
-        ax.tick_params(axis='x', colors=self.theme_text_color)
-        ax.tick_params(axis='y', colors=self.theme_text_color)
-        for spine in ax.spines.values():
-            spine.set_edgecolor(self.theme_grid_color)
-        ax.title.set_color(self.theme_text_color)
-        ax.xaxis.label.set_color(self.theme_text_color)
-        ax.yaxis.label.set_color(self.theme_text_color)
-    
-    def draw_empty_chart_message(self, figure, canvas):
-        figure.clear()
-        ax = figure.add_subplot(111)
-        ax.text(0.5, 0.5, 'Upload a file or select from history to view analysis',
-                horizontalalignment='center', verticalalignment='center',
-                fontsize=12, color=self.theme_grid_color, transform=ax.transAxes)
-        ax.set_facecolor(self.theme_bg_color)
-        ax.axis('off')
-        canvas.draw()
-
-    def update_bar_chart(self, data):
-        if not data:
-            self.draw_empty_chart_message(self.bar_figure, self.bar_canvas)
-            return
-        summary = data.get('summary', {})
-        distribution = summary.get('equipment_type_distribution', {})
-        self.bar_figure.clear()
-        ax = self.bar_figure.add_subplot(111)
-        ax.bar(distribution.keys(), distribution.values(), color=self.theme_accent_color)
-        ax.set_title('Equipment Type Distribution')
-        ax.set_ylabel('Count')
-        self.set_mpl_style(ax)
-        self.bar_figure.tight_layout()
-        self.bar_canvas.draw()
-        
-    def update_pie_chart(self, data):
-        if not data:
-            self.draw_empty_chart_message(self.pie_figure, self.pie_canvas)
-            return
-        summary = data.get('summary', {})
-        distribution = summary.get('equipment_type_distribution', {})
-        self.pie_figure.clear()
-        ax = self.pie_figure.add_subplot(111)
-        colors = ['#5694f2', '#3d5a80', '#e5c07b', '#b48ead', '#a3be8c']
-        wedges, texts, autotexts = ax.pie(distribution.values(), autopct='%1.1f%%',
-                                          startangle=140, textprops=dict(color="white", weight="bold"),
-                                          colors=colors, wedgeprops={'edgecolor': self.theme_bg_color, 'linewidth': 2})
-        legend = ax.legend(wedges, distribution.keys(), title="Equipment",
-                   loc="center left", bbox_to_anchor=(1, 0, 0.5, 1),
-                   labelcolor=self.theme_text_color,
-                   facecolor='#080c32',
-                   edgecolor='none')
-        plt.setp(legend.get_title(), color=self.theme_accent_color, weight='bold')
-        ax.set_title('Equipment Percentage')
-        ax.axis('equal')
-        self.set_mpl_style(ax)
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-        self.pie_figure.tight_layout()
-        self.pie_canvas.draw()
-
-    def update_parameter_chart(self, data):
-        if not data:
-            self.draw_empty_chart_message(self.param_figure, self.param_canvas)
-            return
-        original_data = data.get('original_data', [])
-        self.param_figure.clear()
-        ax = self.param_figure.add_subplot(111)
-        pressures = [row.get('Pressure', 0) for row in original_data]
-        temperatures = [row.get('Temperature', 0) for row in original_data]
-        ax.scatter(pressures, temperatures, alpha=0.7, c=self.theme_highlight_color)
-        ax.set_title('Pressure vs. Temperature')
-        ax.set_xlabel('Pressure')
-        ax.set_ylabel('Temperature')
-        ax.grid(True, color=self.theme_grid_color, linestyle='--', linewidth=0.5)
-        self.set_mpl_style(ax)
-        self.param_figure.tight_layout()
-        self.param_canvas.draw()
-
-    def update_data_table(self, data):
-        if not data:
-            self.ui.dataTable.setRowCount(0)
-            self.ui.dataTable.setColumnCount(0)
-            return
-        table_data = data.get('original_data', [])
-        self.ui.dataTable.clearContents()
-        headers = list(table_data[0].keys())
-        self.ui.dataTable.setColumnCount(len(headers))
-        self.ui.dataTable.setHorizontalHeaderLabels(headers)
-        self.ui.dataTable.setRowCount(len(table_data))
-        for row_index, row_data in enumerate(table_data):
-            for col_index, header in enumerate(headers):
-                cell_value = str(row_data.get(header, ''))
-                self.ui.dataTable.setItem(row_index, col_index, QTableWidgetItem(cell_value))
+    def update_all_views(self, data, points=None, columns=None, next_page=None):
+        scatter = {'summary': data.get('summary', {}), 'points': points or rows_points([])} if data else None
+        current = self.ui.tabWidget.currentIndex()
+        for index, (chart, chart_data) in enumerate(zip(self.charts, (data, data, scatter))):
+            chart.set_data(chart_data, visible=index == current)
+        self.update_data_table(data, columns, next_page)
+
+    def fetch_scatter_points(self, dataset_id, records):
+        """
+        Downsampled points from the scatter endpoint, so large datasets stay
+        responsive. Falls back to the first page of rows if the request
+        fails. Runs on a worker thread.
+        """
+        try:
+            return self.fetcher.get_json(self.client.url(f"/api/datasets/{dataset_id}/scatter/"),
+                                         params={'points': SCATTER_POINTS}, headers=self.client.headers,
+                                         offline=self.offline)
+        except (requests.exceptions.RequestException, OfflineError):
+            return rows_points(records)
+
+    def update_data_table(self, data, columns, next_page):
+        # Only the first page is loaded; the summary counts every row
+        self.table_model.set_columns(columns or {}, next_page)
+        total = (data or {}).get('summary', {}).get('total_count', self.table_model.total_rows())
+        self.filterEdit.setPlaceholderText(f"Filter {total:,} rows...")
+        # Sized from the rows in view only
+        self.ui.dataTable.resizeColumnsToContents()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -430,29 +633,11 @@ if __name__ == '__main__':
     except FileNotFoundError:
         pass
 
-    token = None
-    while not token:
-        login_dialog = LoginDialog()
-        if login_dialog.exec_() == QDialog.Accepted:
-            username, password = login_dialog.getCredentials()
-            if not username or not password:
-                QMessageBox.warning(None, "Input Error", "Username and password cannot be empty.")
-                continue
-            try:
-                response = requests.post("http://localhost:8000/api/login/", data={
-                    "username": username,
-                    "password": password
-                })
-                if response.status_code == 200:
-                    token = response.json().get('token')
-                else:
-                    error_msg = response.json().get('non_field_errors', ['Login failed. Please check your credentials.'])
-                    QMessageBox.warning(None, "Login Failed", error_msg[0])
-            except requests.exceptions.RequestException as e:
-                QMessageBox.critical(None, "Connection Error", f"Could not connect to the server.\nPlease ensure the backend is running.\n\nError: {e}")
-                sys.exit(1)
-        else:
-            sys.exit(0)
+    client = ApiClient(api_base_url(sys.argv[1:]))
+    login_dialog = LoginDialog(client)
+    if login_dialog.exec_() != QDialog.Accepted:
+        sys.exit(0)
 
-    window = MainWindow(auth_token=token)
+    username, _ = login_dialog.getCredentials()
+    window = MainWindow(client, username=username, offline=login_dialog.offline)
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""
+Table model for dataset rows.
+
+Rows are held column by column, not as a Qt item per cell, and the view
+only asks for the cells it paints, so a million-row dataset costs a few
+arrays. Numeric columns are float64 arrays; text columns are integer codes
+into their distinct values, so sorting and filtering them works on the
+few distinct values rather than on every row. Sorting and filtering
+produce an index array into the columns and never move the data. Rows are
+handed to the view in batches as it scrolls, and once the loaded rows run
+out the model asks for the next page from the server.
+"""
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+# Rows handed to the view per fetchMore()
+FETCH_BATCH = 10_000
+
+
+class TextColumn:
+    """
+    A column of text stored as codes into its distinct values.
+    """
+
+    def __init__(self, values):
+        self._lookup = {}
+        self.codes = np.empty(0, dtype=np.int32)
+        self.extend(values)
+
+    def extend(self, values):
+        """
+        Appends `values`, as from the next page of rows.
+        """
+        lookup = self._lookup
+        for value in dict.fromkeys(values):
+            lookup.setdefault(value, len(lookup))
+        codes = np.fromiter(map(lookup.__getitem__, values), dtype=np.int32, count=len(values))
+        self.codes = np.concatenate([self.codes, codes])
+        self.labels = ['' if value is None else str(value) for value in lookup]
+        self.folded = [label.lower() for label in self.labels]
+        # Position of each distinct value in sorted order
+        order = sorted(range(len(self.labels)), key=self.labels.__getitem__)
+        self.rank = np.empty(len(self.labels), dtype=np.int32)
+        self.rank[order] = np.arange(len(self.labels), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def label(self, row):
+        return self.labels[self.codes[row]]
+
+    def sort_keys(self, rows):
+        return self.rank[self.codes[rows]]
+
+    def contains(self, text):
+        """
+        Row mask of values containing `text`, which must be lower case.
+        """
+        hits = np.fromiter((text in label for label in self.folded), dtype=bool, count=len(self.folded))
+        return hits[self.codes]
+
+
+def make_column(values):
+    """
+    A float64 array for numeric values (None becomes NaN), else a TextColumn.
+    """
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    return TextColumn(values)
+
+
+def extend_column(column, values):
+    """
+    `column` with `values` appended. A numeric column that meets text
+    becomes a TextColumn.
+    """
+    if isinstance(column, TextColumn):
+        column.extend(values)
+        return column
+    try:
+        return np.concatenate([column, np.array(values, dtype=np.float64)])
+    except (TypeError, ValueError):
+        return TextColumn([None if np.isnan(value) else float(value) for value in column] + list(values))
+
+
+def columns_from_records(records):
+    """
+    Columns built from a list of row dicts, as the API returns them.
+    """
+    if not records:
+        return {}
+    return {name: make_column([row.get(name) for row in records]) for name in records[0]}
+
+
+class ColumnTableModel(QAbstractTableModel):
+    """
+    Read-only model over a dict of equal-length columns, the first page of
+    a dataset's rows. Further pages are asked for with `pageWanted`, given
+    the URL of the page, and handed back through add_page().
+
+    Sorting and filtering need every row, so they first load the remaining
+    pages; until the last one arrives, new rows are appended in file order.
+    """
+    pageWanted = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = []
+        self._columns = []
+        self._index = np.arange(0)
+        self._loaded = 0
+        self._sort = (-1, Qt.AscendingOrder)
+        self._filter = ''
+        # URL of the next page on the server, and of the one being fetched
+        self._next_page = None
+        self._pending = None
+
+    def set_columns(self, columns, next_page=None):
+        self._names = list(columns)
+        self._columns = [columns[name] for name in self._names]
+        self._next_page = next_page
+        self._pending = None
+        self._reindex()
+        self._load_all()
+
+    def add_page(self, url, records, next_page):
+        """
+        Appends `records`, the rows of the page at `url`, unless another
+        dataset has been shown since it was asked for.
+        """
+        if url != self._pending:
+            return
+        self._pending = None
+        self._next_page = next_page
+        start = len(self._columns[0]) if self._columns else 0
+        self._columns = [extend_column(column, [row.get(name) for row in records])
+                         for name, column in zip(self._names, self._columns)]
+        if self._needs_all_rows():
+            if self._next_page is None:
+                self._reindex()
+            else:
+                self._request_page()
+            return
+        count = len(self._columns[0]) - start if self._columns else 0
+        if count:
+            self._index = np.concatenate([self._index, np.arange(start, start + count)])
+            self.fetchMore()
+
+    def page_failed(self, url):
+        """
+        Lets the page at `url` be asked for again, the next time the view
+        scrolls to the end.
+        """
+        if url == self._pending:
+            self._pending = None
+
+    def total_rows(self):
+        """
+        Loaded rows that match the filter, including ones not shown yet.
+        """
+        return len(self._index)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._loaded < len(self._index) or (self._next_page is not None and self._pending is None)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH, len(self._index) - self._loaded)
+        if count <= 0:
+            self._request_page()
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def _request_page(self):
+        if self._next_page is not None and self._pending is None:
+            self._pending = self._next_page
+            self.pageWanted.emit(self._pending)
+
+    def _needs_all_rows(self):
+        return bool(self._filter) or self._sort[0] >= 0
+
+    def _load_all(self):
+        if self._needs_all_rows():
+            self._request_page()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = self._columns[index.column()]
+        if role == Qt.DisplayRole:
+            row = self._index[index.row()]
+            if isinstance(column, TextColumn):
+                return column.label(row)
+            value = column[row]
+            return '' if np.isnan(value) else f"{value:g}"
+        if role == Qt.TextAlignmentRole and not isinstance(column, TextColumn):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._names[section] if section < len(self._names) else None
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sorts by `column`; a negative column restores file order.
+        """
+        self._sort = (column, order)
+        self._reindex()
+        self._load_all()
+
+    def set_filter(self, text):
+        """
+        Keeps rows where any text column contains `text`, ignoring case.
+        """
+        self._filter = text.strip().lower()
+        self._reindex()
+        self._load_all()
+
+    def _reindex(self):
+        self.beginResetModel()
+        self._index = self._view_index()
+        self._loaded = min(FETCH_BATCH, len(self._index))
+        self.endResetModel()
+
+    def _view_index(self):
+        """
+        Row numbers in display order, after filtering and sorting.
+        """
+        index = np.arange(len(self._columns[0]) if self._columns else 0)
+        if self._filter:
+            mask = np.zeros(len(index), dtype=bool)
+            for column in self._columns:
+                if isinstance(column, TextColumn):
+                    mask |= column.contains(self._filter)
+            index = index[mask]
+        position, order = self._sort
+        if 0 <= position < len(self._columns) and len(index):
+            column = self._columns[position]
+            keys = column.sort_keys(index) if isinstance(column, TextColumn) else column[index]
+            index = index[np.argsort(keys, kind='stable')]
+            if order == Qt.DescendingOrder:
+                index = index[::-1]
+        return index
@@ -126,7 +126,7 @@ class Ui_MainWindow(object):
         self.label_3.setFont(font)
         self.label_3.setObjectName("label_3")
         self.gridLayout.addWidget(self.label_3, 7, 0, 1, 1)
-        self.dataTable = QtWidgets.QTableWidget(self.centralwidget)
+        self.dataTable = QtWidgets.QTableView(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         sizePolicy.setHorizontalStretch(3)
         sizePolicy.setVerticalStretch(0)
@@ -134,8 +134,6 @@ class Ui_MainWindow(object):
         self.dataTable.setSizePolicy(sizePolicy)
         self.dataTable.viewport().setProperty("cursor", QtGui.QCursor(QtCore.Qt.PointingHandCursor))
         self.dataTable.setObjectName("dataTable")
-        self.dataTable.setColumnCount(0)
-        self.dataTable.setRowCount(0)
         self.gridLayout.addWidget(self.dataTable, 9, 1, 1, 1)
         self.uploadButton = QtWidgets.QPushButton(self.centralwidget)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Fixed)
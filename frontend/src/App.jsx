@@ -7,6 +7,7 @@ import LoginPage from "./pages/LoginPage";
 import RootRedirect from "./components/RootRedirect";
 import ChangePassword from "./pages/ChangePassword";
 import SignUp from "./pages/SignUp";
+import apiClient from "./api";
 
 function App() {
 	const [authToken, setAuthToken] = useState(localStorage.getItem("authToken"));
@@ -17,6 +18,12 @@ function App() {
 	};
 
 	const handleLogout = () => {
+		// Revoke the token on the server; logging out locally must not wait for it
+		if (authToken) {
+			apiClient
+				.post("/logout/", null, { headers: { Authorization: `Token ${authToken}` } })
+				.catch(() => {});
+		}
 		localStorage.removeItem("authToken");
 		setAuthToken(null);
 	};
@@ -193,11 +193,12 @@ const FileUpload = ({ onUploadSuccess, onUploadError }) => {
 							drop
 						</p>
 						<p className="text-xs text-gray-500 dark:text-gray-400">
-							CSV, XLS, or XLSX files
+							CSV (plain, .gz or .zst), Parquet or Arrow files
 						</p>
 						<input
 							ref={fileInputRef}
 							type="file"
+							accept=".csv,.gz,.zst,.parquet,.pq,.arrow,.feather,.ipc,.arrows"
 							onChange={handleFileChange}
 							className="hidden"
 						/>
@@ -1,4 +1,4 @@
-import React from "react";
+import React, { useEffect, useState } from "react";
 import { Scatter } from "react-chartjs-2";
 import {
 	Chart as ChartJS,
@@ -9,6 +9,9 @@ import {
 	Legend,
 	Title,
 } from "chart.js";
+import apiClient from "../api";
+
+const POINT_BUDGET = 2000;
 
 ChartJS.register(
 	LinearScale,
@@ -19,19 +22,48 @@ ChartJS.register(
 	Title
 );
 
-const PressureTempScatterPlot = ({ data }) => {
-	if (!data || data.length === 0) {
+const PressureTempScatterPlot = ({ datasetId }) => {
+	const [points, setPoints] = useState(null);
+	const [error, setError] = useState(null);
+
+	useEffect(() => {
+		if (!datasetId) return;
+		let cancelled = false;
+		setPoints(null);
+		setError(null);
+		apiClient
+			.get(`/datasets/${datasetId}/scatter/`, {
+				params: { points: POINT_BUDGET },
+			})
+			.then((response) => {
+				if (!cancelled) setPoints(response.data);
+			})
+			.catch((err) => {
+				if (!cancelled) setError("Could not load scatter data.");
+				console.error(err);
+			});
+		return () => {
+			cancelled = true;
+		};
+	}, [datasetId]);
+
+	if (error) return <p className="text-red-500">{error}</p>;
+	if (!points) return <p>Loading scatter plot...</p>;
+	if (points.Pressure.length === 0) {
 		return <p>No data for scatter plot.</p>;
 	}
-	const scatterData = data.map((item) => ({
-		x: item.Pressure,
-		y: item.Temperature,
+	const scatterData = points.Pressure.map((pressure, i) => ({
+		x: pressure,
+		y: points.Temperature[i],
 	}));
 
 	const chartData = {
 		datasets: [
 			{
-				label: "Pressure vs. Temperature",
+				label:
+					scatterData.length < points.total_count
+						? `Pressure vs. Temperature (${scatterData.length} of ${points.total_count} rows)`
+						: "Pressure vs. Temperature",
 				data: scatterData,
 				backgroundColor: "rgba(255, 99, 132, 0.8)",
 			},
@@ -40,6 +72,7 @@ const PressureTempScatterPlot = ({ data }) => {
 
 	const options = {
 		responsive: true,
+		animation: false,
 		plugins: {
 			legend: { position: "top" },
 			title: {
@@ -154,7 +154,7 @@ const Dashboard = ({ onLogout }) => {
 								<h2 className="text-2xl font-semibold mb-4 text-center">
 									Pressure vs. Temperature
 								</h2>
-								<PressureTempScatterPlot data={currentDataSet.original_data} />
+								<PressureTempScatterPlot datasetId={currentDataSet.id} />
 							</div>
 
 							<div>